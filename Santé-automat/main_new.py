@@ -1,19 +1,28 @@
 """
 Script principal d'analyse des résultats médicaux.
-Orchestre l'extraction des PDF, la mise à jour Excel et la génération de graphiques.
+Orchestre l'extraction des PDF, l'alimentation du stock des observations et,
+sur demande, l'export Excel (colorisation et graphiques).
 """
 import os
 import sys
+import time
+import signal
 import argparse
 
 # Ajouter le dossier src au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from config import PDF_FOLDER
+from config import PDF_FOLDER, OUTPUT_FILE, COLOR_MODE, PDF_BACKEND, WATCH_INTERVAL, SHARDS_FOLDER, PROFILE_TOP
 from dev_logger import DevLogger
-from pdf_extractor import PDFExtractor
+from pdf_extractor import PDFExtractor, extract_all, start_pool
+from text_backends import AUTO, BACKEND_NAMES
 from thresholds_manager import ThresholdsManager
 from excel_manager import ExcelManager
+from manifest import ProcessedManifest
+from observation_store import ObservationStore
+from watcher import FolderWatcher
+from profiler import Profiler
+from shards import UNKNOWN_PATIENT, process_shards, shard_has_date, shard_name
 
 
 def main():
@@ -24,57 +33,306 @@ def main():
     parser.add_argument(
         "--force",
         action="store_true",
-        help="Forcer la ré-extraction même si la date existe déjà"
+        help="Forcer la ré-extraction même si la date existe déjà (ignore le manifeste)"
     )
     parser.add_argument(
         "--dev",
         action="store_true",
         help="Mode développement: log le texte brut et les résultats filtrés dans dev.txt"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Nombre de processus pour l'extraction des PDF (0 = tous les cœurs, défaut: 1)"
+    )
+    parser.add_argument(
+        "--export-excel",
+        action="store_true",
+        help=f"Générer {OUTPUT_FILE} (colorisation et graphiques) depuis le stock des observations"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["fills", "conditional"],
+        default=COLOR_MODE,
+        help="Colorisation de l'export: couleurs fixes (fills) ou mise en forme conditionnelle "
+             f"recalculée par Excel (conditional). Défaut: {COLOR_MODE}"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=list(BACKEND_NAMES) + [AUTO],
+        default=PDF_BACKEND,
+        help="Moteur d'extraction du texte des PDF; auto = le plus rapide donnant les mêmes "
+             f"résultats que pdfplumber (mesuré une fois, mis en cache). Défaut: {PDF_BACKEND}"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Après le traitement, surveiller PDF_FOLDER et ajouter les nouveaux PDF au stock "
+             f"par lots toutes les {WATCH_INTERVAL:g}s (avec --export-excel, l'export est régénéré)"
+    )
+    parser.add_argument(
+        "--by-patient",
+        action="store_true",
+        help="Dossier partagé: ranger chaque PDF dans le dossier de son patient (lu dans l'en-tête) "
+             f"sous {SHARDS_FOLDER}/, avec stock, seuils et export propres; patients traités en parallèle"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Afficher les temps (réel et CPU) par étape: ouverture, texte, analyse, stock, export, "
+             "colorisation, graphiques, enregistrement, ainsi que les PDF les plus lents"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        metavar="DOSSIER",
+        help=f"Passer chaque PDF sous cProfile et écrire dans DOSSIER le profil des {PROFILE_TOP} "
+             "plus lents (.prof); implique --profile"
+    )
+    parser.add_argument(
+        "--metrics-json",
+        metavar="FICHIER",
+        help="Écrire les temps par PDF et par étape dans FICHIER (JSON)"
+    )
     args = parser.parse_args()
     
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.dev and jobs > 1:
+        # dev.txt est écrit par un seul processus
+        print("[WARN] --dev force l'extraction séquentielle (--jobs 1)")
+        jobs = 1
+    if args.profile_dir and jobs > 1:
+        # Les profils cProfile sont pris dans ce processus
+        print("[WARN] --profile-dir force l'extraction séquentielle (--jobs 1)")
+        jobs = 1
+    
     # Initialisation des composants
     dev_logger = DevLogger(enabled=args.dev)
-    pdf_extractor = PDFExtractor(dev_logger=dev_logger)
-    thresholds_manager = ThresholdsManager()
-    excel_manager = ExcelManager()
+    profiler = Profiler(enabled=args.profile or bool(args.metrics_json), profile_dir=args.profile_dir)
+    pdf_extractor = PDFExtractor(dev_logger=dev_logger, backend=args.backend, profiler=profiler)
+    manifest = ProcessedManifest()
+    store = None
+    
+    if args.by_patient:
+        print(f"[INFO] Traitement par patient: un dossier par patient dans {SHARDS_FOLDER}")
+        
+        def ingest(pdf_paths, pool=None, initial=False):
+            return process_by_patient(pdf_paths, pdf_extractor, manifest, jobs=jobs, force=args.force,
+                                      export_excel=args.export_excel, color_mode=args.format, pool=pool)
+    else:
+        thresholds_manager = ThresholdsManager()
+        excel_manager = ExcelManager(color_mode=args.format, profiler=profiler)
+        store = ObservationStore()
+        
+        # Premier lancement avec le stock: reprise de l'ancien resultats.xlsx
+        if store.is_empty() and os.path.exists(OUTPUT_FILE):
+            n = store.import_excel(OUTPUT_FILE)
+            print(f"[INFO] {n} valeur(s) importée(s) depuis {OUTPUT_FILE} dans {store.store_file}")
+        
+        def ingest(pdf_paths, pool=None, initial=False):
+            ingested = process_pdfs(pdf_paths, pdf_extractor, thresholds_manager, store, manifest,
+                                    jobs=jobs, force=args.force, pool=pool, profiler=profiler)
+            # L'Excel est un export du stock, généré seulement sur demande
+            print()
+            if args.export_excel and (ingested or initial):
+                excel_manager.export_table(store.to_result_table(), thresholds_manager)
+            elif initial:
+                print(f"[INFO] {ingested} PDF ajouté(s) à {store.store_file}; "
+                      f"passez --export-excel pour générer {excel_manager.output_file}")
+            elif ingested:
+                print(f"[INFO] {ingested} PDF ajouté(s) à {store.store_file}")
+            return ingested
     
     # Message de bienvenue
     if args.dev:
         print("[DEV MODE] Les détails d'extraction seront enregistrés dans dev.txt")
     
+    # Surveillance: l'état du dossier est relevé avant le premier lot, pour que les PDF
+    # arrivés pendant son traitement soient vus comme nouveaux
+    watcher = FolderWatcher(PDF_FOLDER) if args.watch else None
+    
     # Traitement des fichiers PDF
     pdf_files = [f for f in os.listdir(PDF_FOLDER) if f.endswith(".pdf")]
     
     if not pdf_files:
         print(f"[WARN] Aucun fichier PDF trouvé dans {PDF_FOLDER}")
-        return
+        if not args.export_excel and not args.watch:
+            return
+    else:
+        print(f"[INFO] {len(pdf_files)} fichier(s) PDF à traiter")
+    if jobs > 1:
+        print(f"[INFO] Extraction sur {jobs} processus")
     
-    print(f"[INFO] {len(pdf_files)} fichier(s) PDF à traiter")
+    pdf_paths = [os.path.join(PDF_FOLDER, f) for f in pdf_files]
+    ingest(pdf_paths, initial=True)
     
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(PDF_FOLDER, pdf_file)
-        print(f"\n[INFO] Traitement de {pdf_file}...")
-        
-        # Extraction des données
-        date, results = pdf_extractor.extract_data_from_pdf(pdf_path)
-        
-        # Mise à jour Excel
-        excel_manager.update_excel(
-            pdf_path, date, results, thresholds_manager, force=args.force
-        )
+    if args.watch:
+        watch(ingest, pdf_extractor, watcher, jobs=jobs)
+    if store is not None:
+        store.close()
+    dev_logger.close()
     
-    # Post-traitement: colorisation et graphiques
-    print("\n[INFO] Colorisation des valeurs hors normes...")
-    excel_manager.colorize_outliers(thresholds_manager)
-    
-    print("[INFO] Génération des graphiques...")
-    excel_manager.insert_charts()
+    if args.profile or args.profile_dir:
+        profiler.report()
+        profiler.dump_profiles()
+    if args.metrics_json:
+        profiler.write_json(args.metrics_json)
     
     print("\n[SUCCESS] Traitement terminé avec succès!")
     if args.dev:
         print(f"[DEV MODE] Consultez dev.txt pour les détails d'extraction")
 
 
+def plan_work(pdf_paths, manifest, force=False, is_ingested=None, need_patient=False):
+    """
+    Tri par manifeste: les PDF inchangés (même empreinte) ne sont pas rouverts.
+    
+    Args:
+        is_ingested: fonction(entrée du manifeste) -> vrai si ses résultats sont déjà dans le stock
+        need_patient: les entrées mémorisées sans patient (anciens manifestes) sont ré-extraites
+    
+    Returns:
+        list: (pdf_path, sha, résultat mémorisé ou None si à extraire)
+    """
+    work = []
+    seen = {}          # sha -> premier fichier rencontré avec ce contenu
+    for pdf_path in pdf_paths:
+        sha = manifest.file_hash(pdf_path)
+        if sha in seen:
+            print(f"[INFO] {os.path.basename(pdf_path)} identique à {os.path.basename(seen[sha])}, ignoré")
+            manifest.add_alias(pdf_path, sha)
+            continue
+        seen[sha] = pdf_path
+        cached = None if force else manifest.get(sha)
+        if cached and need_patient and "patient" not in cached:
+            cached = None
+        if cached and is_ingested(cached):
+            print(f"[INFO] {os.path.basename(pdf_path)} déjà traité (inchangé), ignoré")
+            manifest.add_alias(pdf_path, sha)
+            continue
+        work.append((pdf_path, sha, cached))
+    return work
+
+
+def iter_extracted(work, pdf_extractor, manifest, jobs=1, pool=None):
+    """
+    Extraction (éventuellement parallèle) des seuls PDF nouveaux ou modifiés, résultats rendus
+    dans l'ordre des fichiers et mémorisés dans le manifeste.
+    
+    Yields:
+        tuple: (pdf_path, sha, date, results, patient)
+    """
+    to_extract = [(pdf_path, sha) for pdf_path, sha, cached in work if cached is None]
+    extracted = extract_all([pdf_path for pdf_path, _ in to_extract], pdf_extractor, jobs=jobs, pool=pool,
+                            shas=[sha for _, sha in to_extract])
+    for pdf_path, sha, cached in work:
+        print(f"\n[INFO] Traitement de {os.path.basename(pdf_path)}...")
+        if cached is None:
+            _, date, results, patient = next(extracted)
+        else:
+            # Absent du stock: on rejoue les résultats mémorisés sans rouvrir le PDF
+            date, results, patient = cached["date"], cached["results"], cached.get("patient")
+        manifest.record(pdf_path, sha, date, results, patient)
+        yield pdf_path, sha, date, results, patient
+
+
+def process_pdfs(pdf_paths, pdf_extractor, thresholds_manager, store, manifest, jobs=1, force=False, pool=None,
+                 profiler=None):
+    """
+    Extrait les PDF nouveaux ou modifiés et ajoute leurs résultats au stock en une transaction.
+    
+    Returns:
+        int: nombre de PDF ajoutés au stock
+    """
+    work = plan_work(pdf_paths, manifest, force, lambda cached: store.has_date(cached["date"]))
+    
+    # Le stock n'est écrit que par ce processus
+    batch = []         # (date, results, sha, fichier) ajoutés au stock en une seule transaction
+    batch_dates = set()
+    for pdf_path, sha, date, results, _ in iter_extracted(work, pdf_extractor, manifest, jobs, pool):
+        if (date in batch_dates or store.has_date(date)) and not force:
+            print(f"[INFO] Date {date} déjà extraite, passez --force pour ré-extraire")
+            continue
+        
+        thresholds_manager.update_from_results(results)
+        batch.append((date, results, sha, os.path.basename(pdf_path)))
+        batch_dates.add(date)
+        print(f"[INFO] {os.path.basename(pdf_path)} -> {len(results)} résultats extraits pour la date {date}")
+    
+    # Ajout au stock sans relire l'existant
+    with (profiler or Profiler()).stage("stock"):
+        store.add_many(batch)
+    manifest.save()
+    # Écrit seulement si des seuils ont été ajoutés
+    thresholds_manager.save_thresholds()
+    return len(batch)
+
+
+def process_by_patient(pdf_paths, pdf_extractor, manifest, jobs=1, force=False, export_excel=False,
+                       color_mode=COLOR_MODE, pool=None):
+    """
+    Variante de process_pdfs pour un dossier partagé par plusieurs patients: chaque PDF
+    est rangé dans le dossier de son patient (stock, seuils et export propres), puis
+    les patients sont traités en parallèle par des processus indépendants.
+    
+    Returns:
+        int: nombre de PDF ajoutés aux stocks
+    """
+    work = plan_work(pdf_paths, manifest, force,
+                     lambda cached: shard_has_date(shard_name(cached.get("patient")), cached["date"]),
+                     need_patient=True)
+    
+    groups = {}        # dossier patient -> [(date, results, sha, fichier)]
+    for pdf_path, sha, date, results, patient in iter_extracted(work, pdf_extractor, manifest, jobs, pool):
+        name = shard_name(patient)
+        groups.setdefault(name, []).append((date, results, sha, os.path.basename(pdf_path)))
+        print(f"[INFO] {os.path.basename(pdf_path)} -> {len(results)} résultats pour la date {date}, "
+              f"patient {patient or UNKNOWN_PATIENT}")
+    manifest.save()
+    if not groups:
+        return 0
+    
+    print()
+    total = 0
+    for name, ingested in process_shards(groups, jobs=jobs, force=force, export_excel=export_excel,
+                                         color_mode=color_mode):
+        print(f"[INFO] {name}: {ingested} PDF ajouté(s)")
+        total += ingested
+    return total
+
+
+def watch(ingest, pdf_extractor, watcher, jobs=1):
+    """
+    Surveille PDF_FOLDER (watcher créé avant le premier lot) et passe à ingest(), par lots
+    toutes les WATCH_INTERVAL secondes, les PDF nouveaux ou modifiés depuis la création du
+    watcher, une fois complètement écrits. Extracteur, seuils,
+    banlist et manifeste restent chargés d'un lot à l'autre, comme le pool de processus
+    (--jobs), démarré au premier lot de plusieurs PDF. Ctrl+C (ou SIGTERM) pour arrêter.
+    """
+    pool = None
+    # Arrêt propre aussi sur SIGTERM (service, kill): même traitement que Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"\n[INFO] Surveillance de {PDF_FOLDER} ({watcher.mode}, lot toutes les {WATCH_INTERVAL:g}s), "
+          "Ctrl+C pour arrêter")
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            watcher.poll()
+            ready = watcher.ready()
+            if not ready:
+                continue
+            print(f"\n[INFO] {len(ready)} PDF nouveau(x) ou modifié(s)")
+            if pool is None and jobs > 1 and len(ready) > 1:
+                pool = start_pool(pdf_extractor, jobs, ready[0])
+            ingest(ready, pool=pool)
+    except KeyboardInterrupt:
+        print("\n[INFO] Surveillance arrêtée")
+    finally:
+        watcher.stop()
+        if pool is not None:
+            pool.shutdown()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'export Excel (ExcelManager.export_table: classeur write-only en une
+passe), pour chaque mode de colorisation (couleurs fixes ou mise en forme conditionnelle).
+
+Chaque cas tourne dans un processus séparé pour mesurer son pic mémoire (RSS).
+
+Usage:
+    python scripts/bench_export.py                    # 10k et 1M cellules
+    python scripts/bench_export.py --sizes 100x100 --no-charts
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# (paramètres, dates): 10k et 1M cellules
+DEFAULT_SIZES = "100x100,2000x500"
+
+
+class _Thresholds:
+    """Seuils vides: Min/Max viennent de la table."""
+
+    def get_threshold(self, param):
+        return {"min": None, "max": None}
+
+    def save_thresholds(self):
+        pass
+
+
+def _build_table(n_params, n_dates):
+    from bench_result_table import make_batches
+    from result_table import ResultTable
+    table = ResultTable(rows=n_params, dates=n_dates)
+    for label, results in make_batches(n_params, n_dates):
+        table.set_results(label, results)
+    return table
+
+
+def _run_case(method, n_params, n_dates, charts, output, queue):
+    import contextlib
+    import io
+    from excel_manager import ExcelManager
+
+    table = _build_table(n_params, n_dates)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    manager = ExcelManager(output_file=output, color_mode=method)
+    thresholds = _Thresholds()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.export_table(table, thresholds, charts=charts)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "seconds": elapsed,
+        "peak_mb": peak / 1024,
+        "delta_mb": (peak - base_rss) / 1024,
+        "size_kb": os.path.getsize(output) / 1024,
+    })
+
+
+def run_case(method, n_params, n_dates, charts):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "bench.xlsx")
+        proc = ctx.Process(target=_run_case, args=(method, n_params, n_dates, charts, output, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'export Excel")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"tailles PARAMÈTRESxDATES séparées par des virgules (défaut: {DEFAULT_SIZES})")
+    parser.add_argument("--no-charts", action="store_true", help="sans la feuille Graphiques")
+    parser.add_argument("--methods", default="fills,conditional", help="modes de colorisation à mesurer")
+    args = parser.parse_args()
+
+    methods = [m.strip() for m in args.methods.split(",") if m.strip()]
+    print(f"{'cellules':>10s} {'mode':>12s} {'temps s':>9s} {'pic RSS MB':>11s} {'+MB export':>11s} {'fichier KB':>11s}")
+    for size in args.sizes.split(","):
+        n_params, n_dates = (int(x) for x in size.lower().split("x"))
+        for method in methods:
+            r = run_case(method, n_params, n_dates, not args.no_charts)
+            print(f"{n_params * n_dates:>10d} {method:>12s} {r['seconds']:9.2f} {r['peak_mb']:11.0f} "
+                  f"{r['delta_mb']:11.0f} {r['size_kb']:11.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
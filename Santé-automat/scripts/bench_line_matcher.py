@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark: classement des lignes par automates (LineMatcher) vs boucle historique
+(startswith sur toute la liste blanche, puis b.lower() in ligne sur toute la banlist).
+
+Génère un corpus synthétique (lignes de résultats, lignes de bruit, lignes bannies)
+et une banlist de taille variable, puis vérifie que les deux méthodes donnent
+les mêmes résultats et le même classement des lignes.
+
+Usage:
+    python scripts/bench_line_matcher.py --lines 200000 --banlist 10,100,1000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from config import PARAMS_WHITELIST
+from line_matcher import LineMatcher
+from pdf_extractor import PDFExtractor
+
+LETTERS = "abcdefghijklmnopqrstuvwxyzéèàç"
+
+
+def make_words(rng, n, min_len=5, max_len=14):
+    return ["".join(rng.choice(list(LETTERS), rng.integers(min_len, max_len))) for _ in range(n)]
+
+
+def make_corpus(n_lines, banlist, seed=0):
+    """Texte synthétique: ~1/3 résultats whitelistés, ~1/3 bruit, ~1/3 lignes bannies."""
+    rng = np.random.default_rng(seed)
+    noise = make_words(rng, 500)
+    lines = []
+    for i in range(n_lines):
+        kind = i % 3
+        if kind == 0:
+            param = PARAMS_WHITELIST[rng.integers(len(PARAMS_WHITELIST))]
+            lines.append(f"{param} {rng.normal(10, 2):.2f} g/L (8,0-12,0)")
+        elif kind == 1:
+            lines.append(" ".join(rng.choice(noise, 6)).capitalize())
+        else:
+            words = list(rng.choice(noise, 5))
+            words.insert(2, banlist[rng.integers(len(banlist))].upper() if banlist else "x")
+            lines.append(" ".join(words))
+    return "\n".join(lines)
+
+
+def legacy_parse(text, banlist):
+    """Reproduction de l'ancien PDFExtractor._parse_results; rend aussi le nombre de lignes bannies."""
+    results = {}
+    banned = 0
+    pattern = re.compile(
+        r"^\s*([A-Za-zÀ-ÿ\s\-\(\)/]+?)\s+([\d,\.]+)\s*([a-zA-Zµ%/]+)?\s*(?:\(([^)]+)\))?"
+    )
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line or len(line) > 120:
+            continue
+        parsed = False
+        for param in PARAMS_WHITELIST:
+            if line.startswith(param):
+                match = pattern.match(line)
+                if match:
+                    try:
+                        value = float(match.group(2).replace(",", "."))
+                        results[param] = {"valeur": value, "unité": match.group(3) or "",
+                                          "intervalle": match.group(4) or ""}
+                        parsed = True
+                    except ValueError:
+                        pass
+                break
+        if parsed:
+            continue
+        line_low = line.lower()
+        if any(b.lower() in line_low for b in banlist):
+            banned += 1
+            continue
+    return results, banned
+
+
+def matcher_banned(text, matcher):
+    """Lignes non parsées classées bannies par l'automate (même filtre que _parse_results)."""
+    banned = 0
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line or len(line) > 120:
+            continue
+        if matcher.param(line) is not None:
+            continue
+        if matcher.is_banned(line):
+            banned += 1
+    return banned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LineMatcher vs boucle historique")
+    parser.add_argument("--lines", type=int, default=200000, help="nombre de lignes du corpus")
+    parser.add_argument("--banlist", default="10,100,1000", help="tailles de banlist séparées par des virgules")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(f"{'banlist':>8s} {'historique s':>13s} {'automates s':>12s} {'accélération':>13s}")
+    for size in (int(x) for x in args.banlist.split(",")):
+        banlist = make_words(rng, size)
+        text = make_corpus(args.lines, banlist)
+
+        extractor = PDFExtractor()
+        extractor.banlist = banlist
+        start = time.perf_counter()
+        extractor.matcher = LineMatcher(PARAMS_WHITELIST, banlist)
+        results = extractor._parse_results(text)
+        new_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy_results, legacy_banned = legacy_parse(text, banlist)
+        legacy_s = time.perf_counter() - start
+
+        same = {k: v["valeur"] for k, v in results.items()} == {k: v["valeur"] for k, v in legacy_results.items()}
+        if not same or matcher_banned(text, extractor.matcher) != legacy_banned:
+            print(f"[WARN] Classement différent pour une banlist de {size} termes")
+            return 1
+        print(f"{size:>8d} {legacy_s:13.3f} {new_s:12.3f} {legacy_s / new_s:12.1f}x")
+    print("[INFO] Résultats et lignes bannies identiques")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
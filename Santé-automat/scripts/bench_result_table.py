@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: table des résultats indexée (ResultTable) vs mise à jour DataFrame
+historique (df.loc[df["Paramètre"] == param, ...] + df.loc[len(df)] = ...).
+
+Simule des PDF synthétiques (un par date) contenant chacun tous les paramètres.
+L'ancienne méthode étant quadratique, elle n'est mesurée que sur les premières
+dates (--legacy-dates) et le temps par date est affiché pour comparaison.
+
+Usage:
+    python scripts/bench_result_table.py --params 2000 --dates 300
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from result_table import ResultTable
+
+
+def make_batches(n_params, n_dates, seed=0):
+    """Liste de (date, results) synthétiques."""
+    rng = np.random.default_rng(seed)
+    names = [f"Paramètre {i:05d}" for i in range(n_params)]
+    start = date(2000, 1, 1)
+    batches = []
+    for d in range(n_dates):
+        label = (start + timedelta(days=7 * d)).strftime("%d-%m-%Y")
+        values = rng.normal(10, 2, n_params)
+        results = {
+            name: {"valeur": float(v), "unité": "g/L", "min": 8.0, "max": 12.0}
+            for name, v in zip(names, values)
+        }
+        batches.append((label, results))
+    return batches
+
+
+def legacy_apply(df, date_label, results):
+    """Reproduction de l'ancien ExcelManager.update_excel (hors lecture/écriture)."""
+    if "Paramètre" not in df.columns:
+        df["Paramètre"] = list(results.keys())
+    for base_col in ["Unité", "Min", "Max"]:
+        if base_col not in df.columns:
+            df[base_col] = None
+    if date_label not in df.columns:
+        df[date_label] = None
+    for param, info in results.items():
+        if param not in df["Paramètre"].values:
+            df.loc[len(df)] = [param] + [None] * (len(df.columns) - 1)
+        df.loc[df["Paramètre"] == param, date_label] = info["valeur"]
+        if info.get("unité") is not None:
+            df.loc[df["Paramètre"] == param, "Unité"] = info["unité"]
+        if info.get("min") is not None:
+            df.loc[df["Paramètre"] == param, "Min"] = info["min"]
+        if info.get("max") is not None:
+            df.loc[df["Paramètre"] == param, "Max"] = info["max"]
+    return df
+
+
+def bench_table(batches):
+    table = ResultTable()
+    start = time.perf_counter()
+    for label, results in batches:
+        table.set_results(label, results)
+    apply_s = time.perf_counter() - start
+    start = time.perf_counter()
+    df = table.to_dataframe()
+    serialize_s = time.perf_counter() - start
+    return table, df, apply_s, serialize_s
+
+
+def bench_legacy(batches):
+    df = pd.DataFrame()
+    start = time.perf_counter()
+    for label, results in batches:
+        df = legacy_apply(df, label, results)
+    return df, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ResultTable vs DataFrame")
+    parser.add_argument("--params", type=int, default=2000, help="nombre de paramètres")
+    parser.add_argument("--dates", type=int, default=300, help="nombre de dates (PDF)")
+    parser.add_argument("--legacy-dates", type=int, default=3,
+                        help="dates mesurées avec l'ancienne méthode (0 pour ignorer)")
+    args = parser.parse_args()
+
+    print(f"[INFO] Génération de {args.dates} PDF x {args.params} paramètres...")
+    batches = make_batches(args.params, args.dates)
+
+    table, df, apply_s, serialize_s = bench_table(batches)
+    cells = args.params * args.dates
+    print(f"ResultTable : {apply_s:8.3f}s mise à jour ({apply_s / args.dates * 1000:.2f} ms/date, "
+          f"{cells / apply_s / 1e6:.2f} M cellules/s)")
+    print(f"              {serialize_s:8.3f}s conversion DataFrame ({df.shape[0]} x {df.shape[1]})")
+
+    if args.legacy_dates:
+        subset = batches[:args.legacy_dates]
+        legacy_df, legacy_s = bench_legacy(subset)
+        per_date = legacy_s / len(subset)
+        print(f"DataFrame   : {legacy_s:8.3f}s pour {len(subset)} date(s) ({per_date * 1000:.0f} ms/date, "
+              f"~{per_date * args.dates:.0f}s extrapolé pour {args.dates} dates)")
+        print(f"Accélération par date: x{per_date / (apply_s / args.dates):.0f}")
+
+        # Vérification: mêmes valeurs sur les dates communes
+        small, small_df, _, _ = bench_table(subset)
+        for label, _ in subset:
+            a = pd.to_numeric(legacy_df[label]).to_numpy(dtype=float)
+            b = small_df[label].to_numpy(dtype=float)
+            if not np.allclose(a, b, equal_nan=True):
+                print(f"[WARN] Valeurs différentes pour {label}")
+                return 1
+        print("[INFO] Résultats identiques sur les dates communes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,12 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
 
+def _check(condition, message):
+    """Affiche le résultat d'une vérification et le retourne."""
+    print(f"  {'✅' if condition else '❌'} {message}")
+    return bool(condition)
+
+
 def test_imports():
     """Test que tous les modules peuvent être importés."""
     print("🧪 Test 1: Import des modules")
@@ -19,7 +25,16 @@ def test_imports():
         "dev_logger",
         "pdf_extractor",
         "thresholds_manager",
-        "excel_manager"
+        "excel_manager",
+        "manifest",
+        "result_table",
+        "observation_store",
+        "line_matcher",
+        "text_backends",
+        "text_cache",
+        "watcher",
+        "shards",
+        "profiler"
     ]
     
     for module in modules:
@@ -71,6 +86,7 @@ def test_dev_logger():
         logger = DevLogger(enabled=True, log_file="test_dev.txt")
         logger.log_separator("TEST")
         logger.log_message("Message de test")
+        logger.close()
         
         # Vérifier que le fichier existe
         if os.path.exists("test_dev.txt"):
@@ -183,6 +199,693 @@ def test_file_structure():
     return all_exist
 
 
+def test_backend_resolution():
+    """Test du choix automatique du moteur d'extraction (resolve_backend)."""
+    print("🧪 Test 8: Choix du moteur PDF")
+    print("─" * 50)
+    
+    import pdf_extractor
+    from pdf_extractor import PDFExtractor
+    
+    saved = []
+    load, save, available = (pdf_extractor.load_auto_choice, pdf_extractor.save_auto_choice,
+                             pdf_extractor.available_backends)
+    pdf_extractor.load_auto_choice = lambda: None
+    pdf_extractor.save_auto_choice = lambda backend, timings, sample: saved.append(backend)
+    
+    def resolve(installed, extract):
+        pdf_extractor.available_backends = lambda: list(installed)
+        extractor = PDFExtractor(backend="auto", text_cache_file=None)
+        extractor._extract_with = extract
+        return extractor.resolve_backend("echantillon.pdf")
+    
+    def broken_pdfminer(name, pdf):
+        if name == "pdfminer":
+            raise ValueError("PDF illisible")
+        return None, "01-02-2024", {"Hémoglobine": {"valeur": 13.5}}
+    
+    ok = True
+    try:
+        # Échantillon daté mais sans résultat: pas de comparaison possible, rien n'est mémorisé
+        chosen = resolve(["pdfplumber", "pdfminer"], lambda name, pdf: ("DUPONT Jean", "01-02-2024", {}))
+        ok &= _check(chosen == "pdfplumber" and not saved, f"Échantillon sans résultat: {chosen}, choix non mémorisé")
+        
+        # Échantillon avec résultats: choix mémorisé
+        chosen = resolve(["pdfplumber", "pdfminer"], broken_pdfminer)
+        ok &= _check(chosen == "pdfplumber" and saved == [chosen], f"Échantillon avec résultats: {chosen}, choix mémorisé")
+        saved.clear()
+        
+        # pdfplumber absent: premier moteur installé qui lit l'échantillon, choix non mémorisé
+        chosen = resolve(["pdfminer", "pdftotext"], broken_pdfminer)
+        ok &= _check(chosen == "pdftotext" and not saved, f"Sans pdfplumber: {chosen}, choix non mémorisé")
+        
+        try:
+            resolve([], broken_pdfminer)
+            ok &= _check(False, "Aucun moteur installé: pas d'erreur")
+        except RuntimeError as e:
+            ok &= _check("Aucun moteur" in str(e), "Aucun moteur installé: erreur explicite")
+        
+        # Moteur imposé: aucun banc d'essai
+        ok &= _check(PDFExtractor(backend="pdfminer", text_cache_file=None).resolve_backend("echantillon.pdf")
+                     == "pdfminer", "Moteur imposé conservé")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    finally:
+        pdf_extractor.load_auto_choice, pdf_extractor.save_auto_choice = load, save
+        pdf_extractor.available_backends = available
+    print()
+    return ok
+
+
+def test_manifest():
+    """Test du manifeste des PDF traités (doublons par empreinte du contenu)."""
+    print("🧪 Test 9: Manifeste des PDF")
+    print("─" * 50)
+    
+    import tempfile
+    from manifest import ProcessedManifest
+    
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest_file = os.path.join(tmp, "processed.json")
+            first, copy, other = (os.path.join(tmp, n) for n in ("a.pdf", "copie de a.pdf", "b.pdf"))
+            for path, content in ((first, b"%PDF-1.4 A\n%%EOF\n"), (copy, b"%PDF-1.4 A\n%%EOF\n"),
+                                  (other, b"%PDF-1.4 B\n%%EOF\n")):
+                with open(path, "wb") as f:
+                    f.write(content)
+            
+            manifest = ProcessedManifest(manifest_file)
+            sha = manifest.file_hash(first)
+            ok &= _check(manifest.file_hash(copy) == sha, "Même contenu, même empreinte")
+            ok &= _check(manifest.file_hash(other) != sha, "Contenu différent, empreinte différente")
+            
+            results = {"Hémoglobine": {"valeur": 13.5, "unite": "g/dL", "min": 13.0, "max": 17.0}}
+            manifest.record(first, sha, "01-02-2024", results, "DUPONT Jean")
+            entry = manifest.get(manifest.file_hash(copy))
+            ok &= _check(entry is not None and entry["results"] == results, "Copie reconnue comme déjà traitée")
+            manifest.add_alias(copy, sha)
+            manifest.save()
+            
+            reloaded = ProcessedManifest(manifest_file)
+            entry = reloaded.get(sha)
+            ok &= _check(entry == {"date": "01-02-2024", "results": results, "files": ["a.pdf", "copie de a.pdf"],
+                            "patient": "DUPONT Jean"}, "Manifeste relu à l'identique")
+            
+            # Rien de nouveau: pas de réécriture
+            mtime = os.stat(manifest_file).st_mtime_ns
+            reloaded.file_hash(first)
+            reloaded.record(first, sha, "01-02-2024", results, "DUPONT Jean")
+            reloaded.save()
+            ok &= _check(os.stat(manifest_file).st_mtime_ns == mtime, "Manifeste inchangé non réécrit")
+            
+            # Fichier modifié (taille différente): empreinte recalculée
+            with open(first, "ab") as f:
+                f.write(b"%%EOF\n")
+            ok &= _check(reloaded.file_hash(first) != sha, "Fichier modifié: nouvelle empreinte")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def _sample_batches(n_params=70, n_dates=10):
+    """Résultats de PDF [(date, results)] assez nombreux pour agrandir la table (lignes et dates)."""
+    batches = []
+    for d in range(n_dates):
+        results = {}
+        for p in range(n_params):
+            if (p + d) % 7 == 0:
+                continue  # paramètre absent de ce compte rendu
+            results[f"Paramètre {p}"] = {"valeur": round(1 + p * 0.5 + d * 0.1, 2), "unité": "g/L",
+                                         "min": 1.0 if p % 3 else None, "max": 40.0 if p % 3 else None}
+        batches.append((f"{d + 1:02d}-0{d % 9 + 1}-2023", results))
+    return batches
+
+
+def test_result_table():
+    """Test de la table des résultats (aller-retour DataFrame)."""
+    print("🧪 Test 10: ResultTable")
+    print("─" * 50)
+    
+    import numpy as np
+    import pandas as pd
+    from result_table import ResultTable
+    
+    ok = True
+    try:
+        table = ResultTable(rows=4, dates=2)
+        for date, results in _sample_batches():
+            table.set_results(date, results)
+        ok &= _check(len(table) == 70 and len(table.dates) == 10, "Table agrandie: 70 paramètres x 10 dates")
+        
+        r = table.index["Paramètre 5"]
+        ok &= _check(table.values[r, table.date_index["01-01-2023"]] == 3.5, "Valeur retrouvée par paramètre et date")
+        ok &= _check(np.isnan(table.values[r, table.date_index["03-03-2023"]]), "Valeur absente: NaN")
+        
+        # Cellules saisies à la main: texte et colonne non datée
+        df = table.to_dataframe()
+        df.loc[0, "01-01-2023"] = "<0,5"
+        df["Commentaire"] = None
+        df.loc[1, "Commentaire"] = "à surveiller"
+        again = ResultTable.from_dataframe(df).to_dataframe()
+        pd.testing.assert_frame_equal(again, df, check_dtype=False)
+        ok &= _check(True, "Aller-retour DataFrame -> table -> DataFrame identique (texte et colonnes libres)")
+        
+        # Nouveau PDF à la même date: la valeur remplace le texte
+        table = ResultTable.from_dataframe(df)
+        table.set_results("01-01-2023", {table.params[0]: {"valeur": 0.4}})
+        ok &= _check(table.to_dataframe().loc[0, "01-01-2023"] == 0.4, "Texte remplacé par une nouvelle valeur")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_observation_store():
+    """Test du stock SQLite des observations (aller-retour stock -> Excel -> stock)."""
+    print("🧪 Test 11: ObservationStore")
+    print("─" * 50)
+    
+    import tempfile
+    import pandas as pd
+    from observation_store import ObservationStore
+    from result_table import ResultTable
+    from excel_manager import ExcelManager
+    
+    class NoThresholds:
+        def get_threshold(self, param):
+            return {"min": None, "max": None}
+    
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            batches = _sample_batches()
+            expected = ResultTable()
+            for date, results in batches:
+                expected.set_results(date, results)
+            expected = expected.to_dataframe()
+            
+            store = ObservationStore(os.path.join(tmp, "resultats.sqlite"))
+            store.add_many([(date, results, None, f"{date}.pdf") for date, results in batches])
+            ok &= _check(store.has_date("01-01-2023") and not store.has_date("01-01-2024"), "Dates connues du stock")
+            ok &= _check([d for d, _ in store.history("Paramètre 5")][:2] == ["01-01-2023", "02-02-2023"],
+                         "Historique d'un paramètre en ordre chronologique")
+            
+            table = store.to_result_table()
+            pd.testing.assert_frame_equal(table.to_dataframe(), expected, check_dtype=False)
+            ok &= _check(True, "Stock -> table identique à la table construite directement")
+            
+            # Export puis import dans un nouveau stock
+            output = os.path.join(tmp, "resultats.xlsx")
+            ExcelManager(output, "fills").export_table(table, NoThresholds(), colorize=False, charts=False)
+            imported = ObservationStore(os.path.join(tmp, "import.sqlite"))
+            imported.import_excel(output)
+            pd.testing.assert_frame_equal(imported.to_result_table().to_dataframe(), expected, check_dtype=False)
+            ok &= _check(True, "Stock -> Excel -> stock identique")
+            
+            # Même date ré-ajoutée: remplacement, pas de doublon
+            store.add_results("01-01-2023", {"Paramètre 1": {"valeur": 9.9}})
+            again = store.to_result_table()
+            ok &= _check(len(again.dates) == 10 and again.values[again.index["Paramètre 1"],
+                                                                again.date_index["01-01-2023"]] == 9.9,
+                         "Date ré-ajoutée: valeur remplacée sans doublon")
+            store.close()
+            imported.close()
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_thresholds_dirty_save():
+    """Test de l'enregistrement des seuils: seulement s'il y a du nouveau."""
+    print("🧪 Test 12: Enregistrement des seuils")
+    print("─" * 50)
+    
+    import json
+    import tempfile
+    from thresholds_manager import ThresholdsManager, DEFAULT_THRESHOLD
+    
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "seuils.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"Hémoglobine": {"min": "13,0", "max": 17}}, f)
+            
+            manager = ThresholdsManager(path)
+            ok &= _check(manager.get_threshold("Hémoglobine") == {"min": 13.0, "max": 17.0},
+                         "Seuils lus (virgule décimale acceptée)")
+            ok &= _check(not manager.save_thresholds(), "Rien de nouveau: fichier non réécrit")
+            
+            # Paramètre connu ou seuils incomplets: pas de modification
+            manager.update_from_results({"Hémoglobine": {"valeur": 12, "min": 12.0, "max": 16.0},
+                                         "Plaquettes": {"valeur": 250, "min": 150, "max": None}})
+            ok &= _check(not manager.dirty and not manager.save_thresholds(), "Seuils existants conservés")
+            
+            manager.update_from_results({"Ferritine": {"valeur": 80, "min": 30, "max": 400}})
+            ok &= _check(manager.dirty == {"Ferritine"} and manager.save_thresholds(), "Nouveau paramètre enregistré")
+            ok &= _check(not manager.dirty and not manager.save_thresholds(), "Second enregistrement évité")
+            
+            reloaded = ThresholdsManager(path)
+            ok &= _check(reloaded.get_threshold("Ferritine") == {"min": 30, "max": 400}, "Seuils relus après écriture")
+            
+            # Seuil par défaut partagé, non modifiable
+            try:
+                reloaded.get_threshold("Inconnu")["min"] = 1
+                ok &= _check(False, "Seuil par défaut modifiable")
+            except TypeError:
+                ok &= _check(DEFAULT_THRESHOLD["min"] is None, "Seuil par défaut non modifiable")
+            
+            # Nouveau dossier patient: seuils globaux recopiés une fois
+            patient = ThresholdsManager(os.path.join(tmp, "patient", "seuils.json"))
+            patient.seed(reloaded.thresholds)
+            ok &= _check(patient.save_thresholds() and not patient.save_thresholds(), "Seuils globaux recopiés une fois")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_backend_cache():
+    """Test des moteurs d'extraction et du choix mis en cache (mode auto)."""
+    print("🧪 Test 13: Moteurs PDF et cache du choix")
+    print("─" * 50)
+    
+    import json
+    import tempfile
+    from text_backends import available_backends, iter_pages, load_auto_choice, save_auto_choice
+    
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = os.path.join(tmp, "pdf_backend.json")
+            ok &= _check(load_auto_choice(cache) is None, "Sans cache: pas de choix")
+            save_auto_choice("pdfminer", {"pdfplumber": 0.2, "pdfminer": 0.1}, "echantillon.pdf", cache_file=cache)
+            ok &= _check(load_auto_choice(cache) == "pdfminer", "Choix relu depuis le cache")
+            
+            # Moteurs installés différents (mise à jour, désinstallation): cache périmé
+            with open(cache, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data["environment"]["pdfplumber"] = "pdfplumber 0.0"
+            with open(cache, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            ok &= _check(load_auto_choice(cache) is None, "Versions changées: cache ignoré")
+            
+            with open(cache, "w", encoding="utf-8") as f:
+                f.write("{")
+            ok &= _check(load_auto_choice(cache) is None, "Cache illisible ignoré")
+        
+        try:
+            iter_pages("inconnu", "echantillon.pdf")
+            ok &= _check(False, "Moteur inconnu accepté")
+        except ValueError:
+            ok &= _check(True, "Moteur inconnu refusé")
+        
+        # Chaque moteur installé lit la première page d'un PDF d'exemple, à la demande
+        pdf_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pdfs")
+        samples = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf")) if os.path.isdir(pdf_dir) else []
+        if samples:
+            sample = os.path.join(pdf_dir, samples[0])
+            for name in available_backends():
+                pages = iter_pages(name, sample)
+                first = next(pages, "")
+                pages.close()
+                ok &= _check(first.strip(), f"{name}: première page lue ({samples[0]})")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_watcher():
+    """Test de la surveillance du dossier (PDF rendus une fois complètement écrits)."""
+    print("🧪 Test 14: Surveillance du dossier")
+    print("─" * 50)
+    
+    import tempfile
+    import time
+    from watcher import FolderWatcher
+    
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            existing = os.path.join(tmp, "ancien.pdf")
+            with open(existing, "wb") as f:
+                f.write(b"%PDF-1.4 ancien\n%%EOF\n")
+            watcher = FolderWatcher(tmp, settle=0.2, use_watchdog=False, eof_timeout=0.6)
+            
+            # Copie en cours: pas encore de %%EOF
+            path = os.path.join(tmp, "nouveau.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4 debut")
+            watcher.poll()
+            ok &= _check(watcher.ready() == [], "PDF déjà présent ignoré, PDF en cours d'écriture attendu")
+            
+            with open(path, "ab") as f:
+                f.write(b" fin\n%%EOF\n")
+            watcher.poll()
+            ok &= _check(watcher.ready() == [], "PDF modifié: attente de stabilisation")
+            time.sleep(0.3)
+            watcher.poll()
+            ok &= _check(watcher.ready() == [path], "PDF stable et terminé rendu")
+            watcher.poll()
+            ok &= _check(watcher.ready() == [], "PDF rendu une seule fois")
+            
+            # Stable mais sans %%EOF: rendu après eof_timeout, avec un avertissement
+            truncated = os.path.join(tmp, "tronque.pdf")
+            with open(truncated, "wb") as f:
+                f.write(b"%PDF-1.4 tronque")
+            watcher.poll()
+            time.sleep(0.3)
+            ok &= _check(watcher.ready() == [], "PDF sans %%EOF attendu")
+            time.sleep(0.4)
+            ok &= _check(watcher.ready() == [truncated] and not watcher.pending, "PDF sans %%EOF rendu après le délai")
+            
+            # Supprimé avant d'être stable: oublié
+            gone = os.path.join(tmp, "supprime.pdf")
+            with open(gone, "wb") as f:
+                f.write(b"%PDF-1.4")
+            watcher.poll()
+            os.remove(gone)
+            ok &= _check(watcher.ready() == [] and not watcher.pending, "PDF supprimé oublié")
+            watcher.stop()
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_chart_reuse():
+    """Test de l'export Excel: graphiques inchangés repris du dernier export."""
+    print("🧪 Test 15: Graphiques réutilisés")
+    print("─" * 50)
+    
+    import contextlib
+    import io
+    import tempfile
+    import zipfile
+    import excel_manager
+    from excel_manager import ExcelManager
+    from result_table import ResultTable
+    
+    class Thresholds:
+        def __init__(self):
+            self.thresholds = {}
+        
+        def get_threshold(self, param):
+            return self.thresholds.get(param, {"min": None, "max": None})
+    
+    built = []
+    make_chart = excel_manager._make_chart
+    
+    def counting(ws, param, *args):
+        built.append(param)
+        return make_chart(ws, param, *args)
+    
+    def charts_xml(path):
+        with zipfile.ZipFile(path) as z:
+            return {n: z.read(n) for n in z.namelist() if n.startswith("xl/charts/")}
+    
+    def export(manager, table, thresholds):
+        built.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.export_table(table, thresholds)
+        return sorted(built)
+    
+    ok = True
+    excel_manager._make_chart = counting
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            table = ResultTable()
+            for date, results in _sample_batches(n_params=6, n_dates=4):
+                table.set_results(date, results)
+            thresholds = Thresholds()
+            manager = ExcelManager(os.path.join(tmp, "resultats.xlsx"), "fills")
+            
+            ok &= _check(len(export(manager, table, thresholds)) == 6, "Premier export: 6 graphiques construits")
+            first = charts_xml(manager.output_file)
+            ok &= _check(export(manager, table, thresholds) == [], "Export inchangé: aucun graphique reconstruit")
+            ok &= _check(charts_xml(manager.output_file) == first, "Graphiques repris identiques octet par octet")
+            
+            thresholds.thresholds["Paramètre 0"] = {"min": 0.0, "max": 1.0}
+            ok &= _check(export(manager, table, thresholds) == ["Paramètre 0"], "Seuil modifié: un seul graphique refait")
+            
+            table.set_results("01-01-2023", {"Paramètre 3": {"valeur": 99.0}})
+            ok &= _check(export(manager, table, thresholds) == ["Paramètre 3"], "Valeur modifiée: un seul graphique refait")
+            
+            table.set_results("01-01-2025", {"Paramètre 3": {"valeur": 5.0}})
+            ok &= _check(len(export(manager, table, thresholds)) == 6, "Nouvelle date: plage de tous les graphiques refaite")
+            
+            with open(manager.charts_file, "w", encoding="utf-8") as f:
+                f.write("{")
+            ok &= _check(len(export(manager, table, thresholds)) == 6, "Cache des graphiques illisible: tout est reconstruit")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    finally:
+        excel_manager._make_chart = make_chart
+    print()
+    return ok
+
+
+def test_text_cache():
+    """Test du cache du texte des PDF (reprise d'une lecture partielle, invalidation)."""
+    print("🧪 Test 16: Cache du texte des PDF")
+    print("─" * 50)
+    
+    import tempfile
+    import text_cache
+    from text_cache import TextCache
+    
+    n_pages = 5
+    version = {"pdfminer": "pdfminer 1.0"}
+    rendered = []       # première page rendue par le moteur, à chaque ouverture du PDF
+    
+    def fake_iter_pages(backend, pdf_path, start=0):
+        rendered.append(start)
+        for i in range(start, n_pages):
+            yield f"page {i}"
+    
+    def read(cache, n=None):
+        rendered.clear()
+        pages = cache.iter_pages("sha", "pdfminer", "rapport.pdf")
+        texts = []
+        for text in pages:
+            texts.append(text)
+            if len(texts) == n:
+                break
+        pages.close()
+        return texts
+    
+    expected = [f"page {i}" for i in range(n_pages)]
+    iter_pages, backend_version = text_cache.iter_pages, text_cache.backend_version
+    ok = True
+    text_cache.iter_pages = fake_iter_pages
+    text_cache.backend_version = version.get
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = TextCache(os.path.join(tmp, "text_cache.sqlite"))
+            try:
+                ok &= _check(read(cache, 2) == expected[:2] and rendered == [0], "Lecture arrêtée après 2 pages")
+                ok &= _check(read(cache) == expected and rendered == [2],
+                             "Entrée partielle reprise: seules les pages 2 à 4 sont rendues")
+                ok &= _check(read(cache) == expected and rendered == [],
+                             "Entrée complète: le PDF n'est plus ouvert")
+                
+                version["pdfminer"] = "pdfminer 2.0"
+                ok &= _check(read(cache) == expected and rendered == [0],
+                             "Version du moteur changée: texte relu depuis la première page")
+            finally:
+                cache.close()
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    finally:
+        text_cache.iter_pages, text_cache.backend_version = iter_pages, backend_version
+    print()
+    return ok
+
+
+def test_line_matcher():
+    """Test de la reconnaissance des lignes (liste blanche et banlist) face aux boucles d'origine."""
+    print("🧪 Test 17: Liste blanche et banlist")
+    print("─" * 50)
+    
+    import random
+    from line_matcher import PrefixMatcher, SubstringMatcher
+    
+    def first_prefix(words, line):
+        for word in words:
+            if word and line.startswith(word):
+                return word
+        return None
+    
+    ok = True
+    try:
+        # Préfixes imbriqués: le premier de la liste l'emporte, pas le plus long
+        words = ["Hémoglobine glyquée", "Hémoglobine", "Hém", "Hémoglobine", "Plaquettes"]
+        lines = ["Hémoglobine glyquée 5.6 %", "Hémoglobine 14.2 g/dL", "Hématocrite 42 %",
+                 "Plaquettes 250", "Leucocytes 6.1", "Hé", ""]
+        for order in (words, list(reversed(words))):
+            matcher = PrefixMatcher(order)
+            ok &= _check(all(matcher.match(line) == first_prefix(order, line) for line in lines),
+                         f"Préfixes imbriqués, ordre {order[:3]}: même paramètre que startswith")
+        ok &= _check(PrefixMatcher(["Hém", "Hémoglobine"]).match("Hémoglobine 14") == "Hém",
+                     "Le premier préfixe de la liste fait foi")
+        
+        # Motifs imbriqués et chevauchants (he/she/hers/ushers...) plus du remplissage aléatoire
+        rng = random.Random(0)
+        nested = ["he", "she", "his", "hers", "ushers", "aa", "aaa", "abab", "bab", "référence", "réf"]
+        filler = ["".join(rng.choice("abcdehirsu") for _ in range(rng.randint(3, 6))) for _ in range(40)]
+        patterns = nested + filler
+        texts = ["ushers", "ahishers", "xyz", "", "bab", "abba", "valeur de référence", "réfé"]
+        texts += ["".join(rng.choice("abcdehirsuxé ") for _ in range(rng.randint(0, 30))) for _ in range(2000)]
+        for label, pats in (("automate", patterns), ("liste", nested)):
+            matcher = SubstringMatcher(pats)
+            mode = "automate" if matcher.patterns is None else "liste"
+            ok &= _check(mode == label, f"{len(pats)} motifs: parcours par {mode}")
+            mismatches = [t for t in texts if matcher.search(t) != any(p in t for p in pats)]
+            ok &= _check(not mismatches, f"{label}: mêmes lignes que `in` sur {len(texts)} textes"
+                                         + (f" (écart: {mismatches[:3]})" if mismatches else ""))
+            # Chaque motif, seul ou entouré, est trouvé
+            ok &= _check(all(matcher.search(f"x{p}y") for p in pats), f"{label}: chaque motif trouvé dans une ligne")
+        ok &= _check(not SubstringMatcher([]).search("texte"), "Banlist vide: aucune ligne bannie")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_shards():
+    """Test du traitement par patient: nom de dossier, patient de l'en-tête, dates déjà présentes."""
+    print("🧪 Test 18: Dossiers patients")
+    print("─" * 50)
+    
+    import tempfile
+    from pdf_extractor import parse_patient
+    from shards import UNKNOWN_PATIENT, ingest_shard, shard_has_date, shard_name
+    
+    ok = True
+    try:
+        ok &= _check(shard_name("DUPONT Hélène 01-02-1980") == "DUPONT_Helene_01-02-1980",
+                     "Accents retirés, espaces remplacés")
+        ok &= _check(shard_name("../O'BRIEN Zoë/x") == "___O_BRIEN_Zoe_x", "Séparateurs de chemin neutralisés")
+        ok &= _check(shard_name(None) == UNKNOWN_PATIENT and shard_name("") == UNKNOWN_PATIENT,
+                     "Patient absent: dossier inconnu")
+        ok &= _check(shard_name("李") == UNKNOWN_PATIENT, "Nom sans caractère ASCII: dossier inconnu")
+        
+        ok &= _check(parse_patient(["Laboratoire", "Patient : MME DUPONT Hélène", "Date de naissance : 01/02/1980"])
+                     == "DUPONT Hélène 01-02-1980", "Nom sur la ligne Patient, civilité retirée, date normalisée")
+        ok &= _check(parse_patient(["Patient :", "", "M. MARTIN Paul", "Date de naissance : 03−04−1975"])
+                     == "MARTIN Paul 03-04-1975", "Nom sur la ligne suivante")
+        ok &= _check(parse_patient(["Patient : DURAND Marc", "Hémoglobine 14.2 g/dL"]) == "DURAND Marc",
+                     "Sans date de naissance: nom seul")
+        ok &= _check(parse_patient(["Date de naissance : 01-02-1980", "Hémoglobine 14.2"]) is None,
+                     "Sans ligne Patient: None")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            name = shard_name("DUPONT Hélène 01-02-1980")
+            ok &= _check(not shard_has_date(name, "01-01-2023", root=tmp), "Dossier absent: aucune date")
+            batch = [(date, results, f"sha{i}", f"r{i}.pdf")
+                     for i, (date, results) in enumerate(_sample_batches(n_params=3, n_dates=2))]
+            ok &= _check(ingest_shard(name, batch, root=tmp) == (name, 2), "Premier ajout: 2 PDF")
+            ok &= _check(shard_has_date(name, batch[0][0], root=tmp), "Date présente dans le stock du patient")
+            ok &= _check(not shard_has_date(name, "31-12-1999", root=tmp), "Date absente")
+            again = batch + [(batch[0][0], batch[0][1], "sha-doublon", "copie.pdf")]
+            ok &= _check(ingest_shard(name, again, root=tmp) == (name, 0), "Dates déjà présentes ignorées")
+            ok &= _check(ingest_shard(name, batch[:1], force=True, root=tmp) == (name, 1), "--force: date réingérée")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_profiler_split():
+    """Test de la répartition des temps entre rendu des pages (texte) et analyse."""
+    print("🧪 Test 19: Temps texte / analyse")
+    print("─" * 50)
+    
+    import time
+    from profiler import Profiler
+    
+    def slow_pages(n, delay):
+        for i in range(n):
+            time.sleep(delay)
+            yield f"page {i}"
+    
+    ok = True
+    try:
+        profiler = Profiler(enabled=True)
+        with profiler.split(slow_pages(2, 0.05), "texte", "analyse", "rapport.pdf") as pages:
+            for _ in pages:
+                time.sleep(0.02)
+            time.sleep(0.04)
+        walls = {stage: wall for item, stage, wall, cpu in profiler.records if item == "rapport.pdf"}
+        ok &= _check(set(walls) == {"texte", "analyse"}, "Une mesure par étape")
+        ok &= _check(0.1 <= walls["texte"] < 0.17, f"Rendu des pages compté en texte ({walls['texte']:.3f}s, attendu ~0.10s)")
+        ok &= _check(0.08 <= walls["analyse"] < 0.17, f"Reste du bloc compté en analyse ({walls['analyse']:.3f}s, attendu ~0.08s)")
+        
+        profiler = Profiler(enabled=False)
+        pages = iter(["page 0"])
+        with profiler.split(pages, "texte", "analyse") as timed:
+            ok &= _check(timed is pages and not profiler.records, "Désactivé: itérateur rendu tel quel, aucune mesure")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
+def test_dev_logger_flush():
+    """Test du log de développement: un seul fichier ouvert, vidé après chaque PDF."""
+    print("🧪 Test 20: Log de développement tamponné")
+    print("─" * 50)
+    
+    import tempfile
+    from dev_logger import DevLogger
+    
+    def on_disk(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    
+    result = {"Glucose": {"valeur": 5.1, "unité": "mmol/L", "intervalle": "3.9-5.8", "min": 3.9, "max": 5.8}}
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dev.txt")
+            logger = DevLogger(enabled=True, log_file=path)
+            handle = logger._f
+            try:
+                for pdf_name in ("a.pdf", "b.pdf"):
+                    logger.log_extracted_date(pdf_name, "01-01-2023")
+                    logger.log_raw_text(pdf_name, f"texte brut de {pdf_name}")
+                    ok &= _check(f"texte brut de {pdf_name}" not in on_disk(path), f"{pdf_name}: log tamponné en cours de PDF")
+                    logger.log_filtered_results(pdf_name, result)
+                    ok &= _check(f"RÉSULTATS FILTRÉS POUR: {pdf_name}" in on_disk(path), f"{pdf_name}: log vidé à la fin du PDF")
+                ok &= _check(logger._f is handle, "Un seul fichier ouvert pour tous les PDF")
+            finally:
+                logger.close()
+            ok &= _check(handle.closed, "Fichier fermé par close()")
+            logger.log_message("après fermeture")
+            ok &= _check("après fermeture" not in on_disk(path), "Logs ignorés après close()")
+    except Exception as e:
+        print(f"  ❌ Erreur: {e}")
+        ok = False
+    print()
+    return ok
+
+
 def main():
     """Fonction principale."""
     print()
@@ -198,7 +901,20 @@ def main():
         test_dev_logger,
         test_pdf_extractor,
         test_thresholds_manager,
-        test_excel_manager
+        test_excel_manager,
+        test_backend_resolution,
+        test_manifest,
+        test_result_table,
+        test_observation_store,
+        test_thresholds_dirty_save,
+        test_backend_cache,
+        test_watcher,
+        test_chart_reuse,
+        test_text_cache,
+        test_line_matcher,
+        test_shards,
+        test_profiler_split,
+        test_dev_logger_flush,
     ]
     
     results = []
@@ -9,8 +9,30 @@ load_dotenv()
 # Valeurs par défaut si .env n'est pas défini
 PDF_FOLDER = os.getenv("PDF_FOLDER", "pdfs")
 OUTPUT_FILE = os.getenv("OUTPUT_FILE", "resultats.xlsx")
+STORE_FILE = os.getenv("STORE_FILE", "resultats.sqlite")
+# Colorisation de l'export: "fills" (couleurs fixes) ou "conditional" (mise en forme conditionnelle)
+COLOR_MODE = os.getenv("COLOR_MODE", "fills")
 THRESHOLDS_FILE = os.getenv("THRESHOLDS_FILE", "seuils.json")
 BANLIST_FILE = os.getenv("BANLIST_FILE", "banlist.txt")
+MANIFEST_FILE = os.getenv("MANIFEST_FILE", "processed.json")
+# Moteur d'extraction du texte des PDF: pdfplumber, pypdf, pdfminer, pdftotext ou auto
+# (le plus rapide donnant les mêmes résultats que pdfplumber, mesuré une fois et mis en cache)
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pdfplumber")
+BACKEND_CACHE_FILE = os.getenv("BACKEND_CACHE_FILE", "pdf_backend.json")
+# Cache du texte extrait (SQLite, par empreinte du PDF et moteur); vide = désactivé
+TEXT_CACHE_FILE = os.getenv("TEXT_CACHE_FILE", "text_cache.sqlite")
+# Mode --by-patient: un dossier par patient (stock, seuils, export) dans ce dossier
+SHARDS_FOLDER = os.getenv("SHARDS_FOLDER", "patients")
+# Mode --watch: délai entre deux lots (s) et durée sans changement avant de lire un PDF (s)
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "5"))
+WATCH_SETTLE = float(os.getenv("WATCH_SETTLE", "2"))
+# PDF stable mais sans %%EOF: lu malgré tout (avec un avertissement) après ce délai (s)
+WATCH_EOF_TIMEOUT = float(os.getenv("WATCH_EOF_TIMEOUT", "60"))
+# --profile-dir: nombre de PDF les plus lents dont le profil cProfile est écrit
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "3"))
+# Texte marquant la fin des résultats (ex: "Antériorités"): la lecture du PDF s'arrête à la
+# première ligne qui le contient. Vide = lecture jusqu'à ce que tous les paramètres soient trouvés.
+END_MARKER = os.getenv("END_MARKER", "")
 
 # Liste blanche des paramètres biologiques
 PARAMS_WHITELIST = [
@@ -1,222 +1,292 @@
 """
-Module de gestion des fichiers Excel (mise à jour, colorisation, graphiques).
+Module de gestion du fichier Excel (export, colorisation, graphiques).
 """
 import os
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+import json
+import hashlib
+import numpy as np
+import openpyxl
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.utils import get_column_letter
 from openpyxl.chart import LineChart, Reference
-from config import OUTPUT_FILE
+from openpyxl.chart._chart import ChartBase
+from openpyxl.xml.constants import CHART_NS
+from openpyxl.xml.functions import fromstring, tostring
+from config import OUTPUT_FILE, COLOR_MODE
+from profiler import Profiler
+from result_table import BASE_COLS, STATUS_OK, STATUS_LOW, STATUS_HIGH, classify, to_float_matrix
+
+GREEN = PatternFill(start_color="AAFFAA", end_color="AAFFAA", fill_type="solid")
+RED = PatternFill(start_color="FFAAAA", end_color="FFAAAA", fill_type="solid")
+STATUS_FILLS = {STATUS_OK: GREEN, STATUS_LOW: RED, STATUS_HIGH: RED}
+# En-têtes au même format que pandas.DataFrame.to_excel
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style="thin"), right=Side(style="thin"),
+                       top=Side(style="thin"), bottom=Side(style="thin"))
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+DATA_SHEET = "Sheet1"
+CHARTS_SHEET = "Graphiques"
+
+
+def _cell_value(v):
+    """Valeur écrite dans une cellule: NaN -> vide."""
+    if isinstance(v, float) and v != v:
+        return None
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _make_chart(ws_data, param_name, row, first_col, last_col):
+    """Graphique d'évolution d'un paramètre (ligne `row`, colonnes de dates first_col..last_col)."""
+    chart = LineChart()
+    chart.title = f"Évolution de {param_name}"
+    chart.y_axis.title = "Valeur"
+    chart.x_axis.title = "Date"
+    
+    data_ref = Reference(ws_data, min_col=first_col, max_col=last_col, min_row=row, max_row=row)
+    cat_ref = Reference(ws_data, min_col=first_col, max_col=last_col, min_row=1, max_row=1)
+    # une seule série (la ligne du paramètre), pas une série par date
+    chart.add_data(data_ref, from_rows=True, titles_from_data=False)
+    chart.set_categories(cat_ref)
+    return chart
+
+
+class _SerializedChart(ChartBase):
+    """Graphique déjà sérialisé: son arbre XML est écrit tel quel à l'enregistrement."""
+    
+    def __init__(self, tree):
+        super().__init__()
+        self._tree = tree
+    
+    def _write(self):
+        return self._tree
+
+
+def _chart_tree(xml):
+    """Arbre d'un graphique mémorisé, remis sous la forme produite par openpyxl (espace de noms par défaut)."""
+    tree = fromstring(xml)
+    prefix = "{%s}" % CHART_NS
+    for el in tree.iter():
+        if el.tag.startswith(prefix):
+            el.tag = el.tag[len(prefix):]
+    tree.set("xmlns", CHART_NS)
+    return tree
+
+
+def _chart_fingerprint(param, row, first_col, last_col, dates_key, values, low, high):
+    """Empreinte d'un graphique: références (ligne, colonnes), série (dates, valeurs) et seuils."""
+    h = hashlib.sha1(json.dumps([str(param), row, first_col, last_col, dates_key, repr(low), repr(high)]).encode("utf-8"))
+    h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _chart_anchor(index):
+    """Position du n-ième graphique: grille de 2 colonnes, blocs de 15 lignes."""
+    column = 1 if index % 2 == 0 else 9  # environ 8 colonnes d'écart
+    return f"{get_column_letter(column)}{1 + (index // 2) * 15}"
+
+
+def _effective_bounds(params, lows, highs, thresholds_manager):
+    """
+    Complète en place les seuils par ligne: si Min ou Max manque, les deux
+    viennent du JSON. Retourne les indices des lignes complétées.
+    """
+    from_json = np.flatnonzero(np.isnan(lows) | np.isnan(highs))
+    for r in from_json:
+        threshold = thresholds_manager.get_threshold(params[r])
+        lows[r] = np.nan if threshold.get("min") is None else threshold["min"]
+        highs[r] = np.nan if threshold.get("max") is None else threshold["max"]
+    return from_json
+
+
+def _conditional_rules(ws, date_cols, col_min, col_max, last_row):
+    """Deux règles (vert/rouge) par plage de colonnes de dates contiguës (indices 0-based)."""
+    runs = []
+    for i in date_cols:
+        if runs and i == runs[-1][1] + 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    for first, last in runs:
+        top_left = f"{get_column_letter(first + 1)}2"
+        cell_range = f"{top_left}:{get_column_letter(last + 1)}{last_row}"
+        known = f"ISNUMBER({top_left}),ISNUMBER(${col_min}2),ISNUMBER(${col_max}2)"
+        ws.conditional_formatting.add(cell_range, FormulaRule(
+            formula=[f"AND({known},{top_left}>=${col_min}2,{top_left}<=${col_max}2)"], fill=GREEN))
+        ws.conditional_formatting.add(cell_range, FormulaRule(
+            formula=[f"AND({known},OR({top_left}<${col_min}2,{top_left}>${col_max}2))"], fill=RED))
+    return 2 * len(runs)
 
 
 class ExcelManager:
-    """Gestionnaire des opérations sur le fichier Excel."""
+    """
+    Gestionnaire du fichier Excel: export du stock des observations (table
+    paramètres x dates), colorisation et graphiques compris, en une sauvegarde.
+    """
     
-    def __init__(self, output_file=OUTPUT_FILE):
+    def __init__(self, output_file=OUTPUT_FILE, color_mode=COLOR_MODE, profiler=None):
         self.output_file = output_file
+        # Temps des étapes de l'export (--profile); désactivé par défaut
+        self.profiler = profiler or Profiler()
+        # "fills": couleurs fixes par cellule, "conditional": règles de mise en forme conditionnelle
+        self.color_mode = color_mode
+        # Graphiques du dernier export ({paramètre: [empreinte, XML]}): ceux dont
+        # l'empreinte n'a pas changé ne sont pas reconstruits
+        self.charts_file = output_file + ".charts.json"
+        self.table = None
+    
+    def export_table(self, table, thresholds_manager, colorize=True, charts=True):
+        """Génère le fichier Excel depuis une table construite ailleurs (stock des observations)."""
+        self.table = table
+        self._write(thresholds_manager, colorize, charts)
     
-    def update_excel(self, pdf_path, date, results, thresholds_manager, force=False):
+    def _write(self, thresholds_manager, colorize, charts):
         """
-        Met à jour le fichier Excel avec les nouvelles données.
-        
-        Args:
-            pdf_path: Chemin du fichier PDF source
-            date: Date du prélèvement
-            results: Dictionnaire des résultats extraits
-            thresholds_manager: Instance du gestionnaire de seuils
-            force: Force la ré-extraction même si déjà présente
+        Export en une seule passe avec un classeur write-only: les lignes sont
+        générées depuis la table et écrites au fil de l'eau, couleurs (ou règles
+        conditionnelles) et graphiques compris. Aucune cellule openpyxl n'est
+        gardée en mémoire.
         """
-        if os.path.exists(self.output_file):
-            df = pd.read_excel(self.output_file)
-            if date in df.columns and not force:
-                print(f"[INFO] Date {date} déjà extraite, passez --force pour ré-extraire")
-                return
-        else:
-            df = pd.DataFrame()
-        
-        if "Paramètre" not in df.columns:
-            df["Paramètre"] = list(results.keys())
+        profiler = self.profiler
+        item = os.path.basename(self.output_file)
+        table = self.table
+        n = len(table)
+        params = table.params
+        dates = table.sorted_dates()
+        extras = list(table.extra)
+        first_date_col = len(BASE_COLS)  # indice 0-based de la première date
+        values = table.values[:n][:, [table.date_index[d] for d in dates]] if dates else np.empty((n, 0))
         
-        # Colonnes de base
-        for base_col in ["Unité", "Min", "Max"]:
-            if base_col not in df.columns:
-                df[base_col] = None
+        # Cellules texte (anciens classeurs): valeurs numériques "5,2" prises en compte
+        text = table.text
+        numeric = values
+        lows, highs = table.mins[:n].copy(), table.maxs[:n].copy()
+        if text:
+            numeric = values.copy()
+            pos = {d: c for c, d in enumerate(dates)}
+            parsed = to_float_matrix([v for v in text.values()]).ravel()
+            for ((r, label), v) in zip(text, parsed):
+                if label in pos:
+                    numeric[r, pos[label]] = v
+                elif label == "Min":
+                    lows[r] = v
+                elif label == "Max":
+                    highs[r] = v
+        from_json = _effective_bounds(params, lows, highs, thresholds_manager)
         
-        if date not in df.columns:
-            df[date] = None
+        conditional = colorize and self.color_mode == "conditional"
+        status = None
+        if colorize and not conditional:
+            print("[INFO] Colorisation des valeurs hors normes...")
+            with profiler.stage("colorisation", item):
+                status = classify(numeric, lows, highs)
         
-        # Mise à jour des seuils depuis les résultats
-        thresholds_manager.update_from_results(results)
-        
-        for param, info in results.items():
-            if param not in df["Paramètre"].values:
-                df.loc[len(df)] = [param] + [None] * (len(df.columns) - 1)
-            df.loc[df["Paramètre"] == param, date] = info["valeur"]
-            
-            # Renseigner Unité/Min/Max dans l'Excel si disponibles et absents
-            if info.get("unité") is not None:
-                df.loc[df["Paramètre"] == param, "Unité"] = info["unité"]
-            if info.get("min") is not None:
-                df.loc[df["Paramètre"] == param, "Min"] = info["min"]
-            if info.get("max") is not None:
-                df.loc[df["Paramètre"] == param, "Max"] = info["max"]
-        
-        # Sauvegarder les seuils mis à jour
-        thresholds_manager.save_thresholds()
-        
-        # Réordonner les colonnes de dates par ordre chronologique
-        df = self._reorder_columns(df)
-        
-        df.to_excel(self.output_file, index=False)
-        print(f"[INFO] {os.path.basename(pdf_path)} -> {len(results)} résultats extraits pour la date {date}")
-    
-    def _reorder_columns(self, df):
-        """Réordonne les colonnes avec les dates en ordre chronologique."""
-        def _is_date_label(c):
-            if c == "Paramètre":
-                return False
-            if c in ("Unité", "Min", "Max"):
-                return False
-            return not pd.isna(pd.to_datetime(c, dayfirst=True, errors="coerce"))
-        
-        date_cols = [c for c in df.columns if _is_date_label(c)]
-        non_date_cols = [c for c in df.columns if c not in date_cols and c != "Paramètre"]
-        # tri par date croissante
-        sorted_dates = sorted(date_cols, key=lambda x: pd.to_datetime(x, dayfirst=True, errors="coerce"))
-        ordered_cols = ["Paramètre", "Unité", "Min", "Max"] + sorted_dates + non_date_cols
-        return df.reindex(columns=ordered_cols)
-    
-    def colorize_outliers(self, thresholds_manager):
-        """Colorise les valeurs hors normes dans le fichier Excel."""
-        if not os.path.exists(self.output_file):
-            return
-        
-        wb = load_workbook(self.output_file)
-        ws = wb.active
-        
-        green = PatternFill(start_color="AAFFAA", end_color="AAFFAA", fill_type="solid")
-        red = PatternFill(start_color="FFAAAA", end_color="FFAAAA", fill_type="solid")
-        
-        # Repérer colonnes
-        headers = [ws.cell(row=1, column=c).value for c in range(1, ws.max_column + 1)]
-        idx_param = headers.index("Paramètre") + 1 if "Paramètre" in headers else 1
-        idx_min = headers.index("Min") + 1 if "Min" in headers else None
-        idx_max = headers.index("Max") + 1 if "Max" in headers else None
-        
-        # Colonnes de dates
-        date_cols_idx = []
-        for i, h in enumerate(headers, start=1):
-            if h in ("Paramètre", "Unité", "Min", "Max"):
-                continue
-            try:
-                if not pd.isna(pd.to_datetime(h, dayfirst=True, errors="coerce")):
-                    date_cols_idx.append(i)
-            except Exception:
-                pass
-        
-        for r in range(2, ws.max_row + 1):
-            param = ws.cell(row=r, column=idx_param).value
-            # seuils préférentiels: colonnes Min/Max de la feuille, sinon JSON
-            tmin = tmax = None
-            if idx_min and idx_max:
-                vmin = ws.cell(row=r, column=idx_min).value
-                vmax = ws.cell(row=r, column=idx_max).value
-                try:
-                    tmin = None if vmin in (None, "") else float(str(vmin).replace(",", "."))
-                    tmax = None if vmax in (None, "") else float(str(vmax).replace(",", "."))
-                except Exception:
-                    tmin = tmax = None
-            if (tmin is None or tmax is None):
-                threshold = thresholds_manager.get_threshold(param)
-                tmin = threshold.get("min")
-                tmax = threshold.get("max")
+        # Lignes de la feuille de données (cellules colorées comprises)
+        with profiler.stage("export", item):
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(DATA_SHEET)
             
-            if tmin is None or tmax is None:
-                continue
+            header = []
+            for label in list(BASE_COLS) + dates + extras:
+                cell = WriteOnlyCell(ws, value=label)
+                cell.font, cell.border, cell.alignment = HEADER_FONT, HEADER_BORDER, HEADER_ALIGNMENT
+                header.append(cell)
+            ws.append(header)
             
-            for c in date_cols_idx:
-                cell = ws.cell(row=r, column=c)
-                if cell.value is None:
-                    continue
-                try:
-                    val = float(str(cell.value).replace(",", "."))
-                except Exception:
-                    continue
-                cell.fill = green if (tmin <= val <= tmax) else red
-        
-        wb.save(self.output_file)
-        print("[INFO] Colorisation Excel terminée")
-    
-    def insert_charts(self):
-        """Insère des graphiques d'évolution dans le fichier Excel."""
-        if not os.path.exists(self.output_file):
-            return
+            # Seuils du JSON écrits dans Min/Max (référencés par les règles): lignes aux deux bornes connues
+            completed = set()
+            if conditional:
+                completed = {r for r in from_json.tolist() if not (np.isnan(lows[r]) or np.isnan(highs[r]))}
+            colored = 0
+            for r in range(n):
+                row = [params[r], table.units[r],
+                       _cell_value(lows[r] if r in completed else table.mins[r]),
+                       _cell_value(highs[r] if r in completed else table.maxs[r])]
+                row.extend(_cell_value(v) for v in values[r])
+                row.extend(table.extra[label][r] for label in extras)
+                if text:
+                    for label, i in (("Min", 2), ("Max", 3)):
+                        if (r, label) in text and r not in completed:
+                            row[i] = text[(r, label)]
+                    for c, d in enumerate(dates):
+                        if (r, d) in text:
+                            row[first_date_col + c] = text[(r, d)]
+                    for c, label in enumerate(extras):
+                        if (r, label) in text:
+                            row[first_date_col + len(dates) + c] = text[(r, label)]
+                if status is not None:
+                    for c in np.flatnonzero(status[r]):
+                        cell = WriteOnlyCell(ws, value=row[first_date_col + c])
+                        cell.fill = STATUS_FILLS[int(status[r, c])]
+                        row[first_date_col + c] = cell
+                        colored += 1
+                ws.append(row)
         
-        # Charger workbook et feuille de données
-        wb = load_workbook(self.output_file)
-        ws_data = wb.active
+        if status is not None:
+            print(f"[INFO] Colorisation Excel terminée ({colored} cellule(s) colorée(s))")
+        if conditional and n and dates:
+            print("[INFO] Mise en forme conditionnelle des valeurs hors normes...")
+            with profiler.stage("colorisation", item):
+                n_rules = _conditional_rules(ws, range(first_date_col, first_date_col + len(dates)),
+                                             get_column_letter(3), get_column_letter(4), n + 1)
+            print(f"[INFO] Mise en forme conditionnelle: {n_rules} règle(s), "
+                  f"{len(completed)} ligne(s) de seuils complétée(s) depuis le JSON")
         
-        # Trouver/Créer la feuille "Graphiques"
-        sheet_name = "Graphiques"
-        if sheet_name in wb.sheetnames:
-            # Supprimer et recréer pour éviter doublons
-            del wb[sheet_name]
-        ws_charts = wb.create_sheet(title=sheet_name)
+        if charts:
+            print("[INFO] Génération des graphiques...")
+            with profiler.stage("graphiques", item):
+                ws_charts = wb.create_sheet(CHARTS_SHEET)
+                previous = self._load_charts()
+                saved = {}
+                rebuilt = 0
+                if dates:
+                    first, last = first_date_col + 1, first_date_col + len(dates)
+                    dates_key = hashlib.sha1(json.dumps([str(d) for d in dates]).encode("utf-8")).hexdigest()
+                    counts = np.count_nonzero(~np.isnan(numeric), axis=1)
+                    for r in np.flatnonzero(counts >= 2):
+                        param = params[r]
+                        if not param:
+                            continue
+                        row = int(r) + 2
+                        fp = _chart_fingerprint(param, row, first, last, dates_key, numeric[r], lows[r], highs[r])
+                        old = previous.get(str(param))
+                        if old is not None and old[0] == fp:
+                            xml = old[1]
+                            tree = _chart_tree(xml)
+                        else:
+                            tree = _make_chart(ws, param, row, first, last)._write()
+                            xml = tostring(tree).decode("utf-8")
+                            rebuilt += 1
+                        ws_charts.add_chart(_SerializedChart(tree), _chart_anchor(len(saved)))
+                        saved[str(param)] = [fp, xml]
+            print(f"[INFO] Graphiques intégrés dans le fichier Excel (onglet '{CHARTS_SHEET}'): "
+                  f"{len(saved)} graphique(s), {rebuilt} refait(s)")
         
-        # Repérer les colonnes de dates (en-têtes ligne 1)
-        headers = [ws_data.cell(row=1, column=col).value for col in range(1, ws_data.max_column + 1)]
+        with profiler.stage("enregistrement", item):
+            wb.save(self.output_file)
+            if charts:
+                self._save_charts(saved)
+        print(f"[INFO] Fichier Excel enregistré: {self.output_file}")
+    
+    def _load_charts(self):
+        """Graphiques du dernier export {paramètre: [empreinte, XML]}, vide si absents ou d'une autre version d'openpyxl."""
+        if not os.path.exists(self.charts_file):
+            return {}
         try:
-            date_cols_idx = [
-                i + 1 for i, h in enumerate(headers)
-                if h not in ("Paramètre", "Unité", "Min", "Max")
-                and not pd.isna(pd.to_datetime(h, dayfirst=True, errors="coerce"))
-            ]
-        except Exception:
-            date_cols_idx = [i + 1 for i, h in enumerate(headers) if h not in ("Paramètre", "Unité", "Min", "Max")]
-        
-        # Pour chaque paramètre (ligne >=2), créer un graphique si au moins 2 valeurs
-        chart_row = 1
-        chart_col = 1
-        charts_per_row = 2
-        for r in range(2, ws_data.max_row + 1):
-            param_name = ws_data.cell(row=r, column=1).value
-            if not param_name:
-                continue
-            
-            # Compter valeurs numériques présentes
-            numeric_count = 0
-            for c in date_cols_idx:
-                v = ws_data.cell(row=r, column=c).value
-                try:
-                    if v is not None and str(v) != "" and float(str(v).replace(",", ".")) == float(str(v).replace(",", ".")):
-                        numeric_count += 1
-                except Exception:
-                    pass
-            if numeric_count < 2:
-                continue
-            
-            # Construire chart
-            chart = LineChart()
-            chart.title = f"Évolution de {param_name}"
-            chart.y_axis.title = "Valeur"
-            chart.x_axis.title = "Date"
-            
-            # Données
-            data_ref = Reference(ws_data, min_col=min(date_cols_idx), max_col=max(date_cols_idx), min_row=r, max_row=r)
-            cat_ref = Reference(ws_data, min_col=min(date_cols_idx), max_col=max(date_cols_idx), min_row=1, max_row=1)
-            chart.add_data(data_ref, titles_from_data=False)
-            chart.set_categories(cat_ref)
-            
-            # Position dans la feuille charts
-            cell_addr = ws_charts.cell(row=chart_row, column=chart_col).coordinate
-            ws_charts.add_chart(chart, cell_addr)
-            
-            # Avancer position (grille 2 colonnes)
-            if chart_col == 1:
-                chart_col = 9  # environ 8 colonnes d'écart
-            else:
-                chart_col = 1
-                chart_row += 15  # descendre d'un bloc
-        
-        wb.save(self.output_file)
-        print("[INFO] Graphiques intégrés dans le fichier Excel (onglet 'Graphiques')")
+            with open(self.charts_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[WARN] Cache des graphiques illisible ({self.charts_file}), ignoré : {e}")
+            return {}
+        if data.get("openpyxl") != openpyxl.__version__:
+            return {}
+        return data.get("charts", {})
+    
+    def _save_charts(self, charts):
+        """Mémorise les graphiques de l'export qui vient d'être enregistré (écriture atomique)."""
+        tmp = self.charts_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"openpyxl": openpyxl.__version__, "charts": charts}, f, ensure_ascii=False)
+        os.replace(tmp, self.charts_file)
@@ -0,0 +1,120 @@
+"""
+Module de reconnaissance des lignes de résultats (liste blanche et banlist).
+
+Les automates sont construits une seule fois par extracteur; chaque ligne est
+ensuite classée en un seul parcours de ses caractères, quelle que soit la
+taille de la liste blanche ou de la banlist.
+"""
+from collections import deque
+
+
+class PrefixMatcher:
+    """
+    Trie des paramètres de la liste blanche.
+
+    match(line) rend le premier paramètre (dans l'ordre de la liste) dont la
+    ligne commence, comme l'ancienne boucle `for param in ...: if line.startswith(param)`.
+    """
+
+    def __init__(self, words):
+        self.root = {}
+        for rank, word in enumerate(words):
+            if not word:
+                continue
+            node = self.root
+            for ch in word:
+                node = node.setdefault(ch, {})
+            # clé None = fin de mot: (rang dans la liste, mot); le premier rang fait foi
+            if None not in node:
+                node[None] = (rank, word)
+
+    def match(self, line):
+        node = self.root
+        best = None
+        for ch in line:
+            node = node.get(ch)
+            if node is None:
+                break
+            end = node.get(None)
+            if end is not None and (best is None or end[0] < best[0]):
+                best = end
+        return best[1] if best else None
+
+
+class SubstringMatcher:
+    """
+    Automate d'Aho-Corasick sur des motifs déjà normalisés (ex: banlist en minuscules).
+
+    search(text) est vrai si l'un des motifs apparaît dans text, en un seul parcours.
+    Pour quelques motifs seulement, `in` (implémenté en C) reste plus rapide que le
+    parcours Python de l'automate: la liste est alors testée directement.
+    """
+
+    # En dessous de ce nombre de motifs, pas d'automate
+    MIN_PATTERNS = 32
+
+    def __init__(self, patterns):
+        patterns = [p for p in dict.fromkeys(patterns) if p]
+        self.patterns = tuple(patterns) if len(patterns) < self.MIN_PATTERNS else None
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [False]
+        for pattern in patterns if self.patterns is None else ():
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(False)
+                state = nxt
+            self.out[state] = True
+        self.empty = not patterns
+        self._build_links()
+
+    def _build_links(self):
+        """Liens d'échec calculés en largeur; une sortie est héritée de son lien d'échec."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] = self.out[nxt] or self.out[self.fail[nxt]]
+
+    def search(self, text):
+        if self.empty:
+            return False
+        if self.patterns is not None:
+            return any(p in text for p in self.patterns)
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+
+class LineMatcher:
+    """Classement d'une ligne: paramètre de la liste blanche et/ou terme banni."""
+
+    def __init__(self, whitelist, banlist=()):
+        self.whitelist = PrefixMatcher(whitelist)
+        self.banlist = SubstringMatcher(b.lower() for b in banlist)
+
+    def param(self, line):
+        """Paramètre de la liste blanche qui commence la ligne, ou None."""
+        return self.whitelist.match(line)
+
+    def is_banned(self, line):
+        """Vrai si la ligne contient un terme banni (insensible à la casse)."""
+        return self.banlist.search(line.lower())
@@ -0,0 +1,95 @@
+"""
+Module du manifeste des fichiers PDF déjà traités.
+"""
+import os
+import json
+import hashlib
+from config import MANIFEST_FILE
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Calcule l'empreinte SHA-256 d'un fichier (lecture par blocs)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ProcessedManifest:
+    """
+    Manifeste des PDF traités, indexé par empreinte du contenu.
+
+    Structure du fichier JSON:
+        files:    {chemin: {size, mtime_ns, sha256}}  -> pré-contrôle rapide sans relire le fichier
+        contents: {sha256: {date, results, files, patient}} -> données extraites, partagées par les doublons
+    """
+
+    def __init__(self, manifest_file=MANIFEST_FILE):
+        self.manifest_file = manifest_file
+        self.files = {}
+        self.contents = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Charge le manifeste s'il existe."""
+        if not self.manifest_file or not os.path.exists(self.manifest_file):
+            return
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.contents = data.get("contents", {})
+        except Exception as e:
+            print(f"[WARN] Manifeste illisible ({self.manifest_file}), ignoré : {e}")
+            self.files, self.contents = {}, {}
+
+    def save(self):
+        """Enregistre le manifeste (écriture atomique), seulement s'il a changé."""
+        if not self.manifest_file or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.manifest_file) or ".", exist_ok=True)
+        tmp = self.manifest_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "contents": self.contents}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_file)
+        self._dirty = False
+
+    def file_hash(self, path):
+        """
+        Empreinte du fichier: réutilise celle du manifeste si taille et mtime
+        n'ont pas changé, sinon relit le fichier.
+        """
+        st = os.stat(path)
+        known = self.files.get(path)
+        if known and known.get("size") == st.st_size and known.get("mtime_ns") == st.st_mtime_ns:
+            return known["sha256"]
+        sha = file_sha256(path)
+        self.files[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+        self._dirty = True
+        return sha
+
+    def get(self, sha):
+        """Retourne l'entrée {date, results, files, patient} d'un contenu déjà traité, ou None."""
+        return self.contents.get(sha)
+
+    def record(self, path, sha, date, results, patient=None):
+        """Mémorise le résultat d'extraction d'un contenu (et le patient lu dans l'en-tête)."""
+        entry = self.contents.get(sha)
+        name = os.path.basename(path)
+        files = entry["files"] if entry else []
+        if name not in files:
+            files.append(name)
+        new = {"date": date, "results": results, "files": files, "patient": patient}
+        if new != entry:
+            self.contents[sha] = new
+            self._dirty = True
+
+    def add_alias(self, path, sha):
+        """Associe un autre nom de fichier à un contenu déjà connu."""
+        entry = self.contents.get(sha)
+        name = os.path.basename(path)
+        if entry and name not in entry["files"]:
+            entry["files"].append(name)
+            self._dirty = True
@@ -0,0 +1,214 @@
+"""
+Module du stock des observations (SQLite, format long).
+
+Une ligne par (date, paramètre): c'est la source de vérité; resultats.xlsx
+n'en est qu'un export, régénéré sur demande (--export-excel).
+"""
+import os
+import sys
+import sqlite3
+import numpy as np
+import pandas as pd
+from config import STORE_FILE
+from result_table import ResultTable, DUP_BASE_RE, is_date_label, date_sort_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parameters (
+    id      INTEGER PRIMARY KEY,          -- ordre d'apparition = ordre des lignes de l'export
+    name    TEXT NOT NULL UNIQUE,
+    unit    TEXT,
+    min     REAL,
+    max     REAL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    date        TEXT NOT NULL,            -- libellé du PDF (jj-mm-aaaa)
+    date_iso    TEXT,                     -- aaaa-mm-jj, pour trier et filtrer
+    param_id    INTEGER NOT NULL REFERENCES parameters(id),
+    value       REAL,                     -- texte conservé tel quel si non numérique
+    unit        TEXT,
+    min         REAL,
+    max         REAL,
+    source_sha  TEXT,
+    source      TEXT,
+    PRIMARY KEY (date, param_id)
+);
+CREATE INDEX IF NOT EXISTS idx_obs_param_date ON observations(param_id, date_iso);
+CREATE INDEX IF NOT EXISTS idx_obs_date_iso ON observations(date_iso);
+CREATE TABLE IF NOT EXISTS extra_columns (
+    param_id INTEGER NOT NULL REFERENCES parameters(id),
+    name     TEXT NOT NULL,               -- colonne non datée ajoutée à la main dans l'Excel
+    value,
+    PRIMARY KEY (param_id, name)
+);
+"""
+
+
+def _iso(label):
+    ts = date_sort_key(label)
+    return None if pd.isna(ts) else ts.strftime("%Y-%m-%d")
+
+
+def _clean(v):
+    """None pour les cellules vides (NaN) lues par pandas."""
+    if v is None:
+        return None
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return v.item() if hasattr(v, "item") else v
+
+
+class ObservationStore:
+    """Stock SQLite des observations, indexé par paramètre et par date."""
+
+    def __init__(self, store_file=STORE_FILE):
+        self.store_file = store_file
+        os.makedirs(os.path.dirname(store_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(store_file)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM observations LIMIT 1").fetchone() is None
+
+    def has_date(self, date):
+        return self.conn.execute("SELECT 1 FROM observations WHERE date = ? LIMIT 1", (date,)).fetchone() is not None
+
+    def dates(self):
+        """Libellés des dates, ordre chronologique."""
+        rows = self.conn.execute("SELECT DISTINCT date FROM observations").fetchall()
+        return sorted((r[0] for r in rows), key=date_sort_key)
+
+    # -- écriture -------------------------------------------------------------
+
+    def _param_ids(self, names):
+        """Identifiants des paramètres, créés si nécessaire (dans la transaction courante)."""
+        self.conn.executemany("INSERT OR IGNORE INTO parameters(name) VALUES (?)", [(n,) for n in names])
+        ids = {}
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            q = f"SELECT name, id FROM parameters WHERE name IN ({','.join('?' * len(chunk))})"
+            ids.update(self.conn.execute(q, chunk).fetchall())
+        return ids
+
+    def add_results(self, date, results, source_sha=None, source=None):
+        """
+        Ajoute (ou remplace) les observations d'un PDF pour une date.
+        Unité/Min/Max du paramètre sont mis à jour quand le PDF les fournit.
+        """
+        with self.conn:
+            self._add_results(date, results, source_sha, source)
+
+    def add_many(self, batch):
+        """Ajoute les observations de plusieurs PDF [(date, results, source_sha, source)] en une transaction."""
+        with self.conn:
+            for date, results, source_sha, source in batch:
+                self._add_results(date, results, source_sha, source)
+
+    def _add_results(self, date, results, source_sha, source):
+        names = list(results)
+        ids = self._param_ids(names)
+        iso = _iso(date)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO observations(date, date_iso, param_id, value, unit, min, max, source_sha, source)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(date, iso, ids[n], results[n]["valeur"], results[n].get("unité"), results[n].get("min"),
+              results[n].get("max"), source_sha, source) for n in names],
+        )
+        self.conn.executemany(
+            "UPDATE parameters SET unit = COALESCE(?, unit), min = COALESCE(?, min), max = COALESCE(?, max)"
+            " WHERE id = ?",
+            [(results[n].get("unité"), results[n].get("min"), results[n].get("max"), ids[n]) for n in names],
+        )
+
+    def import_excel(self, path):
+        """Import initial d'un ancien resultats.xlsx (tableau large) dans le stock."""
+        df = pd.read_excel(path)
+        if "Paramètre" not in df.columns:
+            return 0
+        df = df[df["Paramètre"].notna() & ~df["Paramètre"].duplicated()]
+        df = df.drop(columns=[c for c in df.columns if DUP_BASE_RE.match(str(c))])
+        names = [str(n) for n in df["Paramètre"]]
+        dates = [c for c in df.columns if is_date_label(c)]
+        extras = [c for c in df.columns if c not in ("Paramètre", "Unité", "Min", "Max") and c not in dates]
+        source = os.path.basename(path)
+        with self.conn:
+            ids = self._param_ids(names)
+            self.conn.executemany(
+                "UPDATE parameters SET unit = ?, min = ?, max = ? WHERE id = ?",
+                [(_clean(row.get("Unité")), _clean(row.get("Min")), _clean(row.get("Max")), ids[n])
+                 for n, (_, row) in zip(names, df.iterrows())],
+            )
+            obs = []
+            for label in dates:
+                iso = _iso(label)
+                for n, v in zip(names, df[label]):
+                    v = _clean(v)
+                    if v is not None:
+                        obs.append((str(label), iso, ids[n], v, source))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO observations(date, date_iso, param_id, value, source) VALUES (?, ?, ?, ?, ?)",
+                obs,
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO extra_columns(param_id, name, value) VALUES (?, ?, ?)",
+                [(ids[n], str(c), _clean(v)) for c in extras for n, v in zip(names, df[c]) if _clean(v) is not None],
+            )
+        return len(obs)
+
+    # -- lecture --------------------------------------------------------------
+
+    def history(self, param):
+        """[(date, valeur)] d'un paramètre, ordre chronologique."""
+        return self.conn.execute(
+            "SELECT o.date, o.value FROM observations o JOIN parameters p ON p.id = o.param_id"
+            " WHERE p.name = ? ORDER BY o.date_iso",
+            (param,),
+        ).fetchall()
+
+    def to_result_table(self):
+        """Table large (paramètres x dates) pour l'export Excel."""
+        params = self.conn.execute("SELECT id, name, unit, min, max FROM parameters ORDER BY id").fetchall()
+        dates = self.dates()
+        table = ResultTable(rows=max(len(params), 64), dates=max(len(dates), 8))
+        rows = table.ensure_params([name for _, name, *_ in params])
+        row_of = {pid: int(r) for (pid, *_), r in zip(params, rows)}
+        for pid, _, unit, vmin, vmax in params:
+            r = row_of[pid]
+            table.units[r] = unit
+            for label, target, v in (("Min", table.mins, vmin), ("Max", table.maxs, vmax)):
+                if isinstance(v, (int, float)):
+                    target[r] = v
+                elif v is not None:
+                    table.text[(r, label)] = v
+        for label in dates:
+            table.ensure_date(label)
+        for date, pid, value in self.conn.execute("SELECT date, param_id, value FROM observations"):
+            r, c = row_of[pid], table.date_index[date]
+            if isinstance(value, (int, float)):
+                table.values[r, c] = value
+            elif value is not None:
+                table.text[(r, date)] = value
+        for pid, name, value in self.conn.execute("SELECT param_id, name, value FROM extra_columns ORDER BY rowid"):
+            col = table.extra.get(name)
+            if col is None:
+                col = table.extra[name] = np.full(table.values.shape[0], None, dtype=object)
+            col[row_of[pid]] = value
+        return table
+
+
+if __name__ == "__main__":
+    # Historique d'un paramètre sans passer par l'Excel:
+    #   python src/observation_store.py "Hémoglobine"
+    store = ObservationStore()
+    if len(sys.argv) < 2:
+        for (name,) in store.conn.execute("SELECT name FROM parameters ORDER BY id"):
+            print(name)
+    else:
+        for date, value in store.history(sys.argv[1]):
+            print(f"{date}\t{value}")
+    store.close()
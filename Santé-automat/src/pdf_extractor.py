@@ -3,16 +3,89 @@ Module d'extraction des données depuis les fichiers PDF.
 """
 import os
 import re
-import pdfplumber
-from config import PARAMS_WHITELIST, BANLIST_FILE
+import time
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from config import PARAMS_WHITELIST, BANLIST_FILE, END_MARKER, PDF_BACKEND, TEXT_CACHE_FILE
+from line_matcher import LineMatcher
+from text_backends import AUTO, BACKEND_NAMES, available_backends, iter_pages, load_auto_choice, save_auto_choice
+from text_cache import TextCache
+from manifest import file_sha256
+from profiler import Profiler
+
+# Ligne de résultat: libellé, valeur, unité éventuelle, intervalle de référence éventuel
+RESULT_RE = re.compile(
+    r"^\s*([A-Za-zÀ-ÿ\s\-\(\)/]+?)\s+([\d,\.]+)\s*([a-zA-Zµ%/]+)?\s*(?:\(([^)]+)\))?"
+)
+
+DATE_RE = re.compile(r"Prélevé le (\d{2}[-−]\d{2}[-−]\d{4})")
+
+# En-tête patient: "Patient :" suivi du nom (même ligne ou suivante), puis la date de naissance
+PATIENT_RE = re.compile(r"^Patient\s*:\s*(.*)$")
+BIRTH_RE = re.compile(r"Date de naissance\s*:\s*(\d{2}[-−/]\d{2}[-−/]\d{4})")
+CIVILITY_RE = re.compile(r"^(?:M|MME|MLLE|MR|MONSIEUR|MADAME|MADEMOISELLE|ENFANT)\.?\s+", re.IGNORECASE)
+
+
+def parse_patient(lines):
+    """
+    Identifiant du patient lu dans l'en-tête du compte rendu: "NOM Prénom jj-mm-aaaa"
+    (sans civilité), le nom seul sans date de naissance, None si absent.
+    """
+    name = birth = None
+    expect_name = False
+    for line in lines:
+        line = line.strip()
+        if expect_name and line:
+            name, expect_name = line, False
+            continue
+        match = PATIENT_RE.match(line)
+        if match and name is None:
+            if match.group(1).strip():
+                name = match.group(1).strip()
+            else:
+                expect_name = True
+            continue
+        match = BIRTH_RE.search(line)
+        if match and birth is None:
+            birth = match.group(1).replace("−", "-").replace("/", "-")
+        if name and birth:
+            break
+    if not name:
+        return None
+    name = CIVILITY_RE.sub("", name).strip()
+    return f"{name} {birth}" if birth else name
+
+
+def iter_pdf_lines(pages, raw=None):
+    """
+    Générateur des lignes d'un PDF à partir des textes de page (itérateur paresseux
+    d'un moteur): une page n'est rendue que lorsque le consommateur arrive à ses lignes.
+    Si raw est une liste, le texte de chaque page lue y est ajouté.
+    """
+    for text in pages:
+        if raw is not None:
+            raw.append(text)
+        yield from text.split("\n")
 
 
 class PDFExtractor:
     """Extracteur de données médicales depuis les PDF."""
     
-    def __init__(self, dev_logger=None):
+    def __init__(self, dev_logger=None, backend=PDF_BACKEND, text_cache_file=TEXT_CACHE_FILE, profiler=None):
         self.dev_logger = dev_logger
+        # Temps par PDF et par étape (--profile); désactivé par défaut
+        self.profiler = profiler or Profiler()
+        # Cache du texte extrait (vide = désactivé), ouvert à la première utilisation
+        self.text_cache_file = text_cache_file
+        self._text_cache = None
+        if backend != AUTO and backend not in BACKEND_NAMES:
+            raise ValueError(f"Moteur d'extraction inconnu : {backend} (choix: {', '.join(BACKEND_NAMES)}, {AUTO})")
+        # "auto": résolu au premier PDF (banc d'essai mis en cache)
+        self.backend = backend
         self.banlist = self._load_banlist()
+        # Automates construits une fois: une ligne = un parcours, quelle que soit la taille des listes
+        self.matcher = LineMatcher(PARAMS_WHITELIST, self.banlist)
         if self.dev_logger:
             self.dev_logger.log_banlist_info(self.banlist)
     
@@ -35,83 +108,267 @@ class PDFExtractor:
         """
         Extrait les données d'un fichier PDF.
         
+        Les pages sont lues une à une et la lecture s'arrête dès que tous les
+        paramètres de la liste blanche sont trouvés ou que END_MARKER est atteint:
+        les annexes ne sont pas rendues.
+        
         Returns:
             tuple: (date, results_dict)
         """
-        with pdfplumber.open(pdf_path) as pdf:
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+        _, date, results = self.extract_report(pdf_path)
+        return date, results
+    
+    def extract_report(self, pdf_path, sha=None):
+        """
+        Comme extract_data_from_pdf, avec le patient lu dans l'en-tête.
         
-        # Log du texte brut en mode dev
-        if self.dev_logger:
-            self.dev_logger.log_raw_text(os.path.basename(pdf_path), text)
+        Args:
+            pdf_path: Chemin du PDF
+            sha: Empreinte SHA-256 déjà calculée (manifeste), clé du cache du texte;
+                 calculée ici si absente
         
-        # Extraction de la date de prélèvement
-        date_match = re.search(r"Prélevé le (\d{2}[-−]\d{2}[-−]\d{4})", text)
-        if date_match:
-            date = date_match.group(1).replace("−", "-")
-            text = text.split(date_match.group(0), 1)[1]  # texte après la date
-        else:
-            date = "inconnue"
+        Returns:
+            tuple: (patient ou None, date, results_dict)
+        """
+        pdf_name = os.path.basename(pdf_path)
+        with self.profiler.file(pdf_name):
+            with self.profiler.stage("ouverture", pdf_name):
+                backend = self.resolve_backend(pdf_path)
+                if not self.text_cache_file:
+                    sha = None
+                elif sha is None:
+                    sha = file_sha256(pdf_path)
+            # En mode dev, on garde les pages lues pour le log du texte brut
+            raw = [] if self.dev_logger and self.dev_logger.enabled else None
+            patient, date, results = self._extract_with(backend, pdf_path, raw, sha, pdf_name)
         
         if self.dev_logger:
-            self.dev_logger.log_extracted_date(os.path.basename(pdf_path), date)
+            self.dev_logger.log_extracted_date(pdf_name, date)
+            self.dev_logger.log_message(f"Patient ({pdf_name}): {patient or 'inconnu'}")
         
-        # Extraction des résultats
-        results = self._parse_results(text)
+        # Log du texte brut en mode dev (pages effectivement lues)
+        if raw is not None:
+            self.dev_logger.log_raw_text(pdf_name, "\n".join(raw))
         
         # Log des résultats filtrés en mode dev
         if self.dev_logger:
-            self.dev_logger.log_filtered_results(os.path.basename(pdf_path), results)
+            self.dev_logger.log_filtered_results(pdf_name, results)
         
-        return date, results
+        return patient, date, results
+    
+    @property
+    def text_cache(self):
+        if self._text_cache is None and self.text_cache_file:
+            self._text_cache = TextCache(self.text_cache_file)
+        return self._text_cache
+    
+    def _extract_with(self, backend, pdf_path, raw=None, sha=None, pdf_name=None):
+        """
+        Extraction avec un moteur donné, sans log; le PDF est fermé dès l'arrêt de la lecture.
+        Avec l'empreinte sha, les pages passent par le cache du texte. Avec pdf_name, le
+        rendu des pages (texte) et leur analyse sont mesurés séparément (--profile).
+        """
+        if sha and self.text_cache:
+            pages = self.text_cache.iter_pages(sha, backend, pdf_path)
+        else:
+            pages = iter_pages(backend, pdf_path)
+        profiler = self.profiler if pdf_name else Profiler()
+        with contextlib.closing(pages), profiler.split(pages, "texte", "analyse", pdf_name) as timed_pages:
+            date, header, lines = self._split_date(iter_pdf_lines(timed_pages, raw))
+            # Extraction des résultats (consomme le générateur: les pages sont rendues à la demande)
+            results = self._parse_lines(lines)
+        return parse_patient(header), date, results
+    
+    def resolve_backend(self, sample_pdf):
+        """
+        Moteur à utiliser. En mode auto, le choix mis en cache est réutilisé; sinon
+        les moteurs installés sont mesurés sur sample_pdf et le plus rapide donnant
+        les mêmes (patient, date, résultats) que pdfplumber est retenu. Sans comparaison
+        possible (pdfplumber absent, échantillon sans résultat), le premier moteur
+        installé qui lit l'échantillon est pris, sans mémoriser le choix.
+        
+        Raises:
+            RuntimeError: aucun moteur d'extraction installé
+        """
+        if self.backend != AUTO:
+            return self.backend
+        choice = load_auto_choice()
+        if choice in BACKEND_NAMES:
+            self.backend = choice
+            return choice
+        
+        installed = available_backends()
+        if not installed:
+            raise RuntimeError("Aucun moteur d'extraction PDF installé "
+                               "(pip install pdfplumber, pypdf ou pdfminer.six, ou la commande pdftotext)")
+        reference, timings, valid = None, {}, []
+        for name in installed:
+            try:
+                # meilleur de deux passes: la première paie l'import de la bibliothèque
+                best = None
+                for _ in range(2):
+                    start = time.perf_counter()
+                    out = self._extract_with(name, sample_pdf)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+            except Exception as e:
+                print(f"[WARN] Moteur {name} inutilisable : {e}")
+                continue
+            timings[name] = round(best, 4)
+            if name == "pdfplumber":
+                reference = out
+            if reference is None:
+                continue
+            if out == reference:
+                valid.append(name)
+            else:
+                print(f"[INFO] Moteur {name} écarté: résultats différents de pdfplumber sur {os.path.basename(sample_pdf)}")
+        
+        if reference is None or not reference[2]:
+            # pdfplumber absent ou échantillon sans résultat: pas de comparaison possible, choix non mémorisé
+            self.backend = next(iter(timings), installed[0])
+            if reference is None:
+                print(f"[WARN] pdfplumber indisponible, moteur d'extraction {self.backend} utilisé sans comparaison")
+            return self.backend
+        self.backend = min(valid, key=timings.get)
+        save_auto_choice(self.backend, timings, sample_pdf)
+        print(f"[INFO] Moteur d'extraction retenu : {self.backend} "
+              f"({', '.join(f'{n} {t:.3f}s' for n, t in timings.items())})")
+        return self.backend
+    
+    def _split_date(self, lines):
+        """
+        Cherche la date de prélèvement dans les premières lignes.
+        
+        Returns:
+            tuple: (date, lignes d'en-tête avant la date, lignes suivant la date);
+                   sans date: ("inconnue", toutes les lignes, toutes les lignes)
+        """
+        skipped = []
+        for line in lines:
+            date_match = DATE_RE.search(line)
+            if date_match:
+                date = date_match.group(1).replace("−", "-")
+                # texte après la date, puis le reste du document
+                return date, skipped, itertools.chain([line[date_match.end():]], lines)
+            skipped.append(line)
+        return "inconnue", skipped, iter(skipped)
     
     def _parse_results(self, text):
         """Parse le texte pour extraire les résultats médicaux."""
+        return self._parse_lines(text.split("\n"))
+    
+    def _parse_lines(self, lines):
+        """
+        Parse des lignes (itérable, éventuellement paresseux) pour extraire les résultats
+        médicaux; s'arrête sur END_MARKER ou quand toute la liste blanche est trouvée.
+        """
         results = {}
-        pattern = re.compile(
-            r"^\s*([A-Za-zÀ-ÿ\s\-\(\)/]+?)\s+([\d,\.]+)\s*([a-zA-Zµ%/]+)?\s*(?:\(([^)]+)\))?"
-        )
+        matcher = self.matcher
+        
+        wanted = len(set(PARAMS_WHITELIST))
         
-        for line in text.split("\n"):
+        for line in lines:
+            if END_MARKER and END_MARKER in line:
+                break
             line = line.strip()
             if not line or len(line) > 120:
                 continue
             
             # 1) Essayer de parser les paramètres whitelistés (prioritaire sur banlist)
-            parsed = False
-            for param in PARAMS_WHITELIST:
-                if line.startswith(param):
-                    match = pattern.match(line)
-                    if match:
-                        val_str = match.group(2).replace(",", ".")
-                        try:
-                            value = float(val_str)
-                            interval = match.group(4) or ""
-                            low, high = None, None
-                            if interval and "-" in interval:
-                                parts = interval.replace("−", "-").split("-")
-                                try:
-                                    low = float(parts[0].replace(",", "."))
-                                    high = float(parts[1].replace(",", "."))
-                                except:
-                                    pass
-                            results[param] = {
-                                "valeur": value,
-                                "unité": match.group(3) or "",
-                                "intervalle": interval,
-                                "min": low,
-                                "max": high
-                            }
-                            parsed = True
-                        except ValueError:
-                            pass
-                    break  # ne pas matcher plusieurs fois
-            if parsed:
-                continue
+            param = matcher.param(line)
+            if param is not None:
+                match = RESULT_RE.match(line)
+                if match:
+                    val_str = match.group(2).replace(",", ".")
+                    try:
+                        value = float(val_str)
+                        interval = match.group(4) or ""
+                        low, high = None, None
+                        if interval and "-" in interval:
+                            parts = interval.replace("−", "-").split("-")
+                            try:
+                                low = float(parts[0].replace(",", "."))
+                                high = float(parts[1].replace(",", "."))
+                            except:
+                                pass
+                        results[param] = {
+                            "valeur": value,
+                            "unité": match.group(3) or "",
+                            "intervalle": interval,
+                            "min": low,
+                            "max": high
+                        }
+                        if len(results) == wanted:
+                            break
+                        continue
+                    except ValueError:
+                        pass
             
             # 2) Si non-parsable et la ligne contient un élément banni (insensible à la casse), ignorer
-            line_low = line.lower()
-            if any(b.lower() in line_low for b in self.banlist):
+            if matcher.is_banned(line):
                 continue
         
         return results
+
+
+# Extracteur propre à chaque processus du pool (initialisé une seule fois par processus)
+_worker_extractor = None
+
+
+def _init_worker(backend, profile=False):
+    """Initialise l'extracteur d'un processus du pool (moteur déjà résolu par le parent)."""
+    global _worker_extractor
+    _worker_extractor = PDFExtractor(backend=backend, profiler=Profiler(enabled=profile))
+
+
+def _extract_in_worker(pdf_path, sha=None):
+    """Extrait un PDF dans un processus du pool; rend aussi les temps mesurés (--profile)."""
+    return _worker_extractor.extract_report(pdf_path, sha), _worker_extractor.profiler.drain()
+
+
+def start_pool(extractor, jobs, sample_pdf):
+    """
+    Pool de processus d'extraction, réutilisable d'un lot à l'autre (mode --watch).
+    Mode auto: le banc d'essai a lieu une seule fois, dans ce processus, sur sample_pdf.
+    """
+    backend = extractor.resolve_backend(sample_pdf)
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                               initargs=(backend, extractor.profiler.enabled))
+
+
+def extract_all(pdf_paths, extractor, jobs=1, pool=None, shas=None):
+    """
+    Extrait plusieurs PDF, en parallèle sur `jobs` processus si jobs > 1.
+    
+    Args:
+        pdf_paths: Chemins des PDF à traiter
+        extractor: Extracteur utilisé en mode séquentiel
+        jobs: Nombre de processus (1 = séquentiel dans le processus courant)
+        pool: Pool déjà démarré (start_pool) à utiliser au lieu d'en créer un
+        shas: Empreintes des PDF (même ordre que pdf_paths), déjà calculées pour le manifeste
+    
+    Yields:
+        tuple: (pdf_path, date, results_dict, patient), dans l'ordre de pdf_paths
+    """
+    if shas is None:
+        shas = [None] * len(pdf_paths)
+    if len(pdf_paths) <= 1 or (pool is None and jobs <= 1):
+        for pdf_path, sha in zip(pdf_paths, shas):
+            patient, date, results = extractor.extract_report(pdf_path, sha)
+            yield pdf_path, date, results, patient
+        return
+    
+    if pool is not None:
+        yield from _map_pool(pool, pdf_paths, shas, extractor.profiler)
+        return
+    with start_pool(extractor, jobs, pdf_paths[0]) as pool:
+        yield from _map_pool(pool, pdf_paths, shas, extractor.profiler)
+
+
+def _map_pool(pool, pdf_paths, shas, profiler):
+    # map() rend les résultats dans l'ordre des entrées: fusion déterministe
+    mapped = pool.map(_extract_in_worker, pdf_paths, shas)
+    for pdf_path, ((patient, date, results), records) in zip(pdf_paths, mapped):
+        profiler.records.extend(records)
+        yield pdf_path, date, results, patient
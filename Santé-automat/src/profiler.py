@@ -0,0 +1,166 @@
+"""
+Module de mesure des temps du traitement (--profile, --metrics-json).
+
+Temps réel (mur) et temps CPU par PDF et par étape: ouverture, texte
+(rendu des pages ou cache), analyse, stock, export, colorisation,
+graphiques, enregistrement. Avec un dossier de profils, chaque PDF est
+aussi passé sous cProfile et les profils des plus lents sont écrits
+(fichiers .prof, lisibles avec pstats ou snakeviz).
+"""
+import os
+import json
+import time
+import cProfile
+import contextlib
+from config import PROFILE_TOP
+
+# Ordre d'affichage des étapes (les autres suivent dans l'ordre d'apparition)
+STAGES = ("ouverture", "texte", "analyse", "stock", "export", "colorisation", "graphiques", "enregistrement")
+
+# Étape regroupant le traitement complet d'un PDF
+TOTAL = "total"
+
+
+class Profiler:
+    """
+    Collecte des temps par (fichier, étape). Désactivé, chaque mesure est un
+    simple `yield`: l'instrumentation reste en place sans coût notable.
+    """
+
+    def __init__(self, enabled=False, profile_dir=None, top=PROFILE_TOP):
+        self.enabled = enabled or bool(profile_dir)
+        self.profile_dir = profile_dir
+        self.top = top
+        self.records = []        # (fichier ou None, étape, mur, cpu)
+        self._slowest = []       # (mur, fichier, cProfile.Profile), les `top` PDF les plus lents
+        self._start = time.perf_counter()
+
+    def add(self, stage, item, wall, cpu):
+        self.records.append((item, stage, wall, cpu))
+
+    def drain(self):
+        """Rend et oublie les mesures (processus du pool -> processus principal)."""
+        records, self.records = self.records, []
+        return records
+
+    @contextlib.contextmanager
+    def stage(self, name, item=None):
+        """Mesure le bloc comme étape `name` du fichier `item` (None = lot entier)."""
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, item, time.perf_counter() - wall, time.process_time() - cpu)
+
+    @contextlib.contextmanager
+    def split(self, iterable, inner, outer, item=None):
+        """
+        Bloc consommant un itérateur produit à la demande (pages d'un PDF): le temps
+        passé à produire ses éléments compte pour l'étape `inner`, le reste du bloc
+        pour l'étape `outer`.
+        """
+        if not self.enabled:
+            yield iterable
+            return
+        spent = [0.0, 0.0]
+
+        def timed():
+            it = iter(iterable)
+            while True:
+                wall, cpu = time.perf_counter(), time.process_time()
+                try:
+                    value = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    spent[0] += time.perf_counter() - wall
+                    spent[1] += time.process_time() - cpu
+                yield value
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield timed()
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self.add(inner, item, spent[0], spent[1])
+            self.add(outer, item, wall - spent[0], cpu - spent[1])
+
+    @contextlib.contextmanager
+    def file(self, item):
+        """Traitement complet d'un PDF (étape total), sous cProfile si un dossier de profils est donné."""
+        if not self.enabled:
+            yield
+            return
+        prof = cProfile.Profile() if self.profile_dir else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self.add(TOTAL, item, wall, cpu)
+            if prof:
+                self._slowest.append((wall, item, prof))
+                self._slowest.sort(key=lambda s: s[0], reverse=True)
+                del self._slowest[self.top:]
+
+    # -- restitution ----------------------------------------------------------
+
+    def summary(self):
+        """
+        Returns:
+            dict: {"elapsed": durée du run, "stages": {étape: {count, wall, cpu}},
+                   "files": {fichier: {étape: {wall, cpu}}}}
+        """
+        stages, files = {}, {}
+        for item, stage, wall, cpu in self.records:
+            s = stages.setdefault(stage, {"count": 0, "wall": 0.0, "cpu": 0.0})
+            s["count"] += 1
+            s["wall"] += wall
+            s["cpu"] += cpu
+            f = files.setdefault(item or "(lot)", {}).setdefault(stage, {"wall": 0.0, "cpu": 0.0})
+            f["wall"] += wall
+            f["cpu"] += cpu
+        order = {name: i for i, name in enumerate(STAGES + (TOTAL,))}
+        stages = dict(sorted(stages.items(), key=lambda kv: order.get(kv[0], len(order) - 1)))
+        return {"elapsed": time.perf_counter() - self._start, "stages": stages, "files": files}
+
+    def report(self):
+        """Affiche les temps par étape et les PDF les plus lents."""
+        if not self.enabled:
+            return
+        summary = self.summary()
+        print(f"\n[PROFILE] Durée totale: {summary['elapsed']:.3f}s")
+        print(f"[PROFILE] {'étape':<16}{'n':>5}{'mur (s)':>12}{'cpu (s)':>12}{'moy. (ms)':>12}")
+        for stage, s in summary["stages"].items():
+            print(f"[PROFILE] {stage:<16}{s['count']:>5}{s['wall']:>12.3f}{s['cpu']:>12.3f}"
+                  f"{1000 * s['wall'] / s['count']:>12.1f}")
+        totals = sorted(((t[TOTAL]["wall"], name) for name, t in summary["files"].items() if TOTAL in t),
+                        reverse=True)
+        for wall, name in totals[:self.top]:
+            print(f"[PROFILE] PDF lent: {name} ({wall:.3f}s)")
+
+    def write_json(self, path):
+        """Écrit les mesures (résumé par étape et détail par fichier) en JSON (écriture atomique)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        print(f"[INFO] Mesures enregistrées dans {path}")
+
+    def dump_profiles(self):
+        """Écrit les profils cProfile des PDF les plus lents dans profile_dir."""
+        if not self.profile_dir or not self._slowest:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for rank, (wall, item, prof) in enumerate(self._slowest, 1):
+            path = os.path.join(self.profile_dir, f"{rank:02d}_{os.path.splitext(item)[0]}.prof")
+            prof.dump_stats(path)
+            print(f"[PROFILE] Profil de {item} ({wall:.3f}s): {path}")
@@ -0,0 +1,214 @@
+"""
+Module de la table des résultats en mémoire (paramètres x dates).
+"""
+import re
+import numpy as np
+import pandas as pd
+
+BASE_COLS = ("Paramètre", "Unité", "Min", "Max")
+# Colonnes de base dupliquées par d'anciennes versions (Unité.1, Min.1, ...)
+DUP_BASE_RE = re.compile(r"^(Unité|Min|Max)\.\d+$")
+
+
+# Statut d'une cellule de valeur (matrice de classification)
+STATUS_MISSING = 0   # pas de valeur numérique ou pas de seuils
+STATUS_OK = 1
+STATUS_LOW = 2
+STATUS_HIGH = 3
+
+
+def to_float_matrix(cells):
+    """Convertit une grille de cellules (nombres, textes "5,2", None) en float64, NaN si non numérique."""
+    arr = np.asarray(cells, dtype=object)
+    if arr.size == 0:
+        return np.empty(arr.shape, dtype=float)
+    flat = pd.Series(arr.ravel())
+    num = pd.to_numeric(flat, errors="coerce")
+    texte = flat.map(type).eq(str)
+    if texte.any():
+        num[texte] = pd.to_numeric(flat[texte].str.replace(",", ".", regex=False).str.strip(), errors="coerce")
+    return num.to_numpy(dtype=float).reshape(arr.shape)
+
+
+def classify(values, lows, highs):
+    """
+    Classe toutes les valeurs en une passe: matrice de statuts (STATUS_*),
+    values (lignes x dates), lows/highs (un seuil par ligne, NaN si absent).
+    """
+    lows = np.asarray(lows, dtype=float)[:, None]
+    highs = np.asarray(highs, dtype=float)[:, None]
+    status = np.full(values.shape, STATUS_MISSING, dtype=np.int8)
+    known = ~np.isnan(values) & ~np.isnan(lows) & ~np.isnan(highs)
+    status[known] = STATUS_OK
+    status[known & (values < lows)] = STATUS_LOW
+    status[known & (values > highs)] = STATUS_HIGH
+    return status
+
+
+def is_date_label(label):
+    """Vrai si l'en-tête de colonne est une date (jj-mm-aaaa ou équivalent)."""
+    if label in BASE_COLS:
+        return False
+    return not pd.isna(pd.to_datetime(label, dayfirst=True, errors="coerce"))
+
+
+def date_sort_key(label):
+    return pd.to_datetime(label, dayfirst=True, errors="coerce")
+
+
+class ResultTable:
+    """
+    Table des résultats indexée par paramètre.
+
+    - index paramètre -> ligne (dict, accès O(1))
+    - valeurs: matrice NumPy float64 (lignes x dates), NaN = absent, agrandie par doublement
+    - Unité (objet), Min/Max (float64) par ligne
+    - colonnes non datées (ajoutées à la main dans l'Excel) conservées telles quelles
+
+    Les cellules non numériques lues dans un ancien classeur sont gardées à part
+    (self.text) pour ne rien perdre à la réécriture.
+    """
+
+    def __init__(self, rows=64, dates=8):
+        self.params = []
+        self.index = {}
+        self.dates = []
+        self.date_index = {}
+        self.units = np.full(rows, None, dtype=object)
+        self.mins = np.full(rows, np.nan)
+        self.maxs = np.full(rows, np.nan)
+        self.values = np.full((rows, dates), np.nan)
+        self.extra = {}   # colonne non datée -> tableau objet par ligne
+        self.text = {}    # (ligne, colonne) -> valeur non numérique
+
+    def __len__(self):
+        return len(self.params)
+
+    # -- capacité -------------------------------------------------------------
+
+    def _grow_rows(self, needed):
+        cap = self.values.shape[0]
+        if needed <= cap:
+            return
+        new_cap = max(needed, cap * 2)
+        pad = new_cap - cap
+        self.units = np.concatenate([self.units, np.full(pad, None, dtype=object)])
+        self.mins = np.concatenate([self.mins, np.full(pad, np.nan)])
+        self.maxs = np.concatenate([self.maxs, np.full(pad, np.nan)])
+        self.values = np.vstack([self.values, np.full((pad, self.values.shape[1]), np.nan)])
+        for name, col in self.extra.items():
+            self.extra[name] = np.concatenate([col, np.full(pad, None, dtype=object)])
+
+    def _grow_dates(self, needed):
+        cap = self.values.shape[1]
+        if needed <= cap:
+            return
+        new_cap = max(needed, cap * 2)
+        self.values = np.hstack([self.values, np.full((self.values.shape[0], new_cap - cap), np.nan)])
+
+    # -- écriture -------------------------------------------------------------
+
+    def has_date(self, date):
+        return date in self.date_index
+
+    def ensure_date(self, date):
+        """Indice de colonne d'une date (créée si absente)."""
+        col = self.date_index.get(date)
+        if col is None:
+            col = len(self.dates)
+            self._grow_dates(col + 1)
+            self.dates.append(date)
+            self.date_index[date] = col
+        return col
+
+    def ensure_params(self, names):
+        """Indices de ligne des paramètres; les nouveaux sont ajoutés en un seul lot."""
+        new = [n for n in dict.fromkeys(names) if n not in self.index]
+        if new:
+            start = len(self.params)
+            self._grow_rows(start + len(new))
+            for i, name in enumerate(new, start):
+                self.index[name] = i
+            self.params.extend(new)
+        return np.fromiter((self.index[n] for n in names), dtype=np.intp, count=len(names))
+
+    def set_results(self, date, results):
+        """Écrit les résultats d'un PDF ({param: {valeur, unité, min, max}}) pour une date."""
+        names = list(results)
+        rows = self.ensure_params(names)
+        col = self.ensure_date(date)
+        infos = [results[n] for n in names]
+        self.values[rows, col] = np.array([np.nan if i["valeur"] is None else i["valeur"] for i in infos],
+                                          dtype=float)
+        if self.text:
+            for r in rows:
+                self.text.pop((int(r), date), None)
+        # Unité/Min/Max renseignés seulement si fournis par le PDF
+        for key, target in (("unité", self.units), ("min", self.mins), ("max", self.maxs)):
+            mask = np.fromiter((i.get(key) is not None for i in infos), dtype=bool, count=len(infos))
+            if mask.any():
+                target[rows[mask]] = [i[key] for i, m in zip(infos, mask) if m]
+                if self.text and key != "unité":
+                    label = "Min" if key == "min" else "Max"
+                    for r in rows[mask]:
+                        self.text.pop((int(r), label), None)
+
+    # -- lecture --------------------------------------------------------------
+
+    def sorted_dates(self):
+        return sorted(self.dates, key=date_sort_key)
+
+    # -- conversion (sérialisation seulement) ---------------------------------
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Construit la table depuis un DataFrame lu dans l'Excel."""
+        if "Paramètre" in df.columns:
+            # un paramètre = une ligne (la première occurrence fait foi)
+            df = df[~df["Paramètre"].duplicated()].reset_index(drop=True)
+        n = len(df)
+        dates = [c for c in df.columns if is_date_label(c)]
+        table = cls(rows=max(n, 64), dates=max(len(dates), 8))
+        if n == 0 or "Paramètre" not in df.columns:
+            return table
+        table.ensure_params(list(df["Paramètre"]))
+
+        def numeric(label):
+            raw = df[label]
+            num = pd.to_numeric(raw, errors="coerce")
+            for r in np.flatnonzero(num.isna().to_numpy() & raw.notna().to_numpy()):
+                table.text[(int(r), label)] = raw.iloc[r]
+            return num.to_numpy(dtype=float)
+
+        if "Unité" in df.columns:
+            table.units[:n] = df["Unité"].where(df["Unité"].notna(), None).to_numpy(dtype=object)
+        if "Min" in df.columns:
+            table.mins[:n] = numeric("Min")
+        if "Max" in df.columns:
+            table.maxs[:n] = numeric("Max")
+        for label in dates:
+            table.values[:n, table.ensure_date(label)] = numeric(label)
+        for label in df.columns:
+            if label not in BASE_COLS and label not in table.date_index:
+                col = np.full(table.values.shape[0], None, dtype=object)
+                col[:n] = df[label].where(df[label].notna(), None).to_numpy(dtype=object)
+                table.extra[label] = col
+        return table
+
+    def to_dataframe(self):
+        """DataFrame prêt à écrire: Paramètre, Unité, Min, Max, dates chronologiques, autres colonnes."""
+        n = len(self.params)
+        data = {
+            "Paramètre": self.params,
+            "Unité": self.units[:n],
+            "Min": self.mins[:n].astype(object),
+            "Max": self.maxs[:n].astype(object),
+        }
+        for label in self.sorted_dates():
+            data[label] = self.values[:n, self.date_index[label]].astype(object)
+        for label, col in self.extra.items():
+            data[label] = col[:n]
+        df = pd.DataFrame(data)
+        for (r, label), v in self.text.items():
+            df.at[r, label] = v
+        return df
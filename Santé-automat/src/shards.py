@@ -0,0 +1,105 @@
+"""
+Module du traitement par patient (mode --by-patient).
+
+Un dossier de PDF partagé par plusieurs patients est réparti en un dossier par
+patient sous SHARDS_FOLDER, chacun avec son stock, ses seuils et son export.
+Les dossiers sont indépendants: chaque patient est traité par son propre
+processus, sans verrou commun.
+"""
+import os
+import sqlite3
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import SHARDS_FOLDER, COLOR_MODE
+from observation_store import ObservationStore
+from thresholds_manager import ThresholdsManager
+from excel_manager import ExcelManager
+
+# Dossier des comptes rendus dont l'en-tête ne donne pas le patient
+UNKNOWN_PATIENT = "inconnu"
+
+
+def shard_name(patient):
+    """Nom de dossier du patient ("NOM Prénom jj-mm-aaaa" -> "NOM_Prenom_jj-mm-aaaa")."""
+    if not patient:
+        return UNKNOWN_PATIENT
+    ascii_name = unicodedata.normalize("NFKD", patient).encode("ascii", "ignore").decode("ascii")
+    name = "".join(ch if ch.isalnum() or ch == "-" else "_" for ch in ascii_name.strip())
+    return name or UNKNOWN_PATIENT
+
+
+def shard_paths(name, root=SHARDS_FOLDER):
+    """Chemins du dossier d'un patient: dossier, stock, export et seuils."""
+    folder = os.path.join(root, name)
+    return {
+        "folder": folder,
+        "store": os.path.join(folder, "resultats.sqlite"),
+        "output": os.path.join(folder, "resultats.xlsx"),
+        "thresholds": os.path.join(folder, "seuils.json"),
+    }
+
+
+def shard_has_date(name, date, root=SHARDS_FOLDER):
+    """Vrai si le stock du patient contient déjà des résultats à cette date (lecture seule)."""
+    path = shard_paths(name, root)["store"]
+    if not os.path.exists(path):
+        return False
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT 1 FROM observations WHERE date = ? LIMIT 1", (date,)).fetchone() is not None
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+def ingest_shard(name, entries, force=False, export_excel=False, color_mode=COLOR_MODE, root=SHARDS_FOLDER):
+    """
+    Ajoute au stock d'un patient les résultats de ses PDF [(date, results, sha, fichier)].
+
+    Les seuils du patient partent des seuils globaux à la création de son dossier.
+    L'export est régénéré s'il est demandé et que le stock a changé (ou n'a jamais été exporté).
+
+    Returns:
+        tuple: (nom du dossier, nombre de PDF ajoutés)
+    """
+    paths = shard_paths(name, root)
+    os.makedirs(paths["folder"], exist_ok=True)
+    thresholds_manager = ThresholdsManager(paths["thresholds"])
+    if not os.path.exists(paths["thresholds"]):
+        thresholds_manager.seed(ThresholdsManager().thresholds)
+    store = ObservationStore(paths["store"])
+    try:
+        batch, dates = [], set()
+        for date, results, sha, source in entries:
+            if (date in dates or store.has_date(date)) and not force:
+                continue
+            thresholds_manager.update_from_results(results)
+            batch.append((date, results, sha, source))
+            dates.add(date)
+        store.add_many(batch)
+        thresholds_manager.save_thresholds()
+        if export_excel and (batch or not os.path.exists(paths["output"])):
+            ExcelManager(paths["output"], color_mode).export_table(store.to_result_table(), thresholds_manager)
+    finally:
+        store.close()
+    return name, len(batch)
+
+
+def process_shards(groups, jobs=1, force=False, export_excel=False, color_mode=COLOR_MODE, root=SHARDS_FOLDER):
+    """
+    Traite les dossiers patients {nom: [(date, results, sha, fichier)]}, en parallèle si jobs > 1.
+
+    Yields:
+        tuple: (nom du dossier, nombre de PDF ajoutés), dans l'ordre d'achèvement
+    """
+    args = (force, export_excel, color_mode, root)
+    workers = min(jobs, len(groups))
+    if workers <= 1:
+        for name, entries in groups.items():
+            yield ingest_shard(name, entries, *args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(ingest_shard, name, entries, *args) for name, entries in groups.items()]
+        for future in as_completed(futures):
+            yield future.result()
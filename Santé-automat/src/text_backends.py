@@ -0,0 +1,155 @@
+"""
+Module des moteurs d'extraction du texte des PDF.
+
+Chaque moteur rend un itérateur des textes de page, page par page, pour que
+l'extracteur puisse arrêter la lecture avant la fin du document. Les
+bibliothèques ne sont importées qu'à l'utilisation.
+"""
+import os
+import json
+import shutil
+import io
+import functools
+import subprocess
+from importlib import metadata
+from config import BACKEND_CACHE_FILE
+
+# Ordre de préférence; pdfplumber sert de référence pour le mode auto
+BACKEND_NAMES = ("pdfplumber", "pypdf", "pdfminer", "pdftotext")
+AUTO = "auto"
+
+
+def _iter_pdfplumber(pdf_path, start=0):
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:]:
+            text = page.extract_text() or ""
+            page.close()
+            yield text
+
+
+def _pypdf_reader():
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+    return PdfReader
+
+
+def _iter_pypdf(pdf_path, start=0):
+    reader = _pypdf_reader()(pdf_path)
+    for page in reader.pages[start:]:
+        try:
+            yield page.extract_text() or ""
+        except Exception:
+            yield ""
+
+
+def _iter_pdfminer(pdf_path, start=0):
+    # Même texte que pdfminer.high_level.extract_text, rendu page par page
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    rsrc = PDFResourceManager()
+    out = io.StringIO()
+    device = TextConverter(rsrc, out, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrc, device)
+    try:
+        with open(pdf_path, "rb") as f:
+            for i, page in enumerate(PDFPage.get_pages(f)):
+                if i < start:
+                    continue   # page ignorée sans analyse de sa mise en page
+                interpreter.process_page(page)
+                # TextConverter termine chaque page par un saut de page (\f)
+                text = out.getvalue()
+                out.seek(0)
+                out.truncate()
+                yield text[:-1] if text.endswith("\f") else text
+    finally:
+        device.close()
+
+
+def _iter_pdftotext(pdf_path, start=0):
+    # pdftotext -layout -q -f N <pdf> -  : un saut de page (\f) termine chaque page
+    res = subprocess.run(["pdftotext", "-layout", "-q", "-f", str(start + 1), pdf_path, "-"],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if res.returncode != 0:
+        raise RuntimeError(f"pdftotext a échoué : {res.stderr.decode(errors='replace')}")
+    pages = res.stdout.decode("utf-8", errors="replace").split("\f")
+    yield from pages[:-1] if len(pages) > 1 and not pages[-1] else pages
+
+
+_ITERATORS = {
+    "pdfplumber": _iter_pdfplumber,
+    "pypdf": _iter_pypdf,
+    "pdfminer": _iter_pdfminer,
+    "pdftotext": _iter_pdftotext,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def backend_version(name):
+    """Version du moteur (bibliothèque ou binaire), None s'il n'est pas installé."""
+    if name == "pdftotext":
+        path = shutil.which("pdftotext")
+        if not path:
+            return None
+        res = subprocess.run(["pdftotext", "-v"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out = (res.stderr or res.stdout).decode(errors="replace").splitlines()
+        return out[0].strip() if out else "inconnue"
+    dists = {"pdfplumber": ("pdfplumber",), "pypdf": ("pypdf", "PyPDF2"), "pdfminer": ("pdfminer.six",)}
+    for dist in dists[name]:
+        try:
+            return f"{dist} {metadata.version(dist)}"
+        except metadata.PackageNotFoundError:
+            continue
+    return None
+
+
+def available_backends():
+    """Moteurs installés, dans l'ordre de préférence."""
+    return [name for name in BACKEND_NAMES if backend_version(name)]
+
+
+def iter_pages(name, pdf_path, start=0):
+    """Textes des pages d'un PDF à partir de la page `start`, lus à la demande avec le moteur `name`."""
+    try:
+        iterator = _ITERATORS[name]
+    except KeyError:
+        raise ValueError(f"Moteur d'extraction inconnu : {name} (choix: {', '.join(BACKEND_NAMES)}, {AUTO})")
+    return iterator(pdf_path, start)
+
+
+# -- choix automatique (mis en cache) ------------------------------------------
+
+def _environment():
+    """Moteurs installés et leurs versions: le choix en cache n'est valable que pour eux."""
+    return {name: backend_version(name) for name in available_backends()}
+
+
+def load_auto_choice(cache_file=BACKEND_CACHE_FILE):
+    """Moteur retenu lors d'un précédent banc d'essai, None si absent ou périmé."""
+    if not cache_file or not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"[WARN] Cache du moteur PDF illisible ({cache_file}), ignoré : {e}")
+        return None
+    if data.get("environment") != _environment():
+        return None
+    return data.get("backend")
+
+
+def save_auto_choice(backend, timings, sample, cache_file=BACKEND_CACHE_FILE):
+    """Mémorise le moteur retenu et les temps mesurés (écriture atomique)."""
+    if not cache_file:
+        return
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    tmp = cache_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"backend": backend, "sample": os.path.basename(sample), "timings": timings,
+                   "environment": _environment()}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, cache_file)
@@ -0,0 +1,102 @@
+"""
+Module du cache du texte extrait des PDF (SQLite, pages compressées zlib).
+
+Clé: empreinte SHA-256 du PDF + moteur d'extraction + version du moteur.
+Une modification du parseur, des seuils ou un --force relit le texte en cache
+au lieu de rouvrir le PDF. Partagé par PDFExtractor et test/pdf_to_text.py.
+"""
+import os
+import zlib
+import sqlite3
+from config import TEXT_CACHE_FILE
+from text_backends import backend_version, iter_pages
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sha      TEXT NOT NULL,
+    backend  TEXT NOT NULL,
+    version  TEXT NOT NULL,
+    pages    INTEGER,                     -- nombre de pages, NULL tant que le PDF n'a pas été lu jusqu'au bout
+    PRIMARY KEY (sha, backend, version)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    sha      TEXT NOT NULL,
+    backend  TEXT NOT NULL,
+    version  TEXT NOT NULL,
+    page     INTEGER NOT NULL,            -- à partir de 0
+    text     BLOB NOT NULL,               -- texte UTF-8 compressé (zlib)
+    PRIMARY KEY (sha, backend, version, page)
+);
+"""
+
+
+class TextCache:
+    """Cache du texte des PDF, page par page."""
+
+    # Pages lues gardées en mémoire avant d'être écrites dans le cache
+    FLUSH_PAGES = 32
+
+    def __init__(self, cache_file=TEXT_CACHE_FILE):
+        self.cache_file = cache_file
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        # Plusieurs processus (--jobs) peuvent écrire: WAL + attente du verrou
+        self.conn = sqlite3.connect(cache_file, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _key(self, sha, backend):
+        return (sha, backend, backend_version(backend) or "")
+
+    def _store(self, key, start, texts, complete):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO documents(sha, backend, version, pages) VALUES (?, ?, ?, NULL)", key
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages(sha, backend, version, page, text) VALUES (?, ?, ?, ?, ?)",
+                [(*key, start + i, zlib.compress(t.encode("utf-8"))) for i, t in enumerate(texts)],
+            )
+            if complete:
+                self.conn.execute(
+                    "UPDATE documents SET pages = ? WHERE sha = ? AND backend = ? AND version = ?",
+                    (start + len(texts), *key),
+                )
+
+    def iter_pages(self, sha, backend, pdf_path):
+        """
+        Textes des pages d'un PDF: d'abord celles en cache, puis, si le consommateur
+        va plus loin, celles rendues par le moteur (mises en cache au fur et à mesure
+        de la lecture et enregistrées quand elle s'arrête).
+        """
+        key = self._key(sha, backend)
+        row = self.conn.execute(
+            "SELECT pages FROM documents WHERE sha = ? AND backend = ? AND version = ?", key
+        ).fetchone()
+        start = 0
+        # Pages en cache lues une à une (curseur), sans tout charger
+        for (blob,) in self.conn.execute(
+                "SELECT text FROM pages WHERE sha = ? AND backend = ? AND version = ? ORDER BY page", key):
+            yield zlib.decompress(blob).decode("utf-8")
+            start += 1
+        if row is not None and row[0] == start:
+            return
+        new, done = [], False
+        try:
+            for text in iter_pages(backend, pdf_path, start=start):
+                new.append(text)
+                yield text
+                # Enregistrement par lots: mémoire bornée pour les très gros PDF
+                if len(new) >= self.FLUSH_PAGES:
+                    self._store(key, start, new, False)
+                    start, new = start + len(new), []
+            done = True
+        finally:
+            if new or done:
+                self._store(key, start, new, done)
+
+    def document_text(self, sha, backend, pdf_path):
+        """Liste des textes de toutes les pages (lecture complète, mise en cache)."""
+        return list(self.iter_pages(sha, backend, pdf_path))
@@ -3,87 +3,147 @@ Module de gestion des seuils de référence.
 """
 import os
 import json
+from types import MappingProxyType
 import pandas as pd
 from config import THRESHOLDS_FILE
 
+# Seuil rendu pour un paramètre inconnu: partagé et non modifiable
+DEFAULT_THRESHOLD = MappingProxyType({"min": None, "max": None})
+
+# Seuils déjà lus, par fichier: chemin absolu -> ((mtime_ns, taille), seuils)
+_cache = {}
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _float_or_none(v):
+    return None if v is None else float(str(v).replace(",", "."))
+
 
 class ThresholdsManager:
-    """Gestionnaire des seuils de référence pour les paramètres biologiques."""
-    
-    def __init__(self):
+    """
+    Gestionnaire des seuils de référence pour les paramètres biologiques.
+
+    Les paramètres ajoutés ou modifiés sont suivis (dirty): save_thresholds()
+    n'écrit le fichier que s'il y a du nouveau, en une fois et de façon atomique.
+    """
+
+    def __init__(self, thresholds_file=THRESHOLDS_FILE):
+        self.thresholds_file = thresholds_file
+        self.dirty = set()
         self.thresholds = self.load_thresholds()
-    
+
     def load_thresholds(self):
-        """Charge les seuils depuis le fichier de configuration."""
+        """
+        Charge les seuils depuis le fichier de configuration.
+        Le fichier n'est relu que si sa date ou sa taille a changé depuis la dernière lecture.
+        """
+        if not self.thresholds_file or not os.path.exists(self.thresholds_file):
+            return {}
+
+        key = os.path.abspath(self.thresholds_file)
+        signature = _signature(self.thresholds_file)
+        cached = _cache.get(key)
+        if cached is None or cached[0] != signature:
+            cached = (signature, self._read(self.thresholds_file))
+            _cache[key] = cached
+        # Copie: les seuils en cache ne sont pas modifiés par les gestionnaires
+        return {k: dict(v) for k, v in cached[1].items()}
+
+    def _read(self, path):
         thresholds = {}
-        if not THRESHOLDS_FILE or not os.path.exists(THRESHOLDS_FILE):
-            return thresholds
-        
-        _, ext = os.path.splitext(THRESHOLDS_FILE)
+        _, ext = os.path.splitext(path)
         try:
             if ext.lower() in [".json"]:
-                with open(THRESHOLDS_FILE, "r", encoding="utf-8") as f:
+                with open(path, "r", encoding="utf-8") as f:
                     data = json.load(f)
                 # normaliser {param: {min: x, max: y}}
                 for k, v in data.items():
                     try:
-                        thresholds[k] = {
-                            "min": None if v.get("min") is None else float(str(v.get("min")).replace(",", ".")),
-                            "max": None if v.get("max") is None else float(str(v.get("max")).replace(",", ".")),
-                        }
+                        thresholds[k] = {"min": _float_or_none(v.get("min")), "max": _float_or_none(v.get("max"))}
                     except Exception:
                         continue
             elif ext.lower() in [".xlsx", ".xlsm", ".xltx", ".xltm"]:
-                df_thresh = pd.read_excel(THRESHOLDS_FILE, engine="openpyxl")
-                for _, row in df_thresh.iterrows():
-                    try:
-                        pname = str(row["Paramètre"]) if "Paramètre" in row else None
-                        if not pname:
-                            continue
-                        vmin = row["min"] if "min" in row else None
-                        vmax = row["max"] if "max" in row else None
-                        thresholds[pname] = {
-                            "min": None if vmin is None or pd.isna(vmin) else float(vmin),
-                            "max": None if vmax is None or pd.isna(vmax) else float(vmax),
+                df_thresh = pd.read_excel(path, engine="openpyxl")
+                if "Paramètre" not in df_thresh.columns:
+                    return thresholds
+                names = df_thresh["Paramètre"]
+                bounds = {}
+                valid = names.notna()
+                for col in ("min", "max"):
+                    if col in df_thresh.columns:
+                        raw = df_thresh[col]
+                        values = pd.to_numeric(raw, errors="coerce")
+                        # valeur présente mais non numérique: ligne ignorée
+                        valid &= raw.isna() | values.notna()
+                        bounds[col] = values.astype(object).where(values.notna(), None).tolist()
+                    else:
+                        bounds[col] = [None] * len(df_thresh)
+                for pname, vmin, vmax, ok in zip(names.tolist(), bounds["min"], bounds["max"], valid.tolist()):
+                    if ok and str(pname):
+                        thresholds[str(pname)] = {
+                            "min": None if vmin is None else float(vmin),
+                            "max": None if vmax is None else float(vmax),
                         }
-                    except Exception:
-                        continue
             else:
                 print(f"[WARN] Extension de THRESHOLDS_FILE non supportée: {ext}")
         except Exception as e:
-            print(f"[WARN] Impossible de lire THRESHOLDS_FILE : {e}")
-        
+            print(f"[WARN] Impossible de lire THRESHOLDS_FILE ({path}) : {e}")
+
         return thresholds
-    
+
     def save_thresholds(self, thresholds=None):
-        """Sauvegarde les seuils dans le fichier de configuration."""
+        """
+        Sauvegarde les seuils dans le fichier de configuration, si des paramètres
+        ont été ajoutés depuis le chargement (ou si `thresholds` remplace l'ensemble).
+
+        Returns:
+            bool: vrai si le fichier a été écrit
+        """
         if thresholds is not None:
             self.thresholds = thresholds
-        
-        if not THRESHOLDS_FILE:
-            return
-        
-        os.makedirs(os.path.dirname(THRESHOLDS_FILE) or ".", exist_ok=True)
-        _, ext = os.path.splitext(THRESHOLDS_FILE)
+            self.dirty.update(thresholds)
+
+        if not self.thresholds_file or not self.dirty:
+            return False
+
+        _, ext = os.path.splitext(self.thresholds_file)
+        # Sauvegarde JSON par défaut même si extension non-json
+        path = self.thresholds_file if ext.lower() == ".json" else self.thresholds_file + ".json"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
         try:
-            if ext.lower() == ".json":
-                with open(THRESHOLDS_FILE, "w", encoding="utf-8") as f:
-                    json.dump(self.thresholds, f, ensure_ascii=False, indent=2)
-            else:
-                # Sauvegarde JSON par défaut même si extension non-json
-                with open(THRESHOLDS_FILE + ".json", "w", encoding="utf-8") as f:
-                    json.dump(self.thresholds, f, ensure_ascii=False, indent=2)
-                print(f"[INFO] Seuils enregistrés dans {THRESHOLDS_FILE + '.json'}")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.thresholds, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
         except Exception as e:
             print(f"[WARN] Échec d'enregistrement des seuils: {e}")
-    
+            return False
+        if path != self.thresholds_file:
+            print(f"[INFO] Seuils enregistrés dans {path}")
+        else:
+            _cache[os.path.abspath(path)] = (_signature(path), {k: dict(v) for k, v in self.thresholds.items()})
+        self.dirty.clear()
+        return True
+
+    def seed(self, thresholds):
+        """Ajoute les seuils absents (ex: seuils globaux pour un nouveau dossier patient)."""
+        for param, threshold in thresholds.items():
+            if param not in self.thresholds:
+                self.thresholds[param] = dict(threshold)
+                self.dirty.add(param)
+
     def update_from_results(self, results):
         """Met à jour les seuils à partir des résultats extraits du PDF."""
         for param, info in results.items():
             if info.get("min") is not None and info.get("max") is not None:
                 if param not in self.thresholds:
                     self.thresholds[param] = {"min": info["min"], "max": info["max"]}
-    
+                    self.dirty.add(param)
+
     def get_threshold(self, param):
-        """Récupère les seuils min/max pour un paramètre donné."""
-        return self.thresholds.get(param, {"min": None, "max": None})
+        """Récupère les seuils min/max pour un paramètre donné (DEFAULT_THRESHOLD s'il est inconnu)."""
+        return self.thresholds.get(param, DEFAULT_THRESHOLD)
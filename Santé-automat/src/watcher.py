@@ -0,0 +1,143 @@
+"""
+Module de surveillance du dossier des PDF (mode --watch).
+
+Avec watchdog installé, les événements du système (inotify sous Linux) signalent
+les PDF créés, modifiés ou déplacés; sinon le dossier est relu périodiquement.
+Un PDF n'est rendu qu'une fois complètement écrit: taille et date de
+modification stables pendant WATCH_SETTLE secondes et fin de fichier (%%EOF)
+présente. Un PDF stable sans %%EOF (fichier tronqué, ou octets ajoutés après la
+fin) est rendu malgré tout après WATCH_EOF_TIMEOUT secondes, avec un avertissement.
+"""
+import os
+import time
+import threading
+from config import WATCH_SETTLE, WATCH_EOF_TIMEOUT
+
+# Marqueur de fin d'un PDF, cherché dans les derniers octets du fichier
+PDF_EOF = b"%%EOF"
+EOF_TAIL = 1024
+
+
+def _signature(path):
+    """(taille, mtime_ns) du fichier, None s'il a disparu."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def is_complete_pdf(path):
+    """Vrai si le fichier se termine par le marqueur %%EOF (écriture terminée)."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - EOF_TAIL))
+            return PDF_EOF in f.read()
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """
+    Détecte les PDF nouveaux ou modifiés d'un dossier.
+
+    poll() relève les changements (événements watchdog ou relecture du dossier),
+    ready() rend les PDF stabilisés, chacun une seule fois par modification.
+    """
+
+    def __init__(self, folder, settle=WATCH_SETTLE, use_watchdog=True, eof_timeout=WATCH_EOF_TIMEOUT):
+        self.folder = folder
+        self.settle = settle
+        self.eof_timeout = eof_timeout
+        self.pending = {}        # chemin -> (signature, instant où elle a été vue pour la première fois)
+        self.known = {}          # chemin -> signature au dernier passage (mode relecture)
+        self._events = set()     # chemins signalés par watchdog, vidés par poll()
+        self._lock = threading.Lock()
+        self._observer = None
+        if use_watchdog:
+            self._start_watchdog()
+        self.known = self._scan()
+        self.mode = "watchdog" if self._observer else "relecture"
+
+    # -- sources de changements -----------------------------------------------
+
+    def _start_watchdog(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                    if path and path.lower().endswith(".pdf"):
+                        with watcher._lock:
+                            watcher._events.add(path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.folder, recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+
+    def _scan(self):
+        sigs = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                    st = entry.stat()
+                    sigs[entry.path] = (st.st_size, st.st_mtime_ns)
+        return sigs
+
+    def poll(self):
+        """Relève les PDF changés depuis le dernier appel et les met en attente de stabilisation."""
+        if self._observer:
+            with self._lock:
+                changed, self._events = self._events, set()
+            sigs = {path: _signature(path) for path in changed}
+        else:
+            current = self._scan()
+            sigs = {path: sig for path, sig in current.items() if self.known.get(path) != sig}
+            self.known = current
+        now = time.monotonic()
+        for path, sig in sigs.items():
+            if sig is None:
+                self.pending.pop(path, None)
+            elif path not in self.pending or self.pending[path][0] != sig:
+                self.pending[path] = (sig, now)
+
+    def ready(self):
+        """
+        PDF complètement écrits (stables depuis `settle` secondes et terminés par %%EOF),
+        ou stables depuis `eof_timeout` secondes sans %%EOF (avertissement).
+        """
+        now = time.monotonic()
+        done = []
+        for path, (sig, since) in list(self.pending.items()):
+            current = _signature(path)
+            if current is None:
+                del self.pending[path]
+            elif current != sig:
+                # encore en cours d'écriture: on repart de cette signature
+                self.pending[path] = (current, now)
+            elif now - since >= self.settle:
+                if is_complete_pdf(path):
+                    del self.pending[path]
+                    done.append(path)
+                elif now - since >= self.eof_timeout:
+                    print(f"[WARN] {os.path.basename(path)}: pas de %%EOF après {self.eof_timeout:g}s "
+                          f"sans changement, lecture tentée malgré tout")
+                    del self.pending[path]
+                    done.append(path)
+        return sorted(done)
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
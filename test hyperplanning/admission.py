@@ -0,0 +1,228 @@
+"""Admission control for ICS regenerations.
+
+Each regeneration starts a full Selenium scrape, so the server only lets a
+request through when:
+  - the caller's token bucket (per API token, or per client address when no
+    token is configured) has a token left,
+  - the bucket of the requested class has a token left,
+  - a scrape slot is free (global cap on concurrent scrapes),
+  - for ``force=1``, the last forced scrape of that class is old enough.
+
+Limits are read from environment variables (see ``AdmissionController.from_env``).
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 if available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now):
+        """True when the bucket has refilled to capacity: it is then no different from a new one."""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class Decision:
+    """Result of an admission check."""
+
+    __slots__ = ("admitted", "reason", "retry_after")
+
+    def __init__(self, admitted, reason=None, retry_after=0.0):
+        self.admitted = admitted
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def retry_after_header(self):
+        """Value for the ``Retry-After`` header (whole seconds, at least 1)."""
+        if math.isinf(self.retry_after):
+            return "3600"
+        return str(max(1, int(math.ceil(self.retry_after))))
+
+
+class AdmissionController:
+    """Decide whether a regeneration may start, and count the decisions.
+
+    All checks are made under one lock and nothing is consumed unless every
+    check passes, so a rejected request never burns tokens or slots.
+    """
+
+    REASONS = ("force_interval", "token_rate", "class_rate", "concurrency")
+
+    # Seconds between two sweeps of the idle buckets
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, token_rate=2 / 60, token_burst=3, class_rate=1 / 60, class_burst=2,
+                 max_concurrent=1, force_min_interval=300, clock=time.monotonic):
+        self.token_rate = token_rate
+        self.token_burst = token_burst
+        self.class_rate = class_rate
+        self.class_burst = class_burst
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.force_min_interval = force_min_interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._token_buckets = {}
+        self._class_buckets = {}
+        self._last_forced = {}
+        self._in_flight = 0
+        self._last_sweep = clock()
+
+        self.counters = {
+            "admitted": 0,
+            "served_cached": 0,
+            "rejected_429": 0,
+            "rejected": {reason: 0 for reason in self.REASONS},
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build a controller from ``ADMISSION_*`` environment variables.
+
+        Rates are expressed per minute, intervals in seconds.
+        """
+        return cls(
+            token_rate=_env_float("ADMISSION_TOKEN_RATE_PER_MIN", 2) / 60,
+            token_burst=_env_float("ADMISSION_TOKEN_BURST", 3),
+            class_rate=_env_float("ADMISSION_CLASS_RATE_PER_MIN", 1) / 60,
+            class_burst=_env_float("ADMISSION_CLASS_BURST", 2),
+            max_concurrent=_env_float("ADMISSION_MAX_CONCURRENT", 1),
+            force_min_interval=_env_float("ADMISSION_FORCE_MIN_INTERVAL", 300),
+        )
+
+    def _bucket(self, buckets, key, rate, capacity, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, capacity, now)
+        return bucket
+
+    def _sweep(self, now):
+        """Forget idle state: full buckets and forced-scrape times past the interval.
+
+        Buckets are keyed by client address or token, so without this a
+        long-running server would keep one per caller ever seen. Dropping a
+        full bucket changes nothing: a new one starts full.
+        """
+        self._last_sweep = now
+        for buckets in (self._token_buckets, self._class_buckets):
+            for key in [key for key, bucket in buckets.items() if bucket.is_full(now)]:
+                del buckets[key]
+        for key in [key for key, last in self._last_forced.items() if now - last >= self.force_min_interval]:
+            del self._last_forced[key]
+
+    def admit(self, client_key, class_name, force=False):
+        """Try to reserve a regeneration for ``client_key`` on ``class_name``.
+
+        On success a scrape slot is held: the caller must call ``release()``
+        once the scrape is over.
+        """
+        with self._lock:
+            now = self.clock()
+            if now - self._last_sweep >= self.SWEEP_INTERVAL:
+                self._sweep(now)
+
+            if force:
+                last = self._last_forced.get(class_name)
+                if last is not None and now - last < self.force_min_interval:
+                    return self._reject("force_interval", self.force_min_interval - (now - last))
+
+            token_bucket = self._bucket(self._token_buckets, client_key, self.token_rate, self.token_burst, now)
+            wait = token_bucket.wait_time(now)
+            if wait > 0:
+                return self._reject("token_rate", wait)
+
+            class_bucket = self._bucket(self._class_buckets, class_name, self.class_rate, self.class_burst, now)
+            wait = class_bucket.wait_time(now)
+            if wait > 0:
+                return self._reject("class_rate", wait)
+
+            if self._in_flight >= self.max_concurrent:
+                # a scrape usually takes ~20 s: ask to come back after that
+                return self._reject("concurrency", 30)
+
+            token_bucket.consume(now)
+            class_bucket.consume(now)
+            if force:
+                self._last_forced[class_name] = now
+            self._in_flight += 1
+            self.counters["admitted"] += 1
+            return Decision(True)
+
+    def _reject(self, reason, retry_after):
+        self.counters["rejected"][reason] += 1
+        return Decision(False, reason, retry_after)
+
+    def release(self):
+        """Free the scrape slot taken by a successful ``admit()``."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._slot_free.notify()
+
+    @contextmanager
+    def scrape_slot(self):
+        """Hold a scrape slot, waiting for one to free up.
+
+        Used by internal jobs (cron) which bypass the rate limits but must
+        still respect the global concurrency cap.
+        """
+        with self._lock:
+            while self._in_flight >= self.max_concurrent:
+                self._slot_free.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, outcome):
+        """Count what was sent back to a rejected request (``served_cached`` or ``rejected_429``)."""
+        with self._lock:
+            self.counters[outcome] += 1
+
+    def stats(self):
+        """Snapshot of the counters, for ``/status``."""
+        with self._lock:
+            return {
+                "admitted": self.counters["admitted"],
+                "served_cached": self.counters["served_cached"],
+                "rejected_429": self.counters["rejected_429"],
+                "rejected": dict(self.counters["rejected"]),
+                "in_flight": self._in_flight,
+                "max_concurrent": self.max_concurrent,
+            }
@@ -0,0 +1,157 @@
+"""Compare peak memory and scrape time of the browser profiles.
+
+Runs scrape_and_generate once per profile and repetition, while a sampler
+thread sums the RSS of the whole process tree (chromedriver + every Chrome
+process) every 100 ms. Outputs go to a temporary directory, the real
+edt_IG1.json/.ics are not touched.
+
+Usage: python bench_browser_profiles.py [--runs 3] [--class IG1] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from edt_IG1 import BROWSER_PROFILES, scrape_and_generate
+
+
+def _children(pid):
+    """Direct children of pid, read from /proc (Linux)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(x) for x in f.read().split()]
+    except OSError:
+        return []
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def tree_rss(pid):
+    """RSS of pid and all its descendants, in bytes."""
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        total = 0
+        for p in [proc] + proc.children(recursive=True):
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    except ImportError:
+        total = 0
+        stack = [pid]
+        while stack:
+            p = stack.pop()
+            total += _rss_bytes(p)
+            stack.extend(_children(p))
+        return total
+
+
+class PeakSampler(threading.Thread):
+    """Keep the highest RSS seen for the process tree of this interpreter."""
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.baseline = tree_rss(os.getpid())
+        self.peak = self.baseline
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, tree_rss(os.getpid()))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak - self.baseline
+
+
+def run_once(profile, class_name, workdir):
+    sampler = PeakSampler()
+    sampler.start()
+    start = time.perf_counter()
+    cpu_start = os.times()
+    error = None
+    events = None
+    try:
+        _, _, stats = scrape_and_generate(
+            output_json=os.path.join(workdir, f"{profile}.json"),
+            output_ics=os.path.join(workdir, f"{profile}.ics"),
+            class_name=class_name,
+            profile=profile,
+        )
+        events = stats.get("hour_events", 0) + stats.get("all_day", 0)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    cpu_end = os.times()
+    peak = sampler.stop()
+    # children_* covers chromedriver and Chrome once they have exited
+    cpu = sum(cpu_end[i] - cpu_start[i] for i in range(4))
+    return {"profile": profile, "wall_s": wall, "cpu_s": cpu, "peak_rss_mb": peak / 2**20,
+            "events": events, "error": error}
+
+
+def summarize(runs):
+    ok = [r for r in runs if not r["error"]]
+    if not ok:
+        return {"runs": len(runs), "errors": len(runs)}
+    return {
+        "runs": len(runs),
+        "errors": len(runs) - len(ok),
+        "wall_s_median": statistics.median(r["wall_s"] for r in ok),
+        "cpu_s_median": statistics.median(r["cpu_s"] for r in ok),
+        "peak_rss_mb_median": statistics.median(r["peak_rss_mb"] for r in ok),
+        "peak_rss_mb_max": max(r["peak_rss_mb"] for r in ok),
+        "events": sorted({r["events"] for r in ok}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="repetitions per profile")
+    parser.add_argument("--class", dest="class_name", default="IG1")
+    parser.add_argument("--profiles", default=",".join(BROWSER_PROFILES))
+    parser.add_argument("--json", help="also write raw runs and summary to this file")
+    args = parser.parse_args()
+
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # alternate profiles so that network/host noise hits both equally
+        for i in range(args.runs):
+            for profile in profiles:
+                r = run_once(profile, args.class_name, workdir)
+                runs.append(r)
+                print(f"[{i + 1}/{args.runs}] {profile:8s} wall={r['wall_s']:.1f}s cpu={r['cpu_s']:.1f}s "
+                      f"peak_rss={r['peak_rss_mb']:.0f}MB events={r['events']} {r['error'] or ''}")
+
+    summary = {p: summarize([r for r in runs if r["profile"] == p]) for p in profiles}
+    print()
+    print(f"{'profile':10s}{'wall (s)':>10s}{'cpu (s)':>10s}{'peak RSS (MB)':>16s}{'events':>10s}")
+    for p, s in summary.items():
+        if "wall_s_median" not in s:
+            print(f"{p:10s}{'all runs failed':>46s}")
+            continue
+        print(f"{p:10s}{s['wall_s_median']:10.1f}{s['cpu_s_median']:10.1f}"
+              f"{s['peak_rss_mb_median']:16.0f}{str(s['events']):>10s}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs, "summary": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,293 @@
 """Scraper for HPesgt timetable and ICS generator.
 
 Provides a function scrape_and_generate(output_json, output_ics, class_name).
+Block parsing (construire_edt) works on plain dicts, so it can also run on a
+saved HTML snapshot without a browser (see snapshot_parser.py). Days and
+times come from the block positions (see layout_decoder.py).
 """
 import os
 import re
+import gzip
 import json
 import time
 import uuid
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
+from history import TimetableHistory
+from layout_decoder import LayoutDecoder, classer_libelles, lire_geometrie, minutes_vers_texte, texte_vers_minutes
+
 # Default output paths
 JSON_DEFAULT = os.path.join(os.path.dirname(__file__), "edt_IG1.json")
 ICS_DEFAULT = os.path.join(os.path.dirname(__file__), "edt_IG1.ics")
 
+# Hyperplanning guest page (UPSTREAM is the host, used to key circuit breakers)
+HP_URL = "https://hpesgt.cnam.fr/hp/invite"
+UPSTREAM = "hpesgt.cnam.fr"
+
+# Class names of the grid's day headers and hour labels (optional: by default they
+# are recognised by their text, see lire_grille_driver)
+GRID_DAY_CLASS = os.environ.get("HP_GRID_DAY_CLASS", "")
+GRID_HOUR_CLASS = os.environ.get("HP_GRID_HOUR_CLASS", "")
+
+
+# Browser profiles: "default" keeps the historical options, "lean" trims Chrome
+# down to what the scraper needs (select with HP_BROWSER_PROFILE=lean).
+BROWSER_PROFILES = ("default", "lean")
+
+# Resource types blocked by the "lean" profile (override with HP_LEAN_BLOCK=image,font,...).
+# Stylesheets are not blocked by default: block positions and heights, from which
+# days and times are decoded (layout_decoder.py), come from the CSS.
+LEAN_BLOCKED_PATTERNS = {
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.bmp"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "stylesheet": ["*.css"],
+    "media": ["*.mp4", "*.webm", "*.mp3", "*.ogg", "*.wav"],
+}
+LEAN_BLOCK_DEFAULT = "image,font,media"
+
+# V8 old-space cap (MB) for the "lean" profile (override with HP_LEAN_JS_HEAP_MB)
+LEAN_JS_HEAP_MB = 256
+
+
+def lean_js_heap_mb():
+    """HP_LEAN_JS_HEAP_MB, or LEAN_JS_HEAP_MB when unset or invalid."""
+    value = os.environ.get("HP_LEAN_JS_HEAP_MB")
+    if not value:
+        return LEAN_JS_HEAP_MB
+    try:
+        mb = int(value)
+        if mb <= 0:
+            raise ValueError
+        return mb
+    except ValueError:
+        print(f"HP_LEAN_JS_HEAP_MB invalide ({value!r}), valeur par défaut utilisée: {LEAN_JS_HEAP_MB}")
+        return LEAN_JS_HEAP_MB
+
+
+def build_chrome_options(options, profile="default"):
+    """Fill a selenium ChromeOptions instance for the given browser profile."""
+    if profile not in BROWSER_PROFILES:
+        raise ValueError(f"Unknown browser profile {profile!r} (expected one of {BROWSER_PROFILES})")
+
+    if os.environ.get("FORCE_HEADLESS") or not os.environ.get("DISPLAY"):
+        try:
+            options.add_argument("--headless=new")
+        except Exception:
+            options.add_argument("--headless")
+    options.add_argument("--window-size=1400,900")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+
+    if profile == "lean":
+        # return from driver.get() once the DOM is ready, without waiting for subresources
+        options.page_load_strategy = "eager"
+        for arg in (
+            "--disable-gpu",
+            "--disable-extensions",
+            "--disable-background-networking",
+            "--disable-background-timer-throttling",
+            "--disable-component-update",
+            "--disable-default-apps",
+            "--disable-sync",
+            "--metrics-recording-only",
+            "--mute-audio",
+            "--no-first-run",
+            "--blink-settings=imagesEnabled=false",
+            f"--js-flags=--max-old-space-size={lean_js_heap_mb()}",
+        ):
+            options.add_argument(arg)
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
+    return options
+
+
+def apply_network_blocking(driver, profile="default"):
+    """Block unneeded resource types through the DevTools protocol ("lean" profile only)."""
+    if profile != "lean":
+        return
+    kinds = [k.strip() for k in os.environ.get("HP_LEAN_BLOCK", LEAN_BLOCK_DEFAULT).split(",") if k.strip()]
+    patterns = [p for k in kinds for p in LEAN_BLOCKED_PATTERNS.get(k, [])]
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        # not fatal: the scrape still works, only heavier
+        print("Blocage réseau indisponible:", e)
+
+
+def parse_horaire(h):
+    """Extract (start, end) as "HH:MM" strings from a free-form time range."""
+    if not h:
+        return None, None
+    m = re.search(r"(?:de\s*)?(\d{1,2}[:h]\d{2})\s*(?:[-–/]|à|a|au)\s*(\d{1,2}[:h]\d{2})", h)
+    if m:
+        return m.group(1).replace("h", ":"), m.group(2).replace("h", ":")
+    times = re.findall(r"\d{1,2}[:h]\d{2}", h)
+    if len(times) >= 2:
+        return times[0].replace("h", ":"), times[1].replace("h", ":")
+    m = re.search(r"(\d{2})(\d{2})\s*[-–/]\s*(\d{2})(\d{2})", h)
+    if m:
+        return f"{m.group(1)}:{m.group(2)}", f"{m.group(3)}:{m.group(4)}"
+    return None, None
+
+
+def construire_edt(blocs, grille=None, stats=None):
+    """Build the ``edt`` list from raw timetable blocks.
+
+    Each raw block is a plain dict, as produced from the live page
+    (``lire_blocs_driver``) or from a saved HTML snapshot (snapshot_parser):
+      - style: style attribute of div.EmploiDuTemps_Element
+      - cours_simple: False when the block has no div.cours-simple
+      - title, style_cours: title/style attributes of div.cours-simple
+      - labels: texts of its <label> elements
+      - contenus: texts of its div.contenu elements
+
+    ``grille`` gives the day headers and hour labels of the grid
+    ({"jours": [(style, text)], "heures": [(style, text)]}, see ``lire_grille_driver``).
+    Day and times are decoded from the block positions against them
+    (layout_decoder); the tooltip times are only a cross-check, whose counters
+    go into ``stats``. Without day headers, days are "Inconnu"; without hour
+    labels, the tooltip times are used as they are.
+    """
+    grille = grille or {}
+    geometries = []
+    attendus = []
+    for bloc in blocs:
+        geometries.append(lire_geometrie(bloc.get("style") or bloc.get("style_cours")))
+        debut, fin = parse_horaire((bloc.get("title") or "").strip())
+        attendus.append((texte_vers_minutes(debut), texte_vers_minutes(fin)) if debut and fin else None)
+
+    decoder = LayoutDecoder.depuis_grille(entetes=grille.get("jours"), heures=grille.get("heures"))
+    if blocs and not decoder.jours:
+        print("En-têtes de jours introuvables: jours non décodés (voir HP_GRID_DAY_CLASS)")
+    if blocs and decoder.axe is None:
+        print("Libellés d'heures introuvables: horaires lus dans les infobulles (voir HP_GRID_HOUR_CLASS)")
+
+    edt = []
+    for bloc, geometrie, attendu in zip(blocs, geometries, attendus):
+        if not bloc.get("cours_simple"):
+            print("Erreur bloc: div.cours-simple introuvable")
+            continue
+        horaire = (bloc.get("title") or "").strip()
+        jour = decoder.jour(geometrie)
+        if decoder.axe is None:
+            debut, fin = (minutes_vers_texte(attendu[0]), minutes_vers_texte(attendu[1])) if attendu else (None, None)
+        else:
+            debut, fin = decoder.horaire(geometrie)
+            if not decoder.verifier(debut, fin, attendu):
+                print(f"Horaire discordant: position {debut}-{fin}, infobulle {horaire!r}")
+        labels = bloc.get("labels") or []
+        nom = labels[0].strip() if labels else ""
+        prof = ""
+        salle = ""
+        for c in bloc.get("contenus") or []:
+            txt = c.strip()
+            if not txt or txt == nom:
+                continue
+            if re.search(r"\b(Salle|Amphi)\b", txt, re.I):
+                salle = txt
+            elif not prof:
+                prof = txt
+        edt.append({
+            "jour": jour,
+            "horaire": horaire,
+            "debut": debut,
+            "fin": fin,
+            "cours": nom,
+            "professeur": prof,
+            "salle": salle,
+        })
+    if stats is not None:
+        stats.update(decoder.stats)
+    return edt
+
+
+# Positioned elements outside the course blocks, with short text: candidate grid labels
+JS_LIBELLES_GRILLE = """
+return Array.from(document.querySelectorAll('[style*="left"], [style*="top"]'))
+    .filter(e => !e.closest('.EmploiDuTemps_Element'))
+    .map(e => [e.getAttribute('style') || '', (e.innerText || '').trim()])
+    .filter(p => p[1] && p[1].length <= 40);
+"""
+
+
+def lire_grille_driver(driver, By):
+    """Read the day headers and hour labels of the grid (see ``construire_edt``).
+
+    Their class names can be set with HP_GRID_DAY_CLASS / HP_GRID_HOUR_CLASS;
+    when unset, they are the positioned elements outside the course blocks
+    whose text is a day name or an hour (layout_decoder.classer_libelles).
+    """
+    grille = {}
+    for key, classe in (("jours", GRID_DAY_CLASS), ("heures", GRID_HOUR_CLASS)):
+        if not classe:
+            continue
+        try:
+            grille[key] = [(e.get_attribute("style") or "", e.text)
+                           for e in driver.find_elements(By.CLASS_NAME, classe)]
+        except Exception as e:
+            print("Erreur grille:", e)
+    if not (GRID_DAY_CLASS and GRID_HOUR_CLASS):
+        try:
+            elements = driver.execute_script(JS_LIBELLES_GRILLE) or []
+        except Exception as e:
+            print("Erreur grille:", e)
+            elements = []
+        trouves = classer_libelles(elements)
+        for key in ("jours", "heures"):
+            grille.setdefault(key, trouves[key])
+    return grille
+
+
+def lire_blocs_driver(driver, By):
+    """Read the raw timetable blocks (see ``construire_edt``) from a live WebDriver."""
+    blocs = []
+    for bloc in driver.find_elements(By.CSS_SELECTOR, "div.EmploiDuTemps_Element"):
+        try:
+            raw = {"style": bloc.get_attribute("style") or "", "cours_simple": False}
+            found = bloc.find_elements(By.CSS_SELECTOR, "div.cours-simple")
+            if found:
+                cours_simple = found[0]
+                raw.update({
+                    "cours_simple": True,
+                    "title": cours_simple.get_attribute("title") or "",
+                    "style_cours": cours_simple.get_attribute("style") or "",
+                    "labels": [l.text for l in cours_simple.find_elements(By.TAG_NAME, "label")],
+                    "contenus": [c.text for c in cours_simple.find_elements(By.CSS_SELECTOR, "div.contenu")],
+                })
+            blocs.append(raw)
+        except Exception as e:
+            print("Erreur bloc:", e)
+            continue
+    return blocs
+
 
-def scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_name="IG1"):
+def sauver_snapshot(html, snapshot_dir, class_name):
+    """Write the rendered timetable HTML, gzip-compressed, and return its path."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    stamp = datetime.now(ZoneInfo("UTC")).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(snapshot_dir, f"{class_name}_{stamp}.html.gz")
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(html)
+    return path
+
+
+def scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_name="IG1", profile=None,
+                        snapshot_dir=None):
     """Scrape the hyperplanning site and write JSON + ICS files.
 
+    ``profile`` selects the browser profile ("default" or "lean"); when None the
+    HP_BROWSER_PROFILE environment variable is used. When ``snapshot_dir`` (or
+    HP_SNAPSHOT_DIR) is set, the rendered page is also saved there as
+    ``<class>_<UTC timestamp>.html.gz`` for offline reprocessing (snapshot_parser.py).
+    When HP_HISTORY_DIR is set, the event set is also recorded in the
+    versioned history (history.py).
+
     Returns (json_path, ics_path, stats)
     """
     # Lazy import to avoid import-time dependency
@@ -31,15 +301,9 @@ def scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_
     except Exception:
         raise RuntimeError("Selenium is required. Install with: pip install selenium webdriver-manager")
 
-    options = Options()
-    if os.environ.get("FORCE_HEADLESS") or not os.environ.get("DISPLAY"):
-        try:
-            options.add_argument("--headless=new")
-        except Exception:
-            options.add_argument("--headless")
-    options.add_argument("--window-size=1400,900")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
+    profile = profile or os.environ.get("HP_BROWSER_PROFILE", "default")
+    snapshot_dir = snapshot_dir or os.environ.get("HP_SNAPSHOT_DIR")
+    options = build_chrome_options(Options(), profile)
 
     # start driver
     try:
@@ -48,48 +312,10 @@ def scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_
         driver = webdriver.Chrome(service=service, options=options)
     except Exception:
         driver = webdriver.Chrome(options=options)
-
-    def parse_horaire(h):
-        if not h:
-            return None, None
-        m = re.search(r"(?:de\s*)?(\d{1,2}[:h]\d{2})\s*(?:[-–/]|à|a|au)\s*(\d{1,2}[:h]\d{2})", h)
-        if m:
-            return m.group(1).replace("h", ":"), m.group(2).replace("h", ":")
-        times = re.findall(r"\d{1,2}[:h]\d{2}", h)
-        if len(times) >= 2:
-            return times[0].replace("h", ":"), times[1].replace("h", ":")
-        m = re.search(r"(\d{2})(\d{2})\s*[-–/]\s*(\d{2})(\d{2})", h)
-        if m:
-            return f"{m.group(1)}:{m.group(2)}", f"{m.group(3)}:{m.group(4)}"
-        return None, None
-
-    def trouver_jour_par_colonnes(blocs):
-        lefts = []
-        for b in blocs:
-            s = b.get_attribute("style") or ""
-            m = re.search(r"left:\s*(-?\d+)px", s)
-            if m:
-                lefts.append(int(m.group(1)))
-        if not lefts:
-            def _f(style):
-                return "Inconnu"
-            return _f, ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi"]
-        unique = sorted({int(round(x)) for x in lefts})[:5]
-        days = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi"][:len(unique)]
-        mapping = {pos: day for pos, day in zip(unique, days)}
-        def _map(style):
-            m = re.search(r"left:\s*(-?\d+)px", style or "")
-            if not m:
-                return "Inconnu"
-            val = int(m.group(1))
-            nearest = min(mapping.keys(), key=lambda k: abs(k - val))
-            if abs(nearest - val) <= 30:
-                return mapping[nearest]
-            return "Inconnu"
-        return _map, days
+    apply_network_blocking(driver, profile)
 
     try:
-        driver.get("https://hpesgt.cnam.fr/hp/invite")
+        driver.get(HP_URL)
         time.sleep(5)
         champ = driver.find_element(By.ID, "GInterface.Instances[1].Instances[1].bouton_Edit")
         champ.clear()
@@ -103,43 +329,23 @@ def scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_
             ActionChains(driver).move_to_element(body).send_keys(Keys.PAGE_DOWN).perform()
             time.sleep(1.0)
 
-        blocs = driver.find_elements(By.CSS_SELECTOR, "div.EmploiDuTemps_Element")
-        trouver_jour, _ = trouver_jour_par_colonnes(blocs)
+        if snapshot_dir:
+            print("Snapshot:", sauver_snapshot(driver.page_source, snapshot_dir, class_name))
 
-        edt = []
-        for bloc in blocs:
-            try:
-                cours_simple = bloc.find_element(By.CSS_SELECTOR, "div.cours-simple")
-                horaire = (cours_simple.get_attribute("title") or "").strip()
-                style = bloc.get_attribute("style") or cours_simple.get_attribute("style")
-                jour = trouver_jour(style)
-                labels = cours_simple.find_elements(By.TAG_NAME, "label")
-                nom = labels[0].text.strip() if labels else ""
-                prof = ""
-                salle = ""
-                for c in cours_simple.find_elements(By.CSS_SELECTOR, "div.contenu"):
-                    txt = c.text.strip()
-                    if not txt or txt == nom:
-                        continue
-                    if re.search(r"\b(Salle|Amphi)\b", txt, re.I):
-                        salle = txt
-                    elif not prof:
-                        prof = txt
-                edt.append({
-                    "jour": jour,
-                    "horaire": horaire,
-                    "cours": nom,
-                    "professeur": prof,
-                    "salle": salle,
-                })
-            except Exception as e:
-                print("Erreur bloc:", e)
-                continue
+        decodage = {}
+        edt = construire_edt(lire_blocs_driver(driver, By), lire_grille_driver(driver, By), stats=decodage)
 
         os.makedirs(os.path.dirname(output_json), exist_ok=True)
         with open(output_json, "w", encoding="utf-8") as f:
             json.dump(edt, f, ensure_ascii=False, indent=2)
 
+        if os.environ.get("HP_HISTORY_DIR"):
+            try:
+                entry, created = TimetableHistory().record(class_name, edt)
+                print(f"Historique: v{entry['version']} {'créée' if created else 'inchangée'}")
+            except Exception as e:
+                print("Erreur historique:", e)
+
         try:
             tz = ZoneInfo(os.environ.get("TZ", "Europe/Paris"))
         except Exception:
@@ -160,9 +366,10 @@ def scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_
             wk = day_map.get(jour)
             if wk is None:
                 continue
-            start_s, end_s = parse_horaire(ev.get("horaire", ""))
+            start_s, end_s = ev.get("debut"), ev.get("fin")
             if not (start_s and end_s):
-                start_s, end_s = parse_horaire(" ".join([ev.get('cours',''), ev.get('salle',''), ev.get('professeur',''), ev.get('horaire','')]))
+                # block without position (or JSON from an older run): use the tooltip
+                start_s, end_s = parse_horaire(ev.get("horaire", ""))
             is_all = not (start_s and end_s)
 
             d = today
@@ -206,7 +413,8 @@ def scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_
         with open(output_ics, "w", encoding="utf-8") as f:
             f.write("\n".join(ics))
 
-        return output_json, output_ics, {"hour_events": cnt_hour, "all_day": cnt_all}
+        return output_json, output_ics, {"hour_events": cnt_hour, "all_day": cnt_all,
+                                         "horaires_discordants": decodage.get("discordants", 0)}
     finally:
         try:
             driver.quit()
@@ -0,0 +1,278 @@
+"""Versioned, compressed history of scraped timetables.
+
+Every scrape of a class is stored as a content-addressed blob (sha256 of its
+canonical JSON), compressed with zstd when the ``zstandard`` package is
+installed, gzip otherwise:
+
+    <HP_HISTORY_DIR>/objects/ab/abcdef....json.zst|.json.gz
+    <HP_HISTORY_DIR>/index/<class>.jsonl     one line per version
+
+A scrape identical to the latest version writes nothing: versions are
+added when the event set changes. Reading a version loads the class index
+(one short line per change) and a single blob; diffing loads two blobs.
+
+    python history.py log IG1
+    python history.py show IG1 3
+    python history.py diff IG1 3 5
+    python history.py record IG1 edt_IG1.json
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads of one process only
+    fcntl = None
+
+HISTORY_DEFAULT = os.path.join(os.path.dirname(__file__), "history")
+
+JOURS_ORDRE = {"Lundi": 0, "Mardi": 1, "Mercredi": 2, "Jeudi": 3, "Vendredi": 4, "Samedi": 5, "Dimanche": 6}
+
+# Fields compared by diff() for events with the same key
+CHAMPS = ("horaire", "debut", "fin", "cours", "professeur", "salle")
+
+
+def _cle_tri(ev):
+    return (JOURS_ORDRE.get(ev.get("jour"), 99), ev.get("debut") or "", ev.get("horaire") or "",
+            ev.get("cours") or "", ev.get("salle") or "", ev.get("professeur") or "")
+
+
+# One lock per class index: concurrent record() calls (server threads) must not
+# both append the same next version
+_INDEX_LOCKS = {}
+_INDEX_LOCKS_GUARD = threading.Lock()
+
+
+def _index_lock(path):
+    with _INDEX_LOCKS_GUARD:
+        lock = _INDEX_LOCKS.get(path)
+        if lock is None:
+            lock = _INDEX_LOCKS[path] = threading.Lock()
+        return lock
+
+
+def canonical_bytes(edt):
+    """Stable serialization of an event set: same events -> same bytes, whatever the order."""
+    events = sorted(edt, key=_cle_tri)
+    return json.dumps(events, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+class TimetableHistory:
+    """Content-addressed store of timetable versions, one index per class."""
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("HP_HISTORY_DIR") or HISTORY_DEFAULT
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.index_dir = os.path.join(self.root, "index")
+
+    # -- blobs ----------------------------------------------------------------
+
+    def _blob_path(self, digest, ext):
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def _find_blob(self, digest):
+        for ext in (".json.zst", ".json.gz"):
+            path = self._blob_path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _write_blob(self, digest, data):
+        if self._find_blob(digest):
+            return  # already stored (deduplicated)
+        if zstandard is not None:
+            path, payload = self._blob_path(digest, ".json.zst"), zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            path, payload = self._blob_path(digest, ".json.gz"), gzip.compress(data, compresslevel=9, mtime=0)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # unique temporary name: two scrapes may write the same blob at once
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+    def _read_blob(self, digest):
+        path = self._find_blob(digest)
+        if path is None:
+            raise KeyError(f"blob {digest} introuvable")
+        with open(path, "rb") as f:
+            payload = f.read()
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read this blob. Install with: pip install zstandard")
+            data = zstandard.ZstdDecompressor().decompress(payload)
+        else:
+            data = gzip.decompress(payload)
+        return json.loads(data)
+
+    # -- index ----------------------------------------------------------------
+
+    def _index_path(self, class_name):
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in class_name)
+        return os.path.join(self.index_dir, safe + ".jsonl")
+
+    def versions(self, class_name):
+        """Index entries of a class, oldest first: {version, ts, hash, events}."""
+        path = self._index_path(class_name)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _entry(self, class_name, version):
+        entries = self.versions(class_name)
+        if not entries:
+            raise KeyError(f"aucun historique pour {class_name}")
+        if version is None or version == -1:
+            return entries[-1]
+        for entry in entries:
+            if entry["version"] == version:
+                return entry
+        raise KeyError(f"version {version} inconnue pour {class_name}")
+
+    @contextmanager
+    def _locked(self, class_name):
+        """Hold the index of a class: per-class thread lock, plus an exclusive file lock
+        (other processes, e.g. the CLI or a cron job) where fcntl is available."""
+        path = self._index_path(class_name)
+        with _index_lock(os.path.abspath(path)):
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # -- public API -----------------------------------------------------------
+
+    def record(self, class_name, edt, ts=None):
+        """Store a scrape; return (entry, created) where created is False for an unchanged scrape."""
+        data = canonical_bytes(edt)
+        digest = hashlib.sha256(data).hexdigest()
+        self._write_blob(digest, data)
+        # read-latest-then-append under the class lock: one new version per change
+        with self._locked(class_name):
+            entries = self.versions(class_name)
+            if entries and entries[-1]["hash"] == digest:
+                return entries[-1], False
+            entry = {
+                "version": entries[-1]["version"] + 1 if entries else 1,
+                "ts": ts or datetime.now(ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "hash": digest,
+                "events": len(edt),
+            }
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(self._index_path(class_name), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry, True
+
+    def load(self, class_name, version=None):
+        """Event set of a version (latest when None)."""
+        return self._read_blob(self._entry(class_name, version)["hash"])
+
+    def at(self, class_name, ts):
+        """Event set as it was at ISO timestamp ``ts`` (None if before the first version)."""
+        current = None
+        for entry in self.versions(class_name):
+            if entry["ts"] > ts:
+                break
+            current = entry
+        return None if current is None else self._read_blob(current["hash"])
+
+    def diff(self, class_name, old_version, new_version=None):
+        """Compare two versions: {"added": [...], "removed": [...], "changed": [{"avant", "apres", "champs"}]}."""
+        old_entry = self._entry(class_name, old_version)
+        new_entry = self._entry(class_name, new_version)
+        if old_entry["hash"] == new_entry["hash"]:
+            return {"added": [], "removed": [], "changed": []}
+        return diff_events(self._read_blob(old_entry["hash"]), self._read_blob(new_entry["hash"]))
+
+
+def _groupes(edt):
+    """Events grouped by (day, course), each group sorted by time."""
+    groupes = {}
+    for ev in sorted(edt, key=_cle_tri):
+        groupes.setdefault((ev.get("jour"), ev.get("cours")), []).append(ev)
+    return groupes
+
+
+def diff_events(old, new):
+    """Diff two event sets. Events of the same course on the same day are paired
+    in time order, so a room change or a lost time shows up as "changed"."""
+    result = {"added": [], "removed": [], "changed": []}
+    old_groups, new_groups = _groupes(old), _groupes(new)
+    for key in sorted(set(old_groups) | set(new_groups), key=lambda k: (JOURS_ORDRE.get(k[0], 99), k[1] or "")):
+        avant, apres = old_groups.get(key, []), new_groups.get(key, [])
+        for a, b in zip(avant, apres):
+            champs = [c for c in CHAMPS if a.get(c) != b.get(c)]
+            if champs:
+                result["changed"].append({"avant": a, "apres": b, "champs": champs})
+        result["removed"].extend(avant[len(apres):])
+        result["added"].extend(apres[len(avant):])
+    return result
+
+
+def _fmt(ev):
+    quand = f"{ev.get('debut')}-{ev.get('fin')}" if ev.get("debut") else (ev.get("horaire") or "(horaire inconnu)")
+    return f"{ev.get('jour')} {quand} {ev.get('cours')} [{ev.get('salle')}] {ev.get('professeur')}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timetable snapshot history")
+    parser.add_argument("--root", help=f"history directory (default HP_HISTORY_DIR or {HISTORY_DEFAULT})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("log", help="list the versions of a class")
+    p.add_argument("class_name")
+    p = sub.add_parser("show", help="print a version (latest by default)")
+    p.add_argument("class_name")
+    p.add_argument("version", type=int, nargs="?")
+    p = sub.add_parser("diff", help="compare two versions (second defaults to latest)")
+    p.add_argument("class_name")
+    p.add_argument("old", type=int)
+    p.add_argument("new", type=int, nargs="?")
+    p = sub.add_parser("record", help="record an edt JSON file")
+    p.add_argument("class_name")
+    p.add_argument("json_file")
+    args = parser.parse_args(argv)
+
+    history = TimetableHistory(args.root)
+    if args.cmd == "log":
+        for e in history.versions(args.class_name):
+            print(f"v{e['version']:<5d} {e['ts']}  {e['events']:4d} cours  {e['hash'][:12]}")
+    elif args.cmd == "show":
+        json.dump(history.load(args.class_name, args.version), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.cmd == "diff":
+        d = history.diff(args.class_name, args.old, args.new)
+        for ev in d["removed"]:
+            print("- " + _fmt(ev))
+        for ev in d["added"]:
+            print("+ " + _fmt(ev))
+        for c in d["changed"]:
+            print(f"~ {_fmt(c['avant'])}\n    -> {_fmt(c['apres'])}  ({', '.join(c['champs'])})")
+    elif args.cmd == "record":
+        with open(args.json_file, "r", encoding="utf-8") as f:
+            entry, created = history.record(args.class_name, json.load(f))
+        print(f"v{entry['version']} {'créée' if created else 'inchangée'} ({entry['hash'][:12]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
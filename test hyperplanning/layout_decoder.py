@@ -0,0 +1,205 @@
+"""Decode timetable blocks from their position in the grid.
+
+Hyperplanning places every course as an absolutely positioned block: its
+``left`` gives the day column and its ``top``/``height`` give the start and
+end times. ``LayoutDecoder`` computes both once per block from the inline
+styles, against the grid itself:
+  - the day columns: from the day headers (so a day without courses,
+    Saturday columns and blocks split into parallel groups are all handled),
+  - the time axis: one linear fit (pixels per minute) over the hour labels.
+
+The grid labels are found by their class (HP_GRID_DAY_CLASS /
+HP_GRID_HOUR_CLASS) or, by default, by their text (see ``classer_libelles``).
+Without day headers the decoder does not guess: days are "Inconnu". The
+tooltip text (``title``) is only used as a cross-check.
+"""
+import re
+import statistics
+from bisect import bisect_right
+
+JOURS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+# Pixels of tolerance when comparing positions
+TOLERANCE_PX = 3
+# Decoded times are rounded to this grid step (minutes)
+PAS_MINUTES = 5
+# Difference (minutes) above which a decoded time disagrees with the tooltip
+ECART_MAX_MINUTES = 10
+
+_GEOMETRIE_RE = re.compile(r"(?<![\w-])(left|top|width|height)\s*:\s*(-?\d+(?:\.\d+)?)px")
+_HEURE_RE = re.compile(r"(\d{1,2})\s*[:h]\s*(\d{2})?")
+# Grid labels: an hour alone ("8h00", "08:30", "14h"), a day name or its abbreviation ("Lundi 12", "lun.")
+_LIBELLE_HEURE_RE = re.compile(r"^\s*\d{1,2}\s*[:h]\s*(?:\d{2})?\s*$")
+_JOUR_RE = re.compile(
+    r"^\s*(?:" + "|".join(f"{jour[:3]}(?:{jour[3:]})?" for jour in JOURS) + r")\b", re.IGNORECASE
+)
+# Longest text of a day header (day name and date)
+LIBELLE_JOUR_MAX = 30
+
+
+def lire_geometrie(style):
+    """Return {"left", "top", "width", "height"} (floats, missing keys absent) from an inline style."""
+    return {k: float(v) for k, v in _GEOMETRIE_RE.findall(style or "")}
+
+
+def minutes_vers_texte(minutes):
+    return f"{int(minutes) // 60:02d}:{int(minutes) % 60:02d}"
+
+
+def texte_vers_minutes(texte):
+    """"08h00" / "8:30" / "14h" -> minutes since midnight, or None."""
+    m = _HEURE_RE.search(texte or "")
+    if not m:
+        return None
+    return int(m.group(1)) * 60 + int(m.group(2) or 0)
+
+
+def _jour_depuis_libelle(libelle):
+    m = _JOUR_RE.match(libelle or "")
+    if not m:
+        return None
+    debut = m.group(0).strip()[:3].lower()
+    return next(jour for jour in JOURS if jour[:3].lower() == debut)
+
+
+def classer_libelles(elements):
+    """Sort positioned grid elements [(style, text)] into day headers and hour labels.
+
+    Used when the grid classes are not configured: any element outside the
+    course blocks whose inline style places it (left/top) and whose text is a
+    day name or an hour alone is a grid label.
+
+    Returns {"jours": [(style, text)], "heures": [(style, text)]}.
+    """
+    grille = {"jours": [], "heures": []}
+    for style, texte in elements:
+        texte = (texte or "").strip()
+        if not texte:
+            continue
+        g = lire_geometrie(style)
+        if "left" in g and len(texte) <= LIBELLE_JOUR_MAX and _jour_depuis_libelle(texte):
+            grille["jours"].append((style, texte))
+        elif "top" in g and _LIBELLE_HEURE_RE.match(texte):
+            grille["heures"].append((style, texte))
+    return grille
+
+
+class AxeTemps:
+    """Linear mapping top (px) <-> minutes since midnight."""
+
+    def __init__(self, origine_px, origine_minutes, px_par_minute):
+        self.origine_px = origine_px
+        self.origine_minutes = origine_minutes
+        self.px_par_minute = px_par_minute
+
+    def minutes(self, y):
+        brut = self.origine_minutes + (y - self.origine_px) / self.px_par_minute
+        return int(round(brut / PAS_MINUTES) * PAS_MINUTES)
+
+    @classmethod
+    def ajuster(cls, points):
+        """Least-squares fit over (y_px, minutes) points; None if not enough spread."""
+        if len(points) < 2:
+            return None
+        my = statistics.fmean(y for y, _ in points)
+        mm = statistics.fmean(m for _, m in points)
+        var = sum((m - mm) ** 2 for _, m in points)
+        if var == 0:
+            return None
+        pente = sum((y - my) * (m - mm) for y, m in points) / var
+        if pente <= 0:
+            return None
+        return cls(my, mm, pente)
+
+
+class LayoutDecoder:
+    """Map block geometry to (day, start, end)."""
+
+    def __init__(self, colonnes, pas, axe=None):
+        # colonnes: sorted [(left_px, jour)], pas: column width in px
+        self.debuts = [left for left, _ in colonnes]
+        self.jours = [jour for _, jour in colonnes]
+        self.pas = pas
+        self.axe = axe
+        self.stats = {"verifies": 0, "discordants": 0, "sans_position": 0}
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def depuis_grille(cls, entetes=None, heures=None):
+        """Build the decoder for one page.
+
+        entetes: [(style, text)] of the day header cells
+        heures: [(style, text)] of the hour labels
+
+        Without usable headers there are no columns (every day is "Inconnu");
+        without hour labels there is no time axis (``horaire`` gives None).
+        """
+        colonnes, pas = cls._colonnes_depuis_entetes(entetes or [])
+        return cls(colonnes, pas, cls._axe_depuis_heures(heures or []))
+
+    @staticmethod
+    def _colonnes_depuis_entetes(entetes):
+        cellules = []
+        for style, texte in entetes:
+            g = lire_geometrie(style)
+            jour = _jour_depuis_libelle(texte)
+            if "left" in g and jour:
+                cellules.append((g["left"], g.get("width"), jour))
+        if not cellules:
+            return [], 0
+        cellules.sort()
+        largeurs = [w for _, w, _ in cellules if w]
+        if largeurs:
+            pas = max(largeurs)
+        elif len(cellules) > 1:
+            pas = min(b[0] - a[0] for a, b in zip(cellules, cellules[1:]))
+        else:
+            pas = float("inf")
+        return [(left, jour) for left, _, jour in cellules], pas
+
+    @staticmethod
+    def _axe_depuis_heures(heures):
+        points = []
+        for style, texte in heures:
+            g = lire_geometrie(style)
+            m = texte_vers_minutes(texte)
+            if "top" in g and m is not None:
+                points.append((g["top"], m))
+        return AxeTemps.ajuster(points)
+
+    # -- decoding -----------------------------------------------------------
+
+    def jour(self, geometrie):
+        """Day of the column containing the block's left edge, or "Inconnu"."""
+        left = geometrie.get("left")
+        if left is None or not self.debuts:
+            return "Inconnu"
+        i = bisect_right(self.debuts, left + TOLERANCE_PX) - 1
+        if i < 0 or left >= self.debuts[i] + self.pas - TOLERANCE_PX:
+            return "Inconnu"
+        return self.jours[i]
+
+    def horaire(self, geometrie):
+        """(start, end) as "HH:MM" from top/height, or (None, None)."""
+        if self.axe is None or "top" not in geometrie or "height" not in geometrie:
+            return None, None
+        debut = self.axe.minutes(geometrie["top"])
+        fin = self.axe.minutes(geometrie["top"] + geometrie["height"])
+        if not 0 <= debut < fin <= 24 * 60:
+            return None, None
+        return minutes_vers_texte(debut), minutes_vers_texte(fin)
+
+    def verifier(self, debut, fin, attendu):
+        """Cross-check decoded times against the tooltip ones (minutes); True if they agree."""
+        if attendu is None:
+            return True
+        if debut is None:
+            self.stats["sans_position"] += 1
+            return False
+        self.stats["verifies"] += 1
+        ok = (abs(texte_vers_minutes(debut) - attendu[0]) <= ECART_MAX_MINUTES
+              and abs(texte_vers_minutes(fin) - attendu[1]) <= ECART_MAX_MINUTES)
+        if not ok:
+            self.stats["discordants"] += 1
+        return ok
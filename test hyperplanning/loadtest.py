@@ -0,0 +1,317 @@
+"""Load-test harness for server_ics.py.
+
+Starts the calendar server in a child process, with scrape_and_generate
+replaced by a stand-in of configurable latency, failure rate and output
+size, then runs concurrent subscriber traffic against /calendar.ics, /ical
+(fresh, stale and forced paths) and /status. Reports throughput, latency
+percentiles per endpoint, server memory and the number of scrape invocations.
+
+Usage:
+    python loadtest.py --clients 50 --duration 30 --scrape-latency 20 --failure-rate 0.1
+
+Admission control and retry settings are read from the usual ADMISSION_* /
+SCRAPE_RETRY_* / CIRCUIT_* environment variables, which the child inherits.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Traffic mix: endpoint name -> weight
+DEFAULT_MIX = "calendar=50,ical=30,ical_stale=10,ical_force=5,status=5"
+
+# /ical considers an ICS older than this as stale (server_ics.ical max_age)
+STALE_AGE = 50 * 60 + 60
+
+
+# -- child process: server with a stand-in scraper ----------------------------
+
+def _fake_ics(events):
+    lines = ["BEGIN:VCALENDAR", "PRODID:-//edt_IG1//EN", "VERSION:2.0", "CALSCALE:GREGORIAN"]
+    for i in range(events):
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:loadtest-{i}",
+            "DTSTAMP:20250101T000000Z",
+            "DTSTART:20250106T070000Z",
+            "DTEND:20250106T090000Z",
+            f"SUMMARY:Cours {i}",
+            "LOCATION:Salle C02",
+            "DESCRIPTION:Professeur: LOADTEST\\nSource: hpesgt.cnam.fr",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\n".join(lines)
+
+
+def serve(args):
+    """Run server_ics with the stand-in scraper (child process entry point)."""
+    import server_ics
+    from flask import jsonify
+    from werkzeug.serving import make_server
+
+    workdir = args.workdir
+    server_ics.ICS_DEFAULT = os.path.join(workdir, "edt.ics")
+    server_ics.JSON_DEFAULT = os.path.join(workdir, "edt.json")
+
+    invocations = Counter()
+    lock = threading.Lock()
+    payload = _fake_ics(args.events)
+
+    def fake_scrape(output_json, output_ics, class_name="IG1", **kwargs):
+        with lock:
+            invocations["calls"] += 1
+        time.sleep(max(0.0, random.gauss(args.scrape_latency, args.scrape_latency * 0.1)))
+        if random.random() < args.failure_rate:
+            with lock:
+                invocations["failures"] += 1
+            raise RuntimeError("simulated upstream failure")
+        tmp = output_ics + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, output_ics)
+        with open(output_json, "w", encoding="utf-8") as f:
+            f.write("[]")
+        return output_json, output_ics, {"hour_events": args.events, "all_day": 0}
+
+    server_ics.scrape_and_generate = fake_scrape
+
+    @server_ics.app.route("/_loadtest")
+    def loadtest_stats():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        with lock:
+            counts = dict(invocations)
+        return jsonify({
+            "scrape_calls": counts.get("calls", 0),
+            "scrape_failures": counts.get("failures", 0),
+            "peak_rss_mb": usage.ru_maxrss / 1024,
+            "cpu_s": usage.ru_utime + usage.ru_stime,
+        })
+
+    # seed a fresh ICS, like the initial scrape of run_server()
+    if not args.no_seed:
+        fake_scrape(server_ics.JSON_DEFAULT, server_ics.ICS_DEFAULT)
+        invocations.clear()
+
+    httpd = make_server("127.0.0.1", args.port, server_ics.app, threaded=True)
+    print(f"READY {args.port}", flush=True)
+    httpd.serve_forever()
+
+
+# -- parent process: traffic ---------------------------------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Traffic:
+    """Concurrent subscribers hitting the server for a fixed duration."""
+
+    def __init__(self, base_url, ics_path, mix, token=None, classes=("IG1",), timeout=120):
+        self.base_url = base_url
+        self.ics_path = ics_path
+        self.names = list(mix)
+        self.weights = [mix[n] for n in self.names]
+        self.token = token
+        self.classes = classes
+        self.timeout = timeout
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def _url(self, name):
+        qs = []
+        if name.startswith("ical"):
+            qs.append(f"class={random.choice(self.classes)}")
+            if name == "ical_force":
+                qs.append("force=1")
+            if self.token:
+                qs.append(f"token={self.token}")
+            return f"{self.base_url}/ical?{'&'.join(qs)}"
+        if name == "calendar":
+            return f"{self.base_url}/calendar.ics"
+        return f"{self.base_url}/status"
+
+    def _request(self, name):
+        if name == "ical_stale":
+            # age the cached ICS so that /ical takes the regeneration path
+            try:
+                old = time.time() - STALE_AGE
+                os.utime(self.ics_path, (old, old))
+            except OSError:
+                pass
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(self._url(name), timeout=self.timeout) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            self.statuses[name][status] += 1
+
+    def _client(self, deadline):
+        while time.monotonic() < deadline:
+            self._request(random.choices(self.names, self.weights)[0])
+
+    def run(self, clients, duration):
+        deadline = time.monotonic() + duration
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            for _ in range(clients):
+                pool.submit(self._client, deadline)
+        return time.perf_counter() - start
+
+
+def _get_json(url):
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def report(traffic, elapsed, server_stats, status):
+    rows = []
+    all_latencies = []
+    for name in traffic.names:
+        values = sorted(traffic.latencies.get(name, []))
+        all_latencies.extend(values)
+        rows.append((name, values))
+    rows.append(("TOTAL", sorted(all_latencies)))
+
+    total = len(all_latencies)
+    print()
+    print(f"Durée: {elapsed:.1f}s  requêtes: {total}  débit: {total / elapsed:.1f} req/s")
+    print(f"{'endpoint':12s}{'n':>8s}{'req/s':>9s}{'p50 ms':>10s}{'p90 ms':>10s}{'p99 ms':>10s}{'max ms':>10s}  statuts")
+    for name, values in rows:
+        if not values:
+            continue
+        statuses = dict(traffic.statuses[name]) if name != "TOTAL" else {}
+        print(f"{name:12s}{len(values):8d}{len(values) / elapsed:9.1f}"
+              f"{_percentile(values, 50) * 1000:10.1f}{_percentile(values, 90) * 1000:10.1f}"
+              f"{_percentile(values, 99) * 1000:10.1f}{values[-1] * 1000:10.1f}  {statuses or ''}")
+    print()
+    print(f"Scrapes: {server_stats['scrape_calls']} appel(s), {server_stats['scrape_failures']} échec(s)")
+    print(f"Serveur: pic RSS {server_stats['peak_rss_mb']:.0f} MB, CPU {server_stats['cpu_s']:.1f}s")
+    if status:
+        print(f"Admission: {status.get('admission')}")
+        print(f"Circuits: {status.get('circuits')}")
+
+    return {
+        "elapsed_s": elapsed,
+        "requests": total,
+        "throughput_rps": total / elapsed,
+        "endpoints": {
+            name: {
+                "n": len(values),
+                "p50_ms": _percentile(values, 50) * 1000,
+                "p90_ms": _percentile(values, 90) * 1000,
+                "p99_ms": _percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+                "mean_ms": statistics.fmean(values) * 1000,
+                "statuses": {str(k): v for k, v in traffic.statuses[name].items()},
+            }
+            for name, values in rows if values
+        },
+        "server": server_stats,
+        "status": status,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test server_ics.py with a stand-in scraper")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent subscribers")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of traffic")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--classes", default="IG1", help="comma-separated classes requested on /ical")
+    parser.add_argument("--scrape-latency", type=float, default=2.0, help="mean stand-in scrape time (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability a scrape fails")
+    parser.add_argument("--events", type=int, default=200, help="VEVENTs in the generated ICS")
+    parser.add_argument("--no-seed", action="store_true", help="start without an ICS (cold cache)")
+    parser.add_argument("--json", help="write the report to this file")
+    # child mode
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return 0
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port), "--workdir", workdir,
+               "--scrape-latency", str(args.scrape_latency), "--failure-rate", str(args.failure_rate),
+               "--events", str(args.events)]
+        if args.no_seed:
+            cmd.append("--no-seed")
+        child = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            line = child.stdout.readline()
+            if not line.startswith("READY"):
+                print("Le serveur n'a pas démarré", file=sys.stderr)
+                return 1
+            # drain the server's log so it never blocks on a full pipe
+            threading.Thread(target=child.stdout.read, daemon=True).start()
+
+            base_url = f"http://127.0.0.1:{port}"
+            traffic = Traffic(base_url, os.path.join(workdir, "edt.ics"), _parse_mix(args.mix),
+                              token=os.environ.get("ICAL_TOKEN"),
+                              classes=[c.strip() for c in args.classes.split(",") if c.strip()])
+            print(f"{args.clients} client(s) pendant {args.duration:.0f}s sur {base_url} ...")
+            elapsed = traffic.run(args.clients, args.duration)
+
+            server_stats = _get_json(f"{base_url}/_loadtest")
+            try:
+                status = _get_json(f"{base_url}/status")
+            except Exception:
+                status = None
+            result = report(traffic, elapsed, server_stats, status)
+        finally:
+            child.terminate()
+            child.wait(timeout=10)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
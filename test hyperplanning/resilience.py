@@ -0,0 +1,195 @@
+"""Retry with backoff and circuit breaking around the scraper.
+
+``call_with_resilience`` retries a failing call a bounded number of times
+with exponential backoff and full jitter. Each upstream host has its own
+``CircuitBreaker``: after repeated failed calls (a call fails once all of its
+retries are exhausted) the circuit opens and calls fail
+immediately with ``CircuitOpenError`` until a cool-down has elapsed, then a
+single trial call decides whether it closes again.
+
+Settings are read from environment variables (see ``RetryPolicy.from_env``
+and ``CircuitBreaker.from_env``).
+"""
+import os
+import random
+import threading
+import time
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the upstream while its circuit is open."""
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"circuit open for {upstream}, retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter."""
+
+    def __init__(self, attempts=3, base_delay=2.0, max_delay=30.0, rng=random.random):
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            attempts=_env_float("SCRAPE_RETRY_ATTEMPTS", 3),
+            base_delay=_env_float("SCRAPE_RETRY_BASE_DELAY", 2),
+            max_delay=_env_float("SCRAPE_RETRY_MAX_DELAY", 30),
+        )
+
+    def delay(self, attempt):
+        """Sleep before retry number ``attempt`` (1 = first retry)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return ceiling * self.rng()
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker for one upstream."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, upstream, failure_threshold=3, reset_timeout=600, clock=time.monotonic):
+        self.upstream = upstream
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.last_error = None
+        self.counters = {"calls": 0, "failures": 0, "short_circuited": 0, "opened": 0}
+
+    @classmethod
+    def from_env(cls, upstream):
+        return cls(
+            upstream,
+            failure_threshold=_env_float("CIRCUIT_FAILURE_THRESHOLD", 3),
+            reset_timeout=_env_float("CIRCUIT_RESET_TIMEOUT", 600),
+        )
+
+    def before_call(self):
+        """Raise ``CircuitOpenError`` if the upstream must not be called now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (self.clock() - self.opened_at)
+                if remaining > 0:
+                    self.counters["short_circuited"] += 1
+                    raise CircuitOpenError(self.upstream, remaining)
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                # only one trial call at a time while half-open
+                if self.trial_running:
+                    self.counters["short_circuited"] += 1
+                    raise CircuitOpenError(self.upstream, self.reset_timeout)
+                self.trial_running = True
+            self.counters["calls"] += 1
+
+    def check_open(self):
+        """Raise ``CircuitOpenError`` if another caller opened the circuit (between two retries)."""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (self.clock() - self.opened_at)
+                if remaining > 0:
+                    self.counters["short_circuited"] += 1
+                    raise CircuitOpenError(self.upstream, remaining)
+
+    def on_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def on_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.counters["failures"] += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.counters["opened"] += 1
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+    def end_call(self):
+        """Release the half-open trial slot, however the call ended (even ``KeyboardInterrupt``)."""
+        with self._lock:
+            self.trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "last_error": self.last_error,
+                **self.counters,
+            }
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(upstream):
+    """Circuit breaker shared by every caller of ``upstream``."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(upstream)
+        if breaker is None:
+            breaker = _BREAKERS[upstream] = CircuitBreaker.from_env(upstream)
+        return breaker
+
+
+def breakers_stats():
+    """State of every known circuit, for ``/status``."""
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {b.upstream: b.stats() for b in breakers}
+
+
+def call_with_resilience(func, upstream, *args, policy=None, sleep=time.sleep, **kwargs):
+    """Call ``func(*args, **kwargs)`` with retries, through the breaker of ``upstream``.
+
+    Raises ``CircuitOpenError`` as soon as the circuit is (or becomes) open,
+    otherwise the last error once every attempt has failed. The breaker counts
+    one failure per call, not per attempt: a single failing request cannot open
+    the circuit for everyone on its own.
+    """
+    policy = policy or RetryPolicy.from_env()
+    breaker = get_breaker(upstream)
+    breaker.before_call()
+    try:
+        for attempt in range(1, policy.attempts + 1):
+            if attempt > 1:
+                breaker.check_open()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if attempt == policy.attempts:
+                    breaker.on_failure(e)
+                    raise
+                delay = policy.delay(attempt)
+                print(f"[resilience] {upstream}: tentative {attempt} échouée ({e}), nouvel essai dans {delay:.1f}s")
+                sleep(delay)
+            else:
+                breaker.on_success()
+                return result
+    finally:
+        breaker.end_call()
@@ -5,22 +5,35 @@ import os
 import time
 import traceback
 
-from edt_IG1 import scrape_and_generate, ICS_DEFAULT, JSON_DEFAULT
+from edt_IG1 import scrape_and_generate, ICS_DEFAULT, JSON_DEFAULT, UPSTREAM
+from admission import AdmissionController
+from resilience import CircuitOpenError, breakers_stats, call_with_resilience
 
 app = Flask(__name__)
 
 LAST_STATS = None
 LAST_RUN = None
 
+# Admission control for regenerations (limits configurable via ADMISSION_* env vars)
+ADMISSION = AdmissionController.from_env()
+
+
+def resilient_scrape(**kwargs):
+    """scrape_and_generate with retries/backoff, behind the circuit breaker of UPSTREAM."""
+    return call_with_resilience(scrape_and_generate, UPSTREAM, **kwargs)
+
 
 def job_scrape():
     global LAST_STATS, LAST_RUN
     try:
         print("[job] Lancement du scraping...")
-        json_path, ics_path, stats = scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT)
+        with ADMISSION.scrape_slot():
+            json_path, ics_path, stats = resilient_scrape(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT)
         LAST_STATS = stats
         LAST_RUN = time.time()
         print(f"[job] Terminé: {stats}")
+    except CircuitOpenError as e:
+        print(f"[job] Scraping ignoré: {e}")
     except Exception:
         print("[job] Erreur lors du scraping:")
         traceback.print_exc()
@@ -47,6 +60,9 @@ def ical():
 
     Behavior: if an existing ICS file is present and younger than 50 minutes and force is not set,
     it is returned directly. Otherwise the scraper is invoked to regenerate the ICS, then returned.
+    Regenerations go through admission control: a rejected request gets the cached ICS if
+    there is one, or 429 with a Retry-After header. When the upstream is failing (retries
+    exhausted or circuit open) the last good ICS is returned instead of an error.
     """
     class_name = request.args.get('class', 'IG1')
     nb_weeks = request.args.get('nbWeeks')
@@ -67,14 +83,32 @@ def ical():
     except Exception:
         pass
 
+    # Admission control: one client must not be able to start scrapes in a loop
+    decision = ADMISSION.admit(token or request.remote_addr, class_name, force=force)
+    if not decision.admitted:
+        print(f"[ical] Regeneration refused for class={class_name} ({decision.reason})")
+        if os.path.exists(ICS_DEFAULT):
+            ADMISSION.record("served_cached")
+            return send_file(ICS_DEFAULT, mimetype='text/calendar', as_attachment=False)
+        ADMISSION.record("rejected_429")
+        return ("Too many regenerations, retry later", 429, {"Retry-After": decision.retry_after_header()})
+
     # Otherwise regenerate (synchronous). This may be slow; subscription clients usually poll infrequently.
     try:
         print(f"[ical] Regenerating ICS for class={class_name} (nbWeeks={nb_weeks})")
-        scrape_and_generate(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_name=class_name)
+        resilient_scrape(output_json=JSON_DEFAULT, output_ics=ICS_DEFAULT, class_name=class_name)
+    except CircuitOpenError as e:
+        print(f"[ical] {e}, serving last good ICS")
+        if os.path.exists(ICS_DEFAULT):
+            return send_file(ICS_DEFAULT, mimetype='text/calendar', as_attachment=False)
+        return ("Upstream unavailable", 503, {"Retry-After": str(max(1, int(e.retry_after)))})
     except Exception:
-        import traceback
         traceback.print_exc()
+        if os.path.exists(ICS_DEFAULT):
+            return send_file(ICS_DEFAULT, mimetype='text/calendar', as_attachment=False)
         return ("Error generating ICS", 500)
+    finally:
+        ADMISSION.release()
 
     if os.path.exists(ICS_DEFAULT):
         return send_file(ICS_DEFAULT, mimetype='text/calendar', as_attachment=False)
@@ -87,6 +121,8 @@ def status():
         "last_run": LAST_RUN,
         "last_stats": LAST_STATS,
         "ics_path": ICS_DEFAULT,
+        "admission": ADMISSION.stats(),
+        "circuits": breakers_stats(),
     })
 
 
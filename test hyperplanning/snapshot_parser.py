@@ -0,0 +1,255 @@
+"""Offline parsing of saved timetable snapshots.
+
+The scraper can save the rendered page as ``<class>_<timestamp>.html.gz``
+(HP_SNAPSHOT_DIR, see edt_IG1.scrape_and_generate). This module extracts the
+same ``edt`` from such a snapshot without a browser: a single-pass streaming
+parser (html.parser) collects the raw blocks, then edt_IG1.construire_edt
+builds the events exactly like the live scraper does.
+
+A whole directory of historic snapshots can be reprocessed in parallel,
+one process per core by default:
+
+    python snapshot_parser.py snapshots/ --out reprocessed/ --jobs 8
+    python snapshot_parser.py snapshots/IG1_20251018T092535Z.html.gz
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from itertools import repeat
+
+from edt_IG1 import GRID_DAY_CLASS, GRID_HOUR_CLASS, construire_edt
+from layout_decoder import classer_libelles, lire_geometrie
+
+# Elements without an end tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+             "source", "track", "wbr"}
+# Elements that start a new line in rendered text (WebElement.text)
+BLOCK_TAGS = {"div", "p", "li", "tr", "table", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+SNAPSHOT_SUFFIXES = (".html.gz", ".html")
+
+
+def _texte(chunks):
+    """Approximate WebElement.text: collapse spaces, keep line breaks, drop empty lines."""
+    lines = ("".join(chunks)).splitlines()
+    return "\n".join(" ".join(line.split()) for line in lines if line.strip())
+
+
+class TimetableHTMLParser(HTMLParser):
+    """Collect the raw blocks of div.EmploiDuTemps_Element (see edt_IG1.construire_edt),
+    plus the grid's day headers and hour labels: by class when configured, otherwise
+    the positioned elements outside the blocks whose text is a day or an hour."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocs = []
+        self.grille = {"jours": [], "heures": []}
+        self._classes_grille = {c: k for k, c in (("jours", GRID_DAY_CLASS), ("heures", GRID_HOUR_CLASS)) if c}
+        self.positionnes = []   # (style, text) of the positioned elements outside the blocks
+        self._stack = []      # (tag, actions to run when the element closes)
+        self._bloc = None     # raw dict of the block being read
+        self._in_cours = False
+        self._captures = []   # open text captures (label / div.contenu)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        actions = []
+
+        for classe in classes:
+            if classe in self._classes_grille:
+                chunks = []
+                self._captures.append(chunks)
+                actions.append(("grille", self._classes_grille[classe], attrs.get("style") or "", chunks))
+                break
+        else:
+            style = attrs.get("style") or ""
+            if self._bloc is None and len(self._classes_grille) < 2 and lire_geometrie(style) \
+                    and not (tag == "div" and "EmploiDuTemps_Element" in classes):
+                chunks = []
+                self._captures.append(chunks)
+                actions.append(("position", style, chunks))
+
+        if self._bloc is None:
+            if tag == "div" and "EmploiDuTemps_Element" in classes:
+                self._bloc = {"style": attrs.get("style") or "", "cours_simple": False,
+                              "labels": [], "contenus": []}
+                actions.append("bloc")
+        elif tag == "div" and "cours-simple" in classes and not self._bloc["cours_simple"]:
+            self._bloc.update({
+                "cours_simple": True,
+                "title": attrs.get("title") or "",
+                "style_cours": attrs.get("style") or "",
+            })
+            self._in_cours = True
+            actions.append("cours")
+        elif self._in_cours:
+            if tag == "br" or tag in BLOCK_TAGS:
+                for chunks in self._captures:
+                    chunks.append("\n")
+            if tag == "label" or (tag == "div" and "contenu" in classes):
+                chunks = []
+                self._bloc["labels" if tag == "label" else "contenus"].append(chunks)
+                self._captures.append(chunks)
+                actions.append(chunks)
+
+        if tag not in VOID_TAGS:
+            self._stack.append((tag, actions))
+
+    def handle_endtag(self, tag):
+        if not any(t == tag for t, _ in self._stack):
+            return  # stray end tag
+        # also closes elements left open inside this one (<p>, <li>...)
+        while self._stack:
+            t, actions = self._stack.pop()
+            for action in actions:
+                self._close(action)
+            if t == tag:
+                break
+
+    def _close(self, action):
+        if action == "bloc":
+            bloc = self._bloc
+            bloc["labels"] = [_texte(c) for c in bloc["labels"]]
+            bloc["contenus"] = [_texte(c) for c in bloc["contenus"]]
+            self.blocs.append(bloc)
+            self._bloc = None
+            self._in_cours = False
+        elif action == "cours":
+            self._in_cours = False
+        elif isinstance(action, tuple) and action[0] == "position":
+            _, style, chunks = action
+            self.positionnes.append((style, _texte(chunks)))
+            self._fin_capture(chunks)
+        elif isinstance(action, tuple):
+            _, key, style, chunks = action
+            self.grille[key].append((style, _texte(chunks)))
+            self._fin_capture(chunks)
+        else:
+            self._fin_capture(action)
+
+    def _fin_capture(self, chunks):
+        # by identity: two captures may hold equal (e.g. empty) lists
+        self._captures = [c for c in self._captures if c is not chunks]
+
+    def handle_data(self, data):
+        for chunks in self._captures:
+            chunks.append(data)
+
+
+def lire_snapshot(path):
+    """Return the HTML text of a snapshot (.html.gz or plain .html)."""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def blocs_depuis_html(html):
+    """Raw timetable blocks and grid labels found in an HTML document."""
+    parser = TimetableHTMLParser()
+    parser.feed(html)
+    parser.close()
+    grille = parser.grille
+    trouves = classer_libelles(parser.positionnes)
+    for key, classe in (("jours", GRID_DAY_CLASS), ("heures", GRID_HOUR_CLASS)):
+        if not classe:
+            grille[key] = trouves[key]
+    return parser.blocs, grille
+
+
+def parse_snapshot(path):
+    """Extract the ``edt`` list from a saved snapshot, without a browser."""
+    blocs, grille = blocs_depuis_html(lire_snapshot(path))
+    return construire_edt(blocs, grille)
+
+
+def _snapshot_name(path):
+    name = os.path.basename(path)
+    for suffix in SNAPSHOT_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _traiter_snapshot(path, output_dir):
+    """Worker: parse one snapshot, optionally write <name>.json, return a summary."""
+    try:
+        edt = parse_snapshot(path)
+    except Exception as e:
+        return {"snapshot": path, "error": f"{type(e).__name__}: {e}"}
+    out = None
+    if output_dir:
+        out = os.path.join(output_dir, _snapshot_name(path) + ".json")
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(edt, f, ensure_ascii=False, indent=2)
+    return {
+        "snapshot": path,
+        "events": len(edt),
+        "inconnus": sum(1 for ev in edt if ev["jour"] == "Inconnu"),
+        "json": out,
+    }
+
+
+def lister_snapshots(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith(SNAPSHOT_SUFFIXES)
+    )
+
+
+def reprocess_directory(directory, output_dir=None, jobs=None):
+    """Reparse every snapshot of ``directory`` across ``jobs`` processes (default: all cores).
+
+    Returns one summary per snapshot, in file name (i.e. chronological) order.
+    """
+    paths = lister_snapshots(directory)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) <= 1:
+        return [_traiter_snapshot(p, output_dir) for p in paths]
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_traiter_snapshot, paths, repeat(output_dir), chunksize=chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reparse saved hyperplanning snapshots without a browser")
+    parser.add_argument("path", help="snapshot file (.html.gz/.html) or directory of snapshots")
+    parser.add_argument("--out", help="directory where <snapshot>.json files are written")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.path):
+        summaries = reprocess_directory(args.path, args.out, args.jobs)
+        errors = 0
+        for s in summaries:
+            if "error" in s:
+                errors += 1
+                print(f"{s['snapshot']}: ERREUR {s['error']}")
+            else:
+                print(f"{s['snapshot']}: {s['events']} cours ({s['inconnus']} jour inconnu)")
+        print(f"{len(summaries)} snapshot(s), {errors} erreur(s)")
+        return 1 if errors else 0
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        summary = _traiter_snapshot(args.path, args.out)
+        if "error" in summary:
+            print(f"{summary['snapshot']}: ERREUR {summary['error']}")
+            return 1
+        print(f"{summary['json']}: {summary['events']} cours")
+    else:
+        json.dump(parse_snapshot(args.path), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
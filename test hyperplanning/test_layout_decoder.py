@@ -0,0 +1,64 @@
+"""Tests for layout_decoder (run with: python -m unittest test_layout_decoder)."""
+import unittest
+
+from layout_decoder import LayoutDecoder, classer_libelles, lire_geometrie
+
+# Week grid: 5 day columns of 200px from left 60px, 1px per minute from 08:00 at top 40px
+ENTETES = [(f"left: {60 + 200 * i}px; width: 200px;", f"{jour} {12 + i}")
+           for i, jour in enumerate(["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi"])]
+HEURES = [(f"top: {40 + 60 * i}px;", f"{8 + i}h00") for i in range(11)]
+
+
+def bloc(left, top, height, width=200):
+    return lire_geometrie(f"left: {left}px; top: {top}px; width: {width}px; height: {height}px;")
+
+
+class TestLayoutDecoder(unittest.TestCase):
+
+    def test_empty_monday_keeps_columns_anchored_to_headers(self):
+        decoder = LayoutDecoder.depuis_grille(ENTETES, HEURES)
+        # no Monday course: the leftmost block is Tuesday's and must stay Tuesday
+        self.assertEqual(decoder.jour(bloc(260, 100, 90)), "Mardi")
+        self.assertEqual(decoder.jour(bloc(660, 100, 90)), "Jeudi")
+
+    def test_parallel_groups_share_their_column(self):
+        decoder = LayoutDecoder.depuis_grille(ENTETES, HEURES)
+        self.assertEqual(decoder.jour(bloc(460, 100, 90, width=100)), "Mercredi")
+        self.assertEqual(decoder.jour(bloc(560, 100, 90, width=100)), "Mercredi")
+
+    def test_no_headers_does_not_guess_days(self):
+        decoder = LayoutDecoder.depuis_grille([], HEURES)
+        self.assertEqual(decoder.jour(bloc(260, 100, 90)), "Inconnu")
+
+    def test_times_come_from_hour_labels(self):
+        decoder = LayoutDecoder.depuis_grille(ENTETES, HEURES)
+        self.assertEqual(decoder.horaire(bloc(260, 130, 90)), ("09:30", "11:00"))
+
+    def test_no_hour_labels_gives_no_axis(self):
+        decoder = LayoutDecoder.depuis_grille(ENTETES, [])
+        self.assertIsNone(decoder.axe)
+        self.assertEqual(decoder.horaire(bloc(260, 130, 90)), (None, None))
+
+    def test_tooltip_is_only_a_cross_check(self):
+        decoder = LayoutDecoder.depuis_grille(ENTETES, HEURES)
+        debut, fin = decoder.horaire(bloc(260, 130, 90))
+        self.assertTrue(decoder.verifier(debut, fin, (570, 660)))
+        self.assertFalse(decoder.verifier(debut, fin, (600, 720)))
+        self.assertEqual(decoder.stats["discordants"], 1)
+
+
+class TestClasserLibelles(unittest.TestCase):
+
+    def test_days_and_hours_recognised_by_text(self):
+        grille = classer_libelles(ENTETES[:2] + HEURES[:2] + [
+            ("left: 0px;", "Marketing"),          # not a day
+            ("left: 0px;", "lun. 12/01"),
+            ("top: 10px;", "Salle 12"),
+            ("", "Mardi"),                        # not positioned
+        ])
+        self.assertEqual([t for _, t in grille["jours"]], ["Lundi 12", "Mardi 13", "lun. 12/01"])
+        self.assertEqual([t for _, t in grille["heures"]], ["8h00", "9h00"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for resilience (run with: python -m unittest test_resilience)."""
+import unittest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_resilience
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHalfOpenTrial(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker("upstream", failure_threshold=1, reset_timeout=10, clock=self.clock)
+        resilience._BREAKERS["upstream"] = self.breaker
+        self.addCleanup(resilience._BREAKERS.pop, "upstream", None)
+        self.policy = RetryPolicy(attempts=1)
+
+    def call(self, func):
+        return call_with_resilience(func, "upstream", policy=self.policy, sleep=lambda s: None)
+
+    def open_circuit(self):
+        def fail():
+            raise RuntimeError("down")
+        with self.assertRaises(RuntimeError):
+            self.call(fail)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now += 11
+
+    def test_interrupted_trial_frees_the_slot(self):
+        self.open_circuit()
+
+        def interrupted():
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.call(interrupted)
+        self.assertFalse(self.breaker.trial_running)
+        # the next caller runs a new trial instead of being short-circuited forever
+        self.assertEqual(self.call(lambda: "ok"), "ok")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_only_one_trial_at_a_time(self):
+        self.open_circuit()
+
+        def nested():
+            with self.assertRaises(CircuitOpenError):
+                self.call(lambda: "second trial")
+            return "first trial"
+        self.assertEqual(self.call(nested), "first trial")
+        self.assertFalse(self.breaker.trial_running)
+
+
+if __name__ == "__main__":
+    unittest.main()
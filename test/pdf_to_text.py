@@ -1,117 +1,253 @@
 #!/usr/bin/env python3
-"""Extract text from all PDFs in the `pdfs/` directory into .txt files.
+"""Extract text from PDFs into .txt files (batch converter).
 
 Behavior:
-- Only scans the `pdfs/` directory (non-recursive).
-- For each `something.pdf` creates `something.txt` next to it (in `pdfs/`).
-- If the .txt already exists and is non-empty, the PDF is skipped.
-
-Dependencies: PyPDF2 (pip install PyPDF2)
-
-Usage: python3 pdf_to_text.py
+- Scans the `pdfs/` directory by default, or the directories given on the
+  command line; with --recursive, their sub-directories too.
+- For each `something.pdf` creates `something.txt` next to it.
+- A .txt is up to date when it is non-empty and newer than its PDF. When the PDF
+  is newer, its SHA-256 is compared with the one recorded at the last conversion
+  (`.pdf_to_text.json` in each scanned directory): a touched but unchanged PDF is
+  not converted again. --force converts everything.
+- Backends are tried in order (PyPDF2/pypdf, pdfminer.six, pdftotext CLI, then
+  pdfplumber); when one fails on a file, the next one is used for that file.
+- Pages are written to the .txt as soon as they are extracted, so memory stays
+  bounded on very large PDFs; the .txt is replaced once complete.
+- --jobs N converts files in a pool of N processes.
+- Extracted text is kept in the text cache shared with Santé-automat
+  (TEXT_CACHE_FILE, keyed by PDF content hash and backend version), so a
+  deleted .txt is rewritten without reopening the PDF.
+
+Dependencies: PyPDF2 (pip install PyPDF2), or pdfminer.six, or the pdftotext CLI;
+the backends and the cache live in ../Santé-automat/src.
+
+Usage: python3 pdf_to_text.py [DIR ...] [--recursive] [--jobs N] [--force]
 """
+import os
 import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import logging
-import shutil
-import subprocess
-
-# Backend detection: try PyPDF2, then pdfminer.six, then pdftotext CLI
-_HAS_PYPDF2 = False
-_HAS_PDFMINER = False
-_HAS_PDFTOTEXT = False
-
-try:
-    from PyPDF2 import PdfReader
-    _HAS_PYPDF2 = True
-except Exception:
-    PdfReader = None
-
-try:
-    # pdfminer.six high level API
-    from pdfminer.high_level import extract_text as pdfminer_extract_text
-    _HAS_PDFMINER = True
-except Exception:
-    pdfminer_extract_text = None
-
-if shutil.which("pdftotext"):
-    _HAS_PDFTOTEXT = True
-
-
-def _extract_with_pypdf2(pdf_path: Path) -> str:
-    reader = PdfReader(str(pdf_path))
-    texts = []
-    for page in reader.pages:
-        try:
-            texts.append(page.extract_text() or "")
-        except Exception:
-            texts.append("")
-    return "\n\n".join(texts)
 
+# Backends and the extracted-text cache are shared with Santé-automat
+SANTE_DIR = Path(__file__).resolve().parent.parent / "Santé-automat"
+sys.path.insert(0, str(SANTE_DIR / "src"))
 
-def _extract_with_pdfminer(pdf_path: Path) -> str:
-    # pdfminer returns the full text
-    return pdfminer_extract_text(str(pdf_path)) or ""
+from config import TEXT_CACHE_FILE  # noqa: E402
+from manifest import file_sha256  # noqa: E402
+from text_backends import available_backends, iter_pages  # noqa: E402
+from text_cache import TextCache  # noqa: E402
 
+# Backend preference: PyPDF2/pypdf, then pdfminer.six, then pdftotext CLI (pdfplumber as last resort)
+BACKEND_PREFERENCE = ("pypdf", "pdfminer", "pdftotext", "pdfplumber")
 
-def _extract_with_pdftotext_cli(pdf_path: Path) -> str:
-    # pdftotext -layout -q <pdf> -   (write to stdout)
-    cmd = ["pdftotext", "-layout", "-q", str(pdf_path), "-"]
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if res.returncode != 0:
-        raise RuntimeError(f"pdftotext failed: {res.stderr.decode(errors='replace')}")
-    return res.stdout.decode("utf-8", errors="replace")
+# (separator between pages, terminator after each page), per backend: same output as
+# PyPDF2's "\n\n".join(...), pdfminer's extract_text() and pdftotext's stdout
+PAGE_FORMATS = {"pypdf": ("\n\n", ""), "pdfminer": ("", "\f"), "pdftotext": ("", "\f"), "pdfplumber": ("\n\n", "")}
 
+# SHA-256 of each PDF at its last conversion, relative path -> hash (one file per scanned directory)
+STATE_FILE = ".pdf_to_text.json"
 
-def extract_pdf_to_text(pdf_path: Path, txt_path: Path) -> None:
-    """Extract text from a single PDF into txt_path using the best available backend.
 
-    This function overwrites txt_path.
-    """
-    if _HAS_PYPDF2:
-        content = _extract_with_pypdf2(pdf_path)
-    elif _HAS_PDFMINER:
-        content = _extract_with_pdfminer(pdf_path)
-    elif _HAS_PDFTOTEXT:
-        content = _extract_with_pdftotext_cli(pdf_path)
-    else:
+def pick_backends() -> list:
+    """Available backends, in preference order."""
+    available = available_backends()
+    backends = [name for name in BACKEND_PREFERENCE if name in available]
+    if not backends:
         raise RuntimeError(
             "No PDF extraction backend available. Install PyPDF2 or pdfminer.six, or ensure pdftotext is on PATH."
         )
+    return backends
 
-    txt_path.write_text(content, encoding="utf-8")
 
+def pick_backend() -> str:
+    return pick_backends()[0]
 
-def main() -> int:
-    base = Path(__file__).resolve().parent
-    pdf_dir = base / "pdfs"
-    if not pdf_dir.exists():
-        logging.info("Creating missing directory %s", pdf_dir)
-        pdf_dir.mkdir(parents=True, exist_ok=True)
 
-    pdf_files = sorted(pdf_dir.glob("*.pdf"))
-    if not pdf_files:
-        logging.info("No PDF files found in %s", pdf_dir)
-        return 0
+def text_cache_path():
+    """Path of the text cache shared with Santé-automat (relative paths resolve in its folder); None if disabled."""
+    if not TEXT_CACHE_FILE:
+        return None
+    path = Path(TEXT_CACHE_FILE)
+    if not path.is_absolute():
+        path = SANTE_DIR / path
+    return str(path)
+
+
+def open_text_cache():
+    path = text_cache_path()
+    return TextCache(path) if path else None
+
+
+def extract_pdf_to_text(pdf_path: Path, txt_path: Path, backend: str = None, cache=None, sha: str = None) -> None:
+    """Extract text from a single PDF into txt_path using the best available backend.
+
+    Pages already in the text cache (same PDF content and backend version) are not re-rendered.
+    Each page is written as soon as it is extracted, to a temporary file that replaces
+    txt_path once the whole PDF has been read (txt_path is left untouched on failure).
+    """
+    backend = backend or pick_backend()
+    if cache is not None:
+        pages = cache.iter_pages(sha or file_sha256(str(pdf_path)), backend, str(pdf_path))
+    else:
+        pages = iter_pages(backend, str(pdf_path))
+    separator, terminator = PAGE_FORMATS[backend]
+    tmp_path = txt_path.with_name(txt_path.name + ".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for i, page in enumerate(pages):
+                if i:
+                    f.write(separator)
+                f.write(page)
+                f.write(terminator)
+        os.replace(tmp_path, txt_path)
+    finally:
+        pages.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
 
-    processed = 0
-    skipped = 0
-    for pdf in pdf_files:
-        txt = pdf.with_suffix('.txt')
-        if txt.exists() and txt.stat().st_size > 0:
-            logging.info("Skipping already extracted: %s", pdf.name)
-            skipped += 1
-            continue
 
-        logging.info("Extracting: %s -> %s", pdf.name, txt.name)
+# Text cache of the current worker process (opened once per process)
+_worker_cache = None
+
+
+def _init_worker(cache_path):
+    global _worker_cache
+    _worker_cache = TextCache(cache_path) if cache_path else None
+
+
+def convert(pdf_path: Path, txt_path: Path, backends, sha: str = None):
+    """Convert one PDF, falling back to the next backend when one fails.
+
+    Returns:
+        tuple: (backend used, PDF SHA-256, [(backend, error message)] for the failed backends)
+    """
+    sha = sha or file_sha256(str(pdf_path))
+    failures = []
+    for backend in backends:
         try:
-            extract_pdf_to_text(pdf, txt)
-            processed += 1
+            extract_pdf_to_text(pdf_path, txt_path, backend, _worker_cache, sha)
+            return backend, sha, failures
         except Exception as e:
-            logging.error("Failed to extract %s: %s", pdf.name, e)
+            failures.append((backend, str(e)))
+    raise RuntimeError("; ".join(f"{name}: {msg}" for name, msg in failures))
+
+
+def load_state(root: Path) -> dict:
+    path = root / STATE_FILE
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logging.warning("Ignoring unreadable %s: %s", path, e)
+        return {}
 
-    logging.info("Done. Processed=%d Skipped=%d Total=%d", processed, skipped, len(pdf_files))
-    return 0
+
+def save_state(root: Path, state: dict) -> None:
+    path = root / STATE_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def check_stale(pdf: Path, txt: Path, recorded_sha: str = None):
+    """Decide whether pdf needs converting.
+
+    Returns:
+        tuple: (stale, PDF SHA-256 if it had to be computed, else None)
+    """
+    if not txt.exists() or txt.stat().st_size == 0:
+        return True, None
+    if pdf.stat().st_mtime_ns <= txt.stat().st_mtime_ns:
+        return False, None
+    # PDF newer than its .txt: only a content change makes it stale
+    sha = file_sha256(str(pdf))
+    return sha != recorded_sha, sha
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Extract text from PDFs into .txt files")
+    parser.add_argument("dirs", nargs="*", type=Path,
+                        help="directories to scan (default: pdfs/ next to this script)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also scan sub-directories")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (0 = all cores, default: 1)")
+    parser.add_argument("--force", action="store_true", help="convert even up-to-date files")
+    args = parser.parse_args(argv)
+
+    roots = args.dirs
+    if not roots:
+        pdf_dir = Path(__file__).resolve().parent / "pdfs"
+        if not pdf_dir.exists():
+            logging.info("Creating missing directory %s", pdf_dir)
+            pdf_dir.mkdir(parents=True, exist_ok=True)
+        roots = [pdf_dir]
+
+    backends = pick_backends()
+    cache_path = text_cache_path()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    logging.info("Backends: %s, text cache: %s, jobs: %d", ", ".join(backends), cache_path or "disabled", jobs)
+
+    total = processed = skipped = failed = 0
+    for root in roots:
+        if not root.is_dir():
+            logging.error("Not a directory: %s", root)
+            failed += 1
+            continue
+        pdf_files = sorted(root.rglob("*.pdf") if args.recursive else root.glob("*.pdf"))
+        if not pdf_files:
+            logging.info("No PDF files found in %s", root)
+            continue
+        total += len(pdf_files)
+
+        state = load_state(root)
+        todo = []
+        for pdf in pdf_files:
+            txt = pdf.with_suffix('.txt')
+            key = pdf.relative_to(root).as_posix()
+            stale, sha = (True, None) if args.force else check_stale(pdf, txt, state.get(key))
+            if not stale:
+                logging.info("Skipping up to date: %s", key)
+                skipped += 1
+                if sha:
+                    state[key] = sha
+                continue
+            todo.append((key, pdf, txt, sha))
+
+        def done(key, txt, result):
+            backend, sha, failures = result
+            for name, msg in failures:
+                logging.warning("%s: backend %s failed (%s), trying the next one", key, name, msg)
+            logging.info("Extracted: %s -> %s (%s)", key, txt.name, backend)
+            state[key] = sha
+
+        if jobs <= 1 or len(todo) <= 1:
+            _init_worker(cache_path)
+            for key, pdf, txt, sha in todo:
+                try:
+                    done(key, txt, convert(pdf, txt, backends, sha))
+                    processed += 1
+                except Exception as e:
+                    logging.error("Failed to extract %s: %s", key, e)
+                    failed += 1
+        else:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(cache_path,)) as pool:
+                futures = {pool.submit(convert, pdf, txt, backends, sha): (key, txt) for key, pdf, txt, sha in todo}
+                for future in as_completed(futures):
+                    key, txt = futures[future]
+                    try:
+                        done(key, txt, future.result())
+                        processed += 1
+                    except Exception as e:
+                        logging.error("Failed to extract %s: %s", key, e)
+                        failed += 1
+        save_state(root, state)
+
+    logging.info("Done. Processed=%d Skipped=%d Failed=%d Total=%d", processed, skipped, failed, total)
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+"""Tests for pdf_to_text (run with: python -m unittest test_pdf_to_text)."""
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pdf_to_text
+import text_backends
+from manifest import file_sha256
+
+SAMPLE = Path(__file__).resolve().parent / "pdfs" / "prisedesang.pdf"
+
+
+def failing_after_first_page(pdf_path, start=0):
+    yield "first page"
+    raise RuntimeError("damaged page")
+
+
+class TestCheckStale(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.pdf = self.tmp / "report.pdf"
+        self.txt = self.tmp / "report.txt"
+        self.pdf.write_bytes(b"%PDF-1.4 report\n%%EOF\n")
+
+    def make_pdf_newer(self):
+        st = self.txt.stat()
+        os.utime(self.pdf, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def test_missing_or_empty_txt_is_stale(self):
+        self.assertEqual(pdf_to_text.check_stale(self.pdf, self.txt), (True, None))
+        self.txt.write_text("")
+        self.assertEqual(pdf_to_text.check_stale(self.pdf, self.txt), (True, None))
+
+    def test_newer_txt_is_up_to_date_without_hashing(self):
+        self.txt.write_text("text")
+        os.utime(self.pdf, ns=(0, self.txt.stat().st_mtime_ns - 10**9))
+        self.assertEqual(pdf_to_text.check_stale(self.pdf, self.txt), (False, None))
+
+    def test_touched_pdf_with_same_content_is_not_stale(self):
+        self.txt.write_text("text")
+        self.make_pdf_newer()
+        sha = file_sha256(str(self.pdf))
+        self.assertEqual(pdf_to_text.check_stale(self.pdf, self.txt, sha), (False, sha))
+
+    def test_changed_pdf_is_stale(self):
+        recorded = file_sha256(str(self.pdf))
+        self.txt.write_text("text")
+        self.pdf.write_bytes(b"%PDF-1.4 corrected report\n%%EOF\n")
+        self.make_pdf_newer()
+        self.assertEqual(pdf_to_text.check_stale(self.pdf, self.txt, recorded),
+                         (True, file_sha256(str(self.pdf))))
+
+
+@unittest.skipUnless(SAMPLE.exists() and "pdfminer" in text_backends.available_backends(),
+                     "needs pdfs/prisedesang.pdf and pdfminer.six")
+class TestConvert(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.pdf = self.tmp / SAMPLE.name
+        self.txt = self.pdf.with_suffix(".txt")
+        shutil.copy(SAMPLE, self.pdf)
+        self.txt.write_text("previous text")
+        pdf_to_text._init_worker(None)  # no text cache: every backend reads the PDF
+
+    def test_falls_back_to_next_backend(self):
+        with mock.patch.dict(text_backends._ITERATORS, {"pypdf": failing_after_first_page}):
+            backend, sha, failures = pdf_to_text.convert(self.pdf, self.txt, ["pypdf", "pdfminer"])
+        self.assertEqual(backend, "pdfminer")
+        self.assertEqual(sha, file_sha256(str(self.pdf)))
+        self.assertEqual([name for name, _ in failures], ["pypdf"])
+        expected = "".join(page + "\f" for page in text_backends.iter_pages("pdfminer", str(self.pdf)))
+        self.assertEqual(self.txt.read_text(encoding="utf-8"), expected)
+
+    def test_failure_leaves_previous_txt_untouched(self):
+        with mock.patch.dict(text_backends._ITERATORS, {"pypdf": failing_after_first_page}):
+            with self.assertRaises(RuntimeError):
+                pdf_to_text.convert(self.pdf, self.txt, ["pypdf"])
+        self.assertEqual(self.txt.read_text(), "previous text")
+        self.assertEqual(sorted(p.name for p in self.tmp.iterdir()), [self.pdf.name, self.txt.name])
+
+
+if __name__ == "__main__":
+    unittest.main()